@@ -0,0 +1,251 @@
+# approx.py
+# Approximate ("fast") inference for interactive previews of large catalogs. Built offline,
+# stored beside the pipeline as <pipeline>.approx.joblib, and only used for requests that
+# ask for mode=fast:
+#   - RBF SVM (KOI): the kernel expansion over all support vectors is projected onto a few
+#     hundred landmarks (k-means centres of the support vectors, a Nystroem-style reduced
+#     set), so each row costs m kernel evaluations instead of one per support vector. The
+#     Platt sigmoid of the SVC turns the approximate decision value into probabilities.
+#   - Random forest (K2): the first k trees. Trees of a forest are exchangeable, so a prefix
+#     is a smaller forest of the same kind; only the number of trees is stored.
+# The smallest candidate size whose agreement with the exact model reaches --min-agreement
+# on the given catalog is kept, and the measured agreement goes into the artifact and into
+# model_card.json under "approximations".
+#
+# Build:  python -m app.approx koi --data cumulative_koi.csv
+# (run from backend/; the catalog is parsed and preprocessed exactly as uploads are).
+
+import argparse
+import copy
+import datetime
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import joblib
+import numpy as np
+
+from .fastpath import file_sha256
+
+FORMAT_VERSION = 1
+KERNEL_BLOCK_ROWS = 8192   # rows per kernel block: bounds the (rows, landmarks) matrix
+
+def approx_path(pipeline_path: str) -> str:
+    root, _ = os.path.splitext(pipeline_path)
+    return f"{root}.approx.joblib"
+
+def _estimator(pipe):
+    return pipe[-1] if hasattr(pipe, "steps") else pipe
+
+def _rbf(A: np.ndarray, B: np.ndarray, gamma: float) -> np.ndarray:
+    d = np.einsum("ij,ij->i", A, A)[:, None] + np.einsum("ij,ij->i", B, B)[None, :] - 2.0 * (A @ B.T)
+    np.maximum(d, 0.0, out=d)
+    return np.exp(-gamma * d, out=d)
+
+class ReducedSVM:
+    """Binary RBF SVC with its support-vector expansion replaced by `landmarks` x `weights`."""
+    kind = "svm_reduced"
+
+    def __init__(self, arrays: Dict[str, Any], classes: np.ndarray):
+        self.landmarks = arrays["landmarks"]
+        self.weights = arrays["weights"]
+        self.intercept = float(arrays["intercept"])
+        self.gamma = float(arrays["gamma"])
+        self.prob_a = float(arrays["prob_a"])
+        self.prob_b = float(arrays["prob_b"])
+        self.classes_ = classes
+
+    @classmethod
+    def export(cls, svc, n_landmarks: int, seed: int = 0) -> Dict[str, Any]:
+        from sklearn.cluster import KMeans
+        if svc.kernel != "rbf" or len(svc.classes_) != 2:
+            raise TypeError("Only binary RBF SVMs can be reduced.")
+        if not getattr(svc, "probability", False):
+            raise TypeError("The SVM was trained without probability=True.")
+        sv, alpha, gamma = svc.support_vectors_, svc.dual_coef_[0], float(svc._gamma)
+        m = min(n_landmarks, len(sv))
+        landmarks = KMeans(m, n_init=1, random_state=seed).fit(sv).cluster_centers_ if m < len(sv) else sv.copy()
+        # least-squares projection of sum_i alpha_i k(sv_i, .) onto span{k(l_j, .)}
+        k_ll = _rbf(landmarks, landmarks, gamma)
+        k_ll[np.diag_indices_from(k_ll)] += 1e-8
+        weights = np.linalg.lstsq(k_ll, _rbf(landmarks, sv, gamma) @ alpha, rcond=None)[0]
+        return {"landmarks": np.ascontiguousarray(landmarks), "weights": weights,
+                "intercept": np.float64(svc.intercept_[0]), "gamma": np.float64(gamma),
+                "prob_a": np.float64(svc.probA_[0]), "prob_b": np.float64(svc.probB_[0])}
+
+    def decision_function(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        out = np.empty(len(X), dtype=np.float64)
+        for lo in range(0, len(X), KERNEL_BLOCK_ROWS):
+            out[lo:lo + KERNEL_BLOCK_ROWS] = _rbf(X[lo:lo + KERNEL_BLOCK_ROWS], self.landmarks, self.gamma) @ self.weights
+        return out + self.intercept
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        # libsvm's sigmoid on its own decision value (the negation of sklearn's for two classes)
+        p0 = 1.0 / (1.0 + np.exp(self.prob_a * -self.decision_function(X) + self.prob_b))
+        p0 = np.clip(p0, 1e-7, 1 - 1e-7)
+        return np.column_stack([p0, 1.0 - p0])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.classes_.take((self.decision_function(X) > 0).astype(np.intp))
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "landmarks": int(len(self.landmarks))}
+
+class ForestSubset:
+    """The forest restricted to its first `trees` estimators."""
+    kind = "forest_subset"
+
+    def __init__(self, arrays: Dict[str, Any], forest):
+        n = int(arrays["trees"])
+        self.forest = copy.copy(forest)   # shares the fitted trees; only the list is new
+        self.forest.estimators_ = forest.estimators_[:n]
+        self.forest.n_estimators = n
+        self.total = len(forest.estimators_)
+        self.classes_ = forest.classes_
+
+    @classmethod
+    def export(cls, forest, n_trees: int, seed: int = 0) -> Dict[str, Any]:
+        if not hasattr(forest, "estimators_") or not hasattr(forest, "predict_proba"):
+            raise TypeError(f"{type(forest).__name__} is not a forest.")
+        return {"trees": np.int64(min(n_trees, len(forest.estimators_)))}
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.forest.predict_proba(X)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return self.forest.predict(X)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": self.kind, "trees": len(self.forest.estimators_), "of": self.total}
+
+def _kind_for(est):
+    name = type(est).__name__
+    if name == "SVC":
+        return ReducedSVM
+    if name in ("RandomForestClassifier", "ExtraTreesClassifier"):
+        return ForestSubset
+    raise TypeError(f"No approximation for {name}.")
+
+def _build(cls, arrays: Dict[str, Any], est):
+    return ReducedSVM(arrays, est.classes_) if cls is ReducedSVM else ForestSubset(arrays, est)
+
+class ApproxPipeline:
+    """pipe.predict / pipe.predict_proba with the final estimator replaced by its approximation."""
+    def __init__(self, pipe, model, meta: Dict[str, Any]):
+        self.pipe = pipe
+        self.model = model
+        self.meta = meta
+        self.classes_ = model.classes_
+
+    def _transform(self, X):
+        Xt = self.pipe[:-1].transform(X) if hasattr(self.pipe, "steps") and len(self.pipe) > 1 else X
+        return np.asarray(Xt)
+
+    def predict(self, X) -> np.ndarray:
+        return self.model.predict(self._transform(X))
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.model.predict_proba(self._transform(X))
+
+    def describe(self) -> Dict[str, Any]:
+        return {**self.model.describe(), **self.meta}
+
+def agreement(exact_pred: np.ndarray, exact_P: Optional[np.ndarray],
+              approx_pred: np.ndarray, approx_P: Optional[np.ndarray]) -> Dict[str, Any]:
+    """How closely the approximation follows the exact model on the same rows."""
+    out = {"rows": int(len(exact_pred)), "label_agreement": float(np.mean(exact_pred == approx_pred))}
+    if exact_P is not None and approx_P is not None:
+        diff = np.abs(exact_P - approx_P)
+        out.update(max_abs_proba_diff=float(diff.max()), mean_abs_proba_diff=float(diff.mean()))
+    return out
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def export(pipeline_path: str,
+           X,
+           sizes: Sequence[int],
+           min_agreement: float = 0.99,
+           data_name: Optional[str] = None,
+           card_path: Optional[str] = None,
+           out_path: Optional[str] = None) -> str:
+    """
+    Build the approximation of the pipeline's final estimator on X (features as the pipeline
+    takes them), keeping the smallest of `sizes` that reaches min_agreement (else the largest).
+    """
+    pipe = joblib.load(pipeline_path)
+    est = _estimator(pipe)
+    cls = _kind_for(est)
+    exact_s, (exact_pred, exact_P) = _timed(lambda: (pipe.predict(X), pipe.predict_proba(X)))
+    chosen = None
+    for size in sorted(sizes):
+        arrays = cls.export(est, size)
+        fast = ApproxPipeline(pipe, _build(cls, arrays, est), {})
+        fast_s, (pred, P) = _timed(lambda: (fast.predict(X), fast.predict_proba(X)))
+        stats = {**agreement(exact_pred, exact_P, pred, P), "speedup": exact_s / fast_s if fast_s > 0 else None}
+        print(f"{pipeline_path}: {fast.model.describe()} agreement {stats['label_agreement']:.4f} "
+              f"max |dp| {stats.get('max_abs_proba_diff', float('nan')):.3f} speedup {stats['speedup']:.1f}x")
+        chosen = (arrays, fast, stats)
+        if stats["label_agreement"] >= min_agreement:
+            break
+    arrays, fast, stats = chosen
+    record = {**fast.model.describe(), **stats, "data": data_name,
+              "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")}
+    arrays.update({
+        "format_version": np.int64(FORMAT_VERSION),
+        "kind": np.array(cls.kind),
+        "source_sha256": np.array(file_sha256(pipeline_path)),
+        "record": np.array(json.dumps(record)),
+    })
+    out_path = out_path or approx_path(pipeline_path)
+    joblib.dump(arrays, out_path)   # uncompressed: loadable with mmap_mode
+    card_path = card_path or os.path.join(os.path.dirname(pipeline_path), "model_card.json")
+    if os.path.exists(card_path):
+        with open(card_path, "r", encoding="utf-8") as f:
+            card = json.load(f)
+        card.setdefault("approximations", {})["fast"] = record
+        with open(card_path, "w", encoding="utf-8") as f:
+            json.dump(card, f, indent=2)
+            f.write("\n")
+    print(f"-> {out_path} ({record['label_agreement']:.4f} agreement on {record['rows']} rows)")
+    return out_path
+
+def load_approx(pipeline_path: str, pipe, mmap_mode: Optional[str] = None) -> Optional[ApproxPipeline]:
+    """The approximation built for this pipeline, or None if absent or built from a different file."""
+    path = approx_path(pipeline_path)
+    if not os.path.exists(path):
+        return None
+    arrays = joblib.load(path, mmap_mode=mmap_mode)
+    if int(arrays.get("format_version", -1)) != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported approximation format; rebuild it.")
+    if str(arrays["source_sha256"]) != file_sha256(pipeline_path):
+        raise ValueError(f"{path} was built from a different pipeline file; rebuild it.")
+    est = _estimator(pipe)
+    cls = ReducedSVM if str(arrays["kind"]) == ReducedSVM.kind else ForestSubset
+    return ApproxPipeline(pipe, _build(cls, arrays, est), json.loads(str(arrays["record"])))
+
+def main() -> None:
+    from .main_multi import REGISTRY, _ensure_loaded, read_upload_frame
+
+    ap = argparse.ArgumentParser(description="Build the mode=fast approximation of a model")
+    ap.add_argument("model", choices=list(REGISTRY))
+    ap.add_argument("--data", required=True, help="catalog CSV the agreement is measured on")
+    ap.add_argument("--sizes", type=int, nargs="+", default=None,
+                    help="candidate landmarks (SVM) or trees (forest), smallest first (default: 64..512 / 25..200)")
+    ap.add_argument("--min-agreement", type=float, default=0.99)
+    args = ap.parse_args()
+
+    spec = _ensure_loaded(REGISTRY[args.model])
+    with open(args.data, "rb") as f:
+        raw = read_upload_frame(f.read(), spec.header_tokens)
+    X = spec.preprocess_fn(raw.drop(columns=[spec.label_col], errors="ignore"))
+    sizes: List[int] = args.sizes or ([64, 128, 256, 512] if _kind_for(_estimator(spec.pipe)) is ReducedSVM
+                                      else [25, 50, 100, 200])
+    export(spec.pipeline_path, X, sizes, args.min_agreement, data_name=os.path.basename(args.data))
+
+if __name__ == "__main__":
+    main()
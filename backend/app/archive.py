@@ -0,0 +1,107 @@
+# archive.py
+# Multi-file uploads: zip and tar archives (tar optionally gzip/bzip2/xz compressed) of
+# catalog files. Members are read one at a time from the upload's spooled file and each is
+# decompressed as it is read: tar in stream mode ("r|*"), so a compressed tar is inflated
+# front to back exactly once, zip member by member through its central directory. Nothing
+# is extracted to disk, and limits on the member count and the decompressed bytes keep a
+# small archive from expanding without bound. A member that cannot be read on its own
+# (encrypted, or an unsupported zip compression method) is reported with its error instead
+# of failing the whole archive.
+
+import os
+import tarfile
+import zipfile
+import zlib
+from typing import BinaryIO, Iterator, Optional, Tuple, Union
+
+READ_BLOCK = 1 << 20
+TAR_SUFFIXES = (".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tbz2", ".tar.xz", ".txz")
+ZIP_METHODS = {zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED, zipfile.ZIP_BZIP2, zipfile.ZIP_LZMA}
+
+class ArchiveError(ValueError):
+    """A corrupt archive, or one past the member-count / decompressed-size limits."""
+
+def archive_format(filename: Optional[str], head: bytes) -> Optional[str]:
+    """
+    "zip" or "tar" for an archive upload, else None. head must hold the first 512 bytes (the
+    tar magic sits at offset 257); a compressed stream counts as a tar only by its extension,
+    so a gzipped CSV is not mistaken for one.
+    """
+    if head[:4] in (b"PK\x03\x04", b"PK\x05\x06"):   # local file header / empty zip
+        return "zip"
+    if head[257:262] == b"ustar":
+        return "tar"
+    compressed = head[:2] == b"\x1f\x8b" or head[:3] == b"BZh" or head[:6] == b"\xfd7zXZ\x00"
+    if compressed and (filename or "").lower().endswith(TAR_SUFFIXES):
+        return "tar"
+    return None
+
+def _skipped(name: str) -> bool:
+    """Directory entries' leftovers and OS metadata (__MACOSX/, ._resource forks, dotfiles)."""
+    parts = name.replace("\\", "/").split("/")
+    return "__MACOSX" in parts or os.path.basename(name).startswith(".")
+
+def _read_bounded(src: BinaryIO, budget: int) -> bytes:
+    """Read src to the end, failing once more than budget bytes come out (declared sizes are not trusted)."""
+    chunks, size = [], 0
+    while True:
+        block = src.read(READ_BLOCK)
+        if not block:
+            return b"".join(chunks)
+        size += len(block)
+        if size > budget:
+            raise ArchiveError("The archive expands past the decompressed-size limit.")
+        chunks.append(block)
+
+def _zip_member_error(info: zipfile.ZipInfo) -> Optional[str]:
+    if info.flag_bits & 0x1:
+        return "The file is encrypted; archives must not be password-protected."
+    if info.compress_type not in ZIP_METHODS:
+        return f"Unsupported zip compression method {info.compress_type}."
+    return None
+
+def iter_members(fobj: BinaryIO,
+                 fmt: str,
+                 max_files: int,
+                 max_bytes: int) -> Iterator[Tuple[str, Union[bytes, ArchiveError]]]:
+    """
+    (member name, content) for each regular file of the archive, in archive order; content is
+    an ArchiveError for a member that cannot be read on its own. Raises ArchiveError when the
+    archive itself is unreadable or past the limits.
+    """
+    budget, count = max_bytes, 0
+    fobj.seek(0)
+    try:
+        if fmt == "zip":
+            with zipfile.ZipFile(fobj) as zf:
+                for info in zf.infolist():
+                    if info.is_dir() or _skipped(info.filename):
+                        continue
+                    count += 1
+                    if count > max_files:
+                        raise ArchiveError(f"The archive has more than {max_files} files.")
+                    error = _zip_member_error(info)
+                    if error is not None:
+                        yield info.filename, ArchiveError(error)
+                        continue
+                    try:
+                        with zf.open(info) as src:
+                            content = _read_bounded(src, budget)
+                    except (RuntimeError, NotImplementedError) as e:   # encryption / method zipfile refuses
+                        yield info.filename, ArchiveError(f"Could not read the file: {e}")
+                        continue
+                    budget -= len(content)
+                    yield info.filename, content
+        else:
+            with tarfile.open(fileobj=fobj, mode="r|*") as tf:
+                for info in tf:
+                    if not info.isfile() or _skipped(info.name):
+                        continue
+                    count += 1
+                    if count > max_files:
+                        raise ArchiveError(f"The archive has more than {max_files} files.")
+                    content = _read_bounded(tf.extractfile(info), budget)
+                    budget -= len(content)
+                    yield info.name, content
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError) as e:
+        raise ArchiveError(f"Could not read the {fmt} archive: {e}")
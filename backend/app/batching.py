@@ -0,0 +1,106 @@
+# batching.py
+# Per-model micro-batching: concurrent requests that arrive within a short window are
+# concatenated into one matrix, scored with a single predict/predict_proba call in a worker
+# thread, and the results are split back to each caller.
+
+import asyncio
+from concurrent.futures import Executor
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .metrics import bind_context
+
+# (X, want_proba) -> (pred_idx, proba or None)
+BatchFn = Callable[[pd.DataFrame, bool], Tuple[np.ndarray, Optional[np.ndarray]]]
+
+class _Pending:
+    __slots__ = ("X", "want_proba", "future")
+
+    def __init__(self, X: pd.DataFrame, want_proba: bool, future: asyncio.Future):
+        self.X = X
+        self.want_proba = want_proba
+        self.future = future
+
+class MicroBatcher:
+    """
+    Collects submissions for up to `window_ms` milliseconds or `max_rows` rows, whichever
+    comes first, then runs `fn` once on the concatenated rows in `executor`.
+    window_ms <= 0 disables batching: every submission runs on its own (still off the loop).
+    """
+    def __init__(self,
+                 fn: BatchFn,
+                 window_ms: float,
+                 max_rows: int,
+                 executor: Optional[Executor] = None):
+        self.fn = fn
+        self.window = max(window_ms, 0.0) / 1000.0
+        self.max_rows = max(int(max_rows), 1)
+        self.executor = executor
+        self._pending: List[_Pending] = []
+        self._rows = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # Stats, exposed through /health
+        self.batches = 0
+        self.requests = 0
+        self.rows = 0
+
+    async def submit(self, X: pd.DataFrame, want_proba: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        loop = asyncio.get_running_loop()
+        if self.window == 0 or len(X) >= self.max_rows:
+            self._count(1, len(X))
+            return await loop.run_in_executor(self.executor, bind_context(self.executor, self.fn), X, want_proba)
+
+        fut = loop.create_future()
+        self._pending.append(_Pending(X, want_proba, fut))
+        self._rows += len(X)
+        if self._rows >= self.max_rows:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await fut
+
+    def _count(self, n_requests: int, n_rows: int) -> None:
+        self.batches += 1
+        self.requests += n_requests
+        self.rows += n_rows
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending, self._rows = self._pending, [], 0
+        if batch:
+            asyncio.get_running_loop().create_task(self._run(batch))
+
+    async def _run(self, batch: List[_Pending]) -> None:
+        loop = asyncio.get_running_loop()
+        sizes = [len(p.X) for p in batch]
+        want_proba = any(p.want_proba for p in batch)
+        self._count(len(batch), sum(sizes))
+        try:
+            X = batch[0].X if len(batch) == 1 else pd.concat([p.X for p in batch], ignore_index=True)
+            # stage timings go to the request that opened the batch
+            pred, proba = await loop.run_in_executor(self.executor, bind_context(self.executor, self.fn), X, want_proba)
+        except Exception as e:
+            for p in batch:
+                if not p.future.done():
+                    p.future.set_exception(e)
+            return
+
+        offsets = np.cumsum([0] + sizes)
+        for p, lo, hi in zip(batch, offsets[:-1], offsets[1:]):
+            if p.future.done():  # caller went away
+                continue
+            p.future.set_result((pred[lo:hi], proba[lo:hi] if proba is not None and p.want_proba else None))
+
+    def stats(self) -> dict:
+        return {
+            "window_ms": self.window * 1000.0,
+            "max_rows": self.max_rows,
+            "batches": self.batches,
+            "requests": self.requests,
+            "rows": self.rows,
+            "mean_requests_per_batch": (self.requests / self.batches) if self.batches else None,
+        }
@@ -0,0 +1,150 @@
+# confusion.py
+# Evaluation metrics from one confusion matrix. The matrix is updated chunk by chunk (one
+# bincount per chunk), accumulators from parallel workers or stream chunks can be merged,
+# and accuracy, macro F1, balanced accuracy, the confusion matrix and the per-class report
+# are all derived from it, with the same values (and the same float arithmetic) as
+# sklearn's accuracy_score, f1_score(average="macro"), balanced_accuracy_score,
+# confusion_matrix and classification_report(output_dict=True, zero_division=0).
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+class ConfusionAccumulator:
+    """
+    Confusion matrix over class indices 0..n_classes-1 (rows: true, columns: predicted).
+    With n_classes=None the matrix grows to the largest index seen, and only the labels
+    that occur are reported (like sklearn without labels=).
+    """
+    def __init__(self, n_classes: Optional[int] = None):
+        self.fixed = n_classes is not None
+        n = int(n_classes) if n_classes is not None else 0
+        self.cm = np.zeros((n, n), dtype=np.int64)
+
+    @property
+    def n_classes(self) -> int:
+        return self.cm.shape[0]
+
+    @property
+    def total(self) -> int:
+        return int(self.cm.sum())
+
+    def _grow(self, n: int) -> None:
+        if n > self.n_classes:
+            cm = np.zeros((n, n), dtype=np.int64)
+            cm[:self.n_classes, :self.n_classes] = self.cm
+            self.cm = cm
+
+    def update(self, y_true: np.ndarray, y_pred: np.ndarray) -> "ConfusionAccumulator":
+        y_true = np.asarray(y_true, dtype=np.int64).ravel()
+        y_pred = np.asarray(y_pred, dtype=np.int64).ravel()
+        if y_true.shape != y_pred.shape:
+            raise ValueError(f"y_true and y_pred have different lengths ({y_true.size} vs {y_pred.size}).")
+        if y_true.size == 0:
+            return self
+        lo = min(y_true.min(), y_pred.min())
+        hi = max(y_true.max(), y_pred.max())
+        if lo < 0 or (self.fixed and hi >= self.n_classes):
+            raise ValueError(f"Class indices must be in [0, {self.n_classes}), got [{lo}, {hi}].")
+        self._grow(int(hi) + 1)
+        n = self.n_classes
+        self.cm += np.bincount(y_true * n + y_pred, minlength=n * n).reshape(n, n)
+        return self
+
+    def merge(self, other: "ConfusionAccumulator") -> "ConfusionAccumulator":
+        self._grow(other.n_classes)
+        other_cm = other.cm
+        if other.n_classes < self.n_classes:
+            other_cm = np.zeros_like(self.cm)
+            other_cm[:other.n_classes, :other.n_classes] = other.cm
+        self.cm += other_cm
+        return self
+
+    __iadd__ = merge
+
+    # ---- derived metrics ----
+    def _labels(self) -> np.ndarray:
+        """Indices reported: every class if fixed, else those seen as true or predicted."""
+        if self.fixed:
+            return np.arange(self.n_classes)
+        return np.flatnonzero(self.cm.sum(axis=0) + self.cm.sum(axis=1))
+
+    @staticmethod
+    def _divide(num: np.ndarray, den: np.ndarray) -> np.ndarray:
+        """num / den with 0 where den == 0 (sklearn's zero_division=0 / "warn")."""
+        den = np.asarray(den, dtype=np.float64).copy()
+        mask = den == 0
+        den[mask] = 1
+        out = np.asarray(num, dtype=np.float64) / den
+        out[mask] = 0.0
+        return out
+
+    @staticmethod
+    def _prf(cm: np.ndarray):
+        tp = np.diag(cm)
+        pred_sum = cm.sum(axis=0)
+        true_sum = cm.sum(axis=1)
+        precision = ConfusionAccumulator._divide(tp, pred_sum)
+        recall = ConfusionAccumulator._divide(tp, true_sum)
+        f1 = ConfusionAccumulator._divide(2.0 * tp.astype(np.float64), 1.0 * true_sum + pred_sum)
+        return precision, recall, f1, true_sum
+
+    def accuracy(self) -> float:
+        return float(np.trace(self.cm) / self.total) if self.total else float("nan")
+
+    def macro_f1(self) -> float:
+        # f1_score without labels= averages over the labels present in y_true or y_pred
+        seen = np.flatnonzero(self.cm.sum(axis=0) + self.cm.sum(axis=1))
+        f1 = self._prf(self.cm[np.ix_(seen, seen)])[2]
+        return float(np.nanmean(f1)) if f1.size else 0.0
+
+    def balanced_accuracy(self) -> float:
+        true_sum = self.cm.sum(axis=1)
+        seen = true_sum > 0
+        return float(np.mean(np.diag(self.cm)[seen] / true_sum[seen]))
+
+    def matrix(self) -> np.ndarray:
+        labels = self._labels()
+        return self.cm[np.ix_(labels, labels)]
+
+    def report(self, class_names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """classification_report(..., output_dict=True, zero_division=0)."""
+        labels = self._labels()
+        cm = self.matrix()
+        names = list(class_names) if class_names is not None else [str(i) for i in labels]
+        precision, recall, f1, support = self._prf(cm)
+        out: Dict[str, Any] = {}
+        for name, p, r, f, s in zip(names, precision, recall, f1, support):
+            out[name] = {"precision": float(p), "recall": float(r), "f1-score": float(f), "support": float(s)}
+        n_support = float(np.sum(support))
+        # labels cover everything seen, so the micro average is the accuracy
+        tp_all = np.array([np.trace(cm)])
+        out["accuracy"] = float(self._divide(tp_all, np.array([cm.sum()]))[0])
+        out["macro avg"] = {"precision": float(np.nanmean(precision)), "recall": float(np.nanmean(recall)),
+                            "f1-score": float(np.nanmean(f1)), "support": n_support}
+        out["weighted avg"] = {"precision": _weighted(precision, support), "recall": _weighted(recall, support),
+                               "f1-score": _weighted(f1, support), "support": n_support}
+        return out
+
+    def metrics(self, class_names: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+        """The metric block of an /evaluate response."""
+        return {
+            "accuracy": self.accuracy(),
+            "macro_f1": self.macro_f1(),
+            "balanced_accuracy": self.balanced_accuracy(),
+            "confusion_matrix": {"labels": list(class_names) if class_names is not None else None,
+                                 "matrix": self.matrix().tolist()},
+            "classification_report": self.report(class_names),
+        }
+
+    def prediction_counts(self, class_names: Optional[Sequence[str]] = None) -> Dict[Any, int]:
+        """Predictions per class (classes never predicted are left out)."""
+        counts = self.cm.sum(axis=0)
+        return {(class_names[i] if class_names is not None else int(i)): int(counts[i])
+                for i in np.flatnonzero(counts)}
+
+def _weighted(values: np.ndarray, weights: np.ndarray) -> float:
+    try:
+        return float(np.average(values, weights=weights))
+    except ZeroDivisionError:
+        return float(np.average(values))
@@ -0,0 +1,264 @@
+# drift.py
+# Input-drift sketches. Every feature of a model's aligned matrix gets a fixed-edge histogram
+# whose edges are the training catalog's quantiles, plus missing, sum, min and max, so a
+# sketch is a handful of small arrays that merge by addition. Uploads update the model's
+# sketch as their batches leave preprocess_fn (one column sort + edge lookup over at most
+# sample_rows evenly spaced rows of the batch, weighted up to the batch's size), and
+# /drift compares it with the baseline sketch of the training catalog: the population
+# stability index (PSI) per feature over its bins plus a missing bin, missing rates, means
+# and medians, and one-hot category shares.
+#
+# Baseline:  python -m app.drift koi --data cumulative_koi.csv
+# writes artifacts/koi/drift_baseline.json; the app tracks drift for models that have one.
+
+import argparse
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+FORMAT_VERSION = 1
+N_BINS = 16
+PSI_EPS = 1e-4      # smoothing for empty bins
+PSI_DRIFTED = 0.2   # customary "significant shift" threshold
+
+def baseline_path(pipeline_path: str) -> str:
+    return os.path.join(os.path.dirname(pipeline_path), "drift_baseline.json")
+
+class DriftSketch:
+    """Mergeable per-feature histograms over fixed bin edges (n_bins - 1 inner edges per feature)."""
+    def __init__(self, features: Sequence[str], edges: np.ndarray):
+        self.features = list(features)
+        self.edges = np.asarray(edges, dtype=np.float64)            # (features, n_bins - 1), ascending
+        n_features, n_bins = len(self.features), self.edges.shape[1] + 1
+        self.counts = np.zeros((n_features, n_bins), dtype=np.int64)
+        self.missing = np.zeros(n_features, dtype=np.int64)
+        self.sum = np.zeros(n_features)
+        self.min = np.full(n_features, np.inf)
+        self.max = np.full(n_features, -np.inf)
+        self.rows = 0
+        self.batches = 0
+        self.since = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def fit(cls, features: Sequence[str], X: np.ndarray, n_bins: int = N_BINS) -> "DriftSketch":
+        """A sketch with edges at the quantiles of X (the baseline catalog), updated with X."""
+        X = np.asarray(X, dtype=np.float64)
+        with np.errstate(all="ignore"):
+            edges = np.nanquantile(X, np.arange(1, n_bins) / n_bins, axis=0).T if len(X) else None
+        if edges is None:
+            edges = np.zeros((X.shape[1], n_bins - 1))
+        sketch = cls(features, np.nan_to_num(edges, nan=0.0))   # all-missing features: any edges do
+        sketch.update(X)
+        return sketch
+
+    def empty(self) -> "DriftSketch":
+        return DriftSketch(self.features, self.edges)
+
+    def _batch(self, X: np.ndarray):
+        # sorting each column and locating the few edges in it is several times faster than
+        # locating every value among the edges; NaN sorts last, after the present values
+        S = np.sort(np.asarray(X), axis=0)
+        n_rows, n_features = S.shape
+        missing = np.isnan(S).sum(axis=0)
+        present = n_rows - missing
+        below = np.empty((n_features, self.edges.shape[1] + 2), dtype=np.int64)   # values < each edge
+        below[:, 0] = 0
+        below[:, -1] = present
+        for j in range(n_features):
+            below[j, 1:-1] = np.searchsorted(S[:present[j], j], self.edges[j], side="left")
+        counts = np.diff(below, axis=1)
+        total = np.nansum(S, axis=0, dtype=np.float64)
+        lo = np.where(present > 0, S[0], np.inf) if n_rows else np.full(n_features, np.inf)
+        hi = S[np.maximum(present - 1, 0), np.arange(n_features)] if n_rows else np.full(n_features, -np.inf)
+        return counts, missing, total, lo.astype(np.float64), np.where(present > 0, hi, -np.inf)
+
+    def update(self, X: np.ndarray, sample_rows: int = 0) -> None:
+        """
+        Add a batch (rows of the aligned feature matrix, in `features` order). With sample_rows,
+        a larger batch is sketched from every step-th row and its counts, missing counts and
+        sums weighted by step; 0 sketches every row.
+        """
+        step = -(-len(X) // sample_rows) if sample_rows and len(X) > sample_rows else 1
+        counts, missing, total, lo, hi = self._batch(X[::step])
+        with self._lock:
+            self.counts += counts * step
+            self.missing += missing * step
+            self.sum += total * step
+            np.minimum(self.min, lo, out=self.min)
+            np.maximum(self.max, hi, out=self.max)
+            self.rows += len(X)
+            self.batches += 1
+
+    def merge(self, other: "DriftSketch") -> None:
+        if other.features != self.features or not np.array_equal(other.edges, self.edges):
+            raise ValueError("Only sketches over the same features and bin edges can be merged.")
+        with self._lock:
+            self.counts += other.counts
+            self.missing += other.missing
+            self.sum += other.sum
+            np.minimum(self.min, other.min, out=self.min)
+            np.maximum(self.max, other.max, out=self.max)
+            self.rows += other.rows
+            self.batches += other.batches
+
+    def quantile(self, q: float) -> np.ndarray:
+        """Per-feature q-quantile estimated from the histogram (linear within a bin)."""
+        lower = np.column_stack([self.min, self.edges])
+        upper = np.column_stack([self.edges, self.max])
+        out = np.full(len(self.features), np.nan)
+        for j, row in enumerate(self.counts):
+            n = row.sum()
+            if n == 0:
+                continue
+            cum = np.cumsum(row)
+            b = int(np.searchsorted(cum, q * n, side="left"))
+            prev = cum[b - 1] if b else 0
+            frac = (q * n - prev) / row[b] if row[b] else 0.0
+            lo, hi = max(lower[j, b], self.min[j]), min(upper[j, b], self.max[j])
+            out[j] = lo + frac * (hi - lo) if hi >= lo else lo
+        return out
+
+    def present(self) -> np.ndarray:
+        """Per-feature count of present values (weighted like counts; rows - missing when exact)."""
+        return self.counts.sum(axis=1)
+
+    def summary(self) -> Dict[str, np.ndarray]:
+        present = self.present()
+        seen = present + self.missing
+        with np.errstate(all="ignore"):
+            return {
+                "missing_rate": np.where(seen > 0, self.missing / np.maximum(seen, 1), np.nan),
+                "mean": np.where(present > 0, self.sum / np.maximum(present, 1), np.nan),
+                "median": self.quantile(0.5),
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "features": self.features,
+            "edges": self.edges.tolist(),
+            "counts": self.counts.tolist(),
+            "missing": self.missing.tolist(),
+            "sum": self.sum.tolist(),
+            "min": [None if not np.isfinite(v) else float(v) for v in self.min],
+            "max": [None if not np.isfinite(v) else float(v) for v in self.max],
+            "rows": self.rows,
+        }
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "DriftSketch":
+        sketch = cls(d["features"], np.asarray(d["edges"], dtype=np.float64).reshape(len(d["features"]), -1))
+        sketch.counts[:] = d["counts"]
+        sketch.missing[:] = d["missing"]
+        sketch.sum[:] = d["sum"]
+        sketch.min[:] = [np.inf if v is None else v for v in d["min"]]
+        sketch.max[:] = [-np.inf if v is None else v for v in d["max"]]
+        sketch.rows = int(d["rows"])
+        return sketch
+
+def psi(current: DriftSketch, baseline: DriftSketch) -> np.ndarray:
+    """Population stability index per feature, with missing values as one more bin."""
+    def shares(c):
+        n = c.sum(axis=1, keepdims=True)
+        p = np.divide(c, n, out=np.zeros(c.shape), where=n > 0)
+        return np.maximum(p, PSI_EPS)
+    cur = np.column_stack([current.counts, current.missing])
+    base = np.column_stack([baseline.counts, baseline.missing])
+    p, q = shares(cur), shares(base)
+    out = ((p - q) * np.log(p / q)).sum(axis=1)
+    out[(cur.sum(axis=1) == 0) | (base.sum(axis=1) == 0)] = np.nan
+    return out
+
+def _num(v: float) -> Optional[float]:
+    return None if v is None or not np.isfinite(v) else float(v)
+
+def compare(current: DriftSketch,
+            baseline: DriftSketch,
+            onehot: Dict[str, List[int]],
+            threshold: float = PSI_DRIFTED) -> Dict[str, Any]:
+    """The /drift report: per-feature PSI and statistics (most drifted first), and category shares."""
+    scores = psi(current, baseline)
+    cur, base = current.summary(), baseline.summary()
+    features = [{
+        "feature": name,
+        "psi": _num(scores[j]),
+        "missing_rate": _num(cur["missing_rate"][j]),
+        "baseline_missing_rate": _num(base["missing_rate"][j]),
+        "mean": _num(cur["mean"][j]),
+        "baseline_mean": _num(base["mean"][j]),
+        "median": _num(cur["median"][j]),
+        "baseline_median": _num(base["median"][j]),
+    } for j, name in enumerate(current.features)]
+    features.sort(key=lambda f: -1.0 if f["psi"] is None else f["psi"], reverse=True)
+
+    categories = {}
+    for source, cols in onehot.items():
+        levels = {}
+        for sketch, key in ((current, "share"), (baseline, "baseline_share")):
+            present = sketch.present()[cols].min() if cols else 0
+            for j in cols:
+                share = sketch.sum[j] / present if present else None
+                levels.setdefault(current.features[j][len(source) + 1:], {})[key] = share
+            seen = sketch.sum[cols].sum() / present if present else None
+            levels.setdefault("<unseen>", {})[key] = None if seen is None else max(0.0, 1.0 - seen)
+        categories[source] = levels
+
+    valid = scores[np.isfinite(scores)]
+    return {
+        "rows": current.rows,
+        "batches": current.batches,
+        "since": current.since,
+        "baseline_rows": baseline.rows,
+        "max_psi": _num(valid.max()) if valid.size else None,
+        "drifted": [f["feature"] for f in features if f["psi"] is not None and f["psi"] >= threshold],
+        "threshold": threshold,
+        "features": features,
+        "categories": categories,
+    }
+
+def save_baseline(path: str, sketch: DriftSketch, meta: Dict[str, Any]) -> None:
+    with open(path, "w") as f:
+        json.dump({"format_version": FORMAT_VERSION, **meta, "sketch": sketch.to_dict()}, f)
+
+def load_baseline(path: str, features: Sequence[str]) -> Optional[Dict[str, Any]]:
+    """The baseline record (with its sketch as a DriftSketch), or None if absent."""
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        record = json.load(f)
+    if int(record.get("format_version", -1)) != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported drift baseline format; rebuild it.")
+    sketch = DriftSketch.from_dict(record.pop("sketch"))
+    if sketch.features != list(features):
+        raise ValueError(f"{path} was built for different features; rebuild it.")
+    record["sketch"] = sketch
+    return record
+
+def main() -> None:
+    from .main_multi import REGISTRY, _ensure_loaded, read_upload_frame
+
+    ap = argparse.ArgumentParser(description="Build a model's drift baseline from its training catalog")
+    ap.add_argument("model", choices=list(REGISTRY))
+    ap.add_argument("--data", required=True, help="training catalog CSV")
+    ap.add_argument("--bins", type=int, default=N_BINS)
+    args = ap.parse_args()
+
+    spec = _ensure_loaded(REGISTRY[args.model])
+    with open(args.data, "rb") as f:
+        raw = read_upload_frame(f.read(), spec.header_tokens)
+    X = spec.preprocess_fn(raw)
+    sketch = DriftSketch.fit(list(X.columns), X.to_numpy(), args.bins)
+    path = baseline_path(spec.pipeline_path)
+    save_baseline(path, sketch, {
+        "model": spec.slug,
+        "data": os.path.basename(args.data),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime()),
+    })
+    print(f"{args.model}: {sketch.rows} rows, {len(sketch.features)} features, {args.bins} bins -> {path}")
+
+if __name__ == "__main__":
+    main()
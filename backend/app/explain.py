@@ -0,0 +1,236 @@
+# explain.py
+# Per-row feature attribution for whole uploads, computed in NumPy batches rather than by
+# calling pipe.predict once per row and feature.
+#
+# Tree ensembles (K2 RandomForest, TESS HistGradientBoosting) use path contributions: every
+# node holds the model's expected output below it, and each split a row passes credits the
+# change in that expectation to the split feature. The trees are flattened as in fastpath.py
+# and all trees are walked for a block of rows at once, one level per step, so the
+# contributions of a row add up exactly to the model output: the forest's class
+# probabilities, or the boosting raw scores (log-odds).
+#
+# RBF SVMs (KOI) use occlusion: a feature's contribution is f(x) - f(x with that feature set
+# to the baseline row), f being the decision function and the baseline the all-missing row
+# as the pipeline imputes and scales it. Changing one feature changes the squared distance
+# to each support vector by a rank-one term, so the kernel rows of all perturbed copies come
+# from one distance matrix per block without re-running the SVC. A value so far outside the
+# support vectors' range that its kernel terms underflow to 0 is handled in closed form
+# instead: the update would subtract huge, nearly equal distances.
+
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .fastpath import FlatForest, _FlatTrees, _flatten
+
+BLOCK_ROWS = 256
+UNDERFLOW = 750.0  # exp(-750) is 0.0 in float64
+
+class TreePaths(_FlatTrees):
+    """Path contributions for a flattened forest or boosting ensemble."""
+    method = "tree_path"
+
+    def __init__(self, cls, arrays: Dict[str, np.ndarray]):
+        super().__init__(arrays)
+        value = arrays["value"]
+        self.classes_ = arrays["classes"]
+        if cls is FlatForest:
+            self.units = "probability"
+            self.scale = 1.0 / len(self.roots)
+            self.offset = np.zeros(value.shape[1])
+        else:
+            # one column per raw score (one for binary log-loss), each tree adds to its own
+            self.units = "log_odds"
+            self.scale = 1.0
+            self.offset = np.asarray(arrays["baseline"], dtype=np.float64)
+            tree_of_node = np.repeat(np.arange(len(self.roots)), np.diff(np.append(self.roots, len(value))))
+            spread = np.zeros((len(value), len(self.offset)))
+            spread[np.arange(len(value)), arrays["tree_class"][tree_of_node]] = value
+            value = spread
+        self.value = value
+        self.bias = self.offset + value[self.roots].sum(axis=0) * self.scale
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        """(rows, features, outputs) contributions; bias + their sum over features is the output."""
+        X = np.ascontiguousarray(X, dtype=self.threshold.dtype)
+        n_rows, n_features = X.shape
+        n_out = self.value.shape[1]
+        out = np.empty((n_rows, n_features, n_out))
+        for lo in range(0, n_rows, BLOCK_ROWS):
+            block = X[lo:lo + BLOCK_ROWS]
+            b = len(block)
+            flat_x = block.ravel()
+            row_base = np.arange(b, dtype=np.intp) * n_features
+            node = np.repeat(self.roots[:, None], b, axis=1)
+            check_nan = self.has_missing and bool(np.isnan(flat_x).any())
+            acc = np.zeros(b * n_features * n_out)
+            lanes = np.arange(n_out)
+            for _ in range(self.depth):
+                feat = self.feature.take(node)
+                x = flat_x.take(feat + row_base)
+                went_right = x > self.threshold.take(node)
+                if check_nan:
+                    went_right |= np.isnan(x) & self.missing_right.take(node)
+                nxt = self.left.take(node) + went_right
+                delta = self.value.take(nxt, axis=0) - self.value.take(node, axis=0)   # leaves: 0
+                slot = ((feat + row_base)[..., None] * n_out + lanes).ravel()
+                acc += np.bincount(slot, weights=delta.ravel(), minlength=acc.size)
+                node = nxt
+            out[lo:lo + b] = acc.reshape(b, n_features, n_out) * self.scale
+        return out
+
+    def outputs(self, contrib: np.ndarray, X: np.ndarray) -> np.ndarray:
+        return self.bias + contrib.sum(axis=1)
+
+    def predict_index(self, output: np.ndarray) -> np.ndarray:
+        if output.shape[1] == 1:   # binary boosting: one log-odds column for classes_[1]
+            return (output[:, 0] > 0).astype(np.intp)
+        return np.argmax(output, axis=1)
+
+    def class_view(self, values: np.ndarray) -> np.ndarray:
+        """Per-output values as per-class values (the binary log-odds column, negated for classes_[0])."""
+        if values.shape[-1] == 1 and len(self.classes_) == 2:
+            return np.concatenate([-values, values], axis=-1)
+        return values
+
+class KernelOcclusion:
+    """Occlusion contributions for a binary RBF SVC, in decision-function units toward classes_[1]."""
+    method = "occlusion"
+    units = "decision"
+
+    def __init__(self, est, baseline: np.ndarray):
+        self.sv = np.asarray(est.support_vectors_, dtype=np.float64)
+        self.dual = np.asarray(est.dual_coef_[0], dtype=np.float64)
+        self.intercept = float(est.intercept_[0])
+        self.gamma = float(est._gamma)
+        self.classes_ = np.asarray(est.classes_)
+        self.sv_sq = np.einsum("ij,ij->i", self.sv, self.sv)
+        self.baseline = np.asarray(baseline, dtype=np.float64).reshape(-1)
+        # beyond reach[j], feature j alone puts every kernel value of the row below the smallest double
+        self.reach = np.abs(self.sv).max(axis=0) + np.sqrt(UNDERFLOW / self.gamma)
+        self.bias = np.array([self.decision(self.baseline[None, :])[0]])
+
+    def _sq_dist(self, X: np.ndarray) -> np.ndarray:
+        d = np.einsum("ij,ij->i", X, X)[:, None] + self.sv_sq[None, :] - 2.0 * (X @ self.sv.T)
+        return np.maximum(d, 0.0, out=d)
+
+    def decision(self, X: np.ndarray) -> np.ndarray:
+        return np.exp(-self.gamma * self._sq_dist(X)) @ self.dual + self.intercept
+
+    def contributions(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        out = np.zeros((X.shape[0], X.shape[1], 1))
+        z, g = self.baseline, self.gamma
+        sv_t = np.ascontiguousarray(self.sv.T)
+        # rows with a value beyond reach: f(x) is the intercept, and so is f of every perturbed
+        # copy that keeps such a value; only resetting a row's single far value changes f
+        far = np.abs(X) > self.reach
+        n_far = far.sum(axis=1)
+        lone = np.flatnonzero(n_far == 1)
+        if lone.size:
+            cols = far[lone].argmax(axis=1)
+            moved = X[lone]
+            moved[np.arange(len(lone)), cols] = z[cols]
+            out[lone, cols, 0] = self.intercept - self.decision(moved)
+        near = np.flatnonzero(n_far == 0)
+        for lo in range(0, len(near), BLOCK_ROWS):
+            rows = near[lo:lo + BLOCK_ROWS]
+            block = X[rows]
+            arg0 = self._sq_dist(block)
+            arg0 *= -g
+            f = np.exp(arg0) @ self.dual
+            arg = np.empty_like(arg0)
+            for j in range(X.shape[1]):
+                x = block[:, j]
+                # -g ||x' - s||^2 with x'_j = z_j:  -g (d + z_j^2 - x_j^2 - 2 s_j (z_j - x_j))
+                np.multiply.outer(2.0 * g * (z[j] - x), sv_t[j], out=arg)
+                arg += arg0
+                arg += (-g * (z[j] * z[j] - x * x))[:, None]
+                np.minimum(arg, 0.0, out=arg)
+                np.exp(arg, out=arg)
+                out[rows, j, 0] = f - arg @ self.dual
+        return out
+
+    def outputs(self, contrib: np.ndarray, X: np.ndarray) -> np.ndarray:
+        return self.decision(np.asarray(X, dtype=np.float64))[:, None]
+
+    def predict_index(self, output: np.ndarray) -> np.ndarray:
+        return (output[:, 0] > 0).astype(np.intp)
+
+    def class_view(self, values: np.ndarray) -> np.ndarray:
+        return np.concatenate([-values, values], axis=-1)
+
+class Explainer:
+    """The pipeline's preprocessing steps in sklearn, then the final estimator's attribution."""
+    def __init__(self, pipe, columns: List[str]):
+        self.pipe = pipe
+        est = pipe[-1] if hasattr(pipe, "steps") else pipe
+        self.head = pipe[:-1] if hasattr(pipe, "steps") and len(pipe) > 1 else None
+        name = type(est).__name__
+        if name == "SVC":
+            if est.kernel != "rbf" or len(est.classes_) != 2:
+                raise TypeError("Only binary RBF SVMs can be explained.")
+            empty = pd.DataFrame(np.full((1, len(columns)), np.nan), columns=columns)
+            self.model = KernelOcclusion(est, self._transform(empty))
+        else:
+            cls, arrays = _flatten(est)   # TypeError for other estimators
+            self.model = TreePaths(cls, arrays)
+        self.feature_names = self._feature_names(columns)
+
+    def _transform(self, X) -> np.ndarray:
+        return np.asarray(self.head.transform(X) if self.head is not None else X)
+
+    def _feature_names(self, columns: List[str]) -> List[str]:
+        try:
+            return [str(c) for c in self.head.get_feature_names_out()]
+        except Exception:
+            return [str(c) for c in columns]
+
+    def explain(self,
+                X: pd.DataFrame,
+                top: int,
+                target: Optional[Any] = None) -> Dict[str, np.ndarray]:
+        """
+        Top contributions per row toward the predicted class (or class `target`, one of the
+        estimator's classes_). Returns arrays: pred and target (classes_ values), base and
+        output (model units, for the target class), and per top feature (rows, top): feature
+        index, input value, contribution.
+        """
+        Xt = self._transform(X)
+        contrib = self.model.contributions(Xt)
+        output = self.model.outputs(contrib, Xt)
+        classes = self.model.classes_
+        pred = self.model.predict_index(output)
+        tgt = pred if target is None else np.full(len(pred), np.flatnonzero(classes == target)[0], dtype=np.intp)
+        rows = np.arange(len(pred))
+        per_class = self.model.class_view(contrib)[rows, :, tgt]          # (rows, features)
+        base = self.model.class_view(self.model.bias[None, :])[0][tgt]
+        out = self.model.class_view(output)[rows, tgt]
+        top = min(top, per_class.shape[1])
+        order = np.argsort(-np.abs(per_class), axis=1, kind="stable")[:, :top]
+        inputs = X.reindex(columns=self.feature_names).to_numpy(dtype=np.float64)
+        return {
+            "pred": classes.take(pred),
+            "target": classes.take(tgt),
+            "base": base,
+            "output": out,
+            "feature": order,
+            "value": np.take_along_axis(inputs, order, axis=1),
+            "contribution": np.take_along_axis(per_class, order, axis=1),
+        }
+
+    def describe(self) -> Dict[str, Any]:
+        return {"method": self.model.method, "units": self.model.units, "features": len(self.feature_names)}
+
+def top_features(feature_names: List[str],
+                 feature: np.ndarray,
+                 value: np.ndarray,
+                 contribution: np.ndarray) -> List[List[Dict[str, Any]]]:
+    """Per row: [{"feature", "value", "contribution"}, ...] (value is the model input, None if missing)."""
+    names = np.asarray(feature_names, dtype=object)[feature].tolist()
+    values = np.where(np.isnan(value), None, value).tolist()
+    return [
+        [{"feature": n, "value": v, "contribution": c} for n, v, c in zip(*row)]
+        for row in zip(names, values, contribution.tolist())
+    ]
@@ -0,0 +1,308 @@
+# fastpath.py
+# Flattened tree ensembles. The K2 RandomForest and TESS HistGradientBoosting classifiers are
+# exported once into contiguous NumPy arrays (feature, threshold, children, leaf values for
+# every node of every tree), and scored by walking all trees for a block of rows together,
+# one tree level per step. This skips sklearn's per-call validation and per-estimator Python
+# dispatch, which dominates request-sized batches (a few rows through 500 trees); on large
+# batches sklearn's compiled walk is faster, so the app only routes small batches here.
+# The exported file is an uncompressed joblib dict, so the arrays can be memory-mapped and
+# shared between workers like the pipelines themselves.
+#
+# Export:  python -m app.fastpath artifacts/k2/k2_randomforest_pipeline.joblib
+# writes artifacts/k2/k2_randomforest_pipeline.fastpath.joblib next to the pipeline, after
+# checking it against the sklearn model. The app picks it up on the next model load.
+
+import argparse
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+import joblib
+import numpy as np
+
+FORMAT_VERSION = 2
+BLOCK_ROWS = 128  # rows walked together; small blocks keep the gathered node/X data in cache
+
+def fastpath_path(pipeline_path: str) -> str:
+    root, _ = os.path.splitext(pipeline_path)
+    return f"{root}.fastpath.joblib"
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _breadth_first(left: np.ndarray, right: np.ndarray, is_leaf: np.ndarray) -> np.ndarray:
+    """Node order in which the two children of every split are stored next to each other."""
+    order = [0]
+    for node in order:  # grows while iterating
+        if not is_leaf[node]:
+            order += [int(left[node]), int(right[node])]
+    return np.asarray(order, dtype=np.intp)
+
+class _FlatTrees:
+    """
+    All nodes of all trees in one set of arrays. Siblings are adjacent, so a step is
+    `node = left[node] + went_right`; leaves point to themselves with an infinite threshold,
+    so walking a fixed `depth` steps from each root ends on the leaf for every tree.
+    """
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.missing_right = arrays["missing_right"]
+        self.roots = arrays["roots"]
+        self.depth = int(arrays["depth"])
+        self.has_missing = bool(self.missing_right.any())
+
+    @staticmethod
+    def _pack(trees: List[Dict[str, np.ndarray]], threshold_dtype=np.float64) -> Dict[str, np.ndarray]:
+        parts: Dict[str, list] = {k: [] for k in ("feature", "threshold", "left", "missing_right", "value")}
+        roots, offset = [], 0
+        for t in trees:
+            order = _breadth_first(t["left"], t["right"], t["is_leaf"])
+            pos = np.empty(len(t["left"]), dtype=np.intp)
+            pos[order] = np.arange(len(order))
+            leaf = t["is_leaf"][order]
+            parts["feature"].append(np.where(leaf, 0, t["feature"][order]))
+            parts["threshold"].append(np.where(leaf, np.inf, t["threshold"][order]))
+            parts["left"].append(np.where(leaf, np.arange(len(order)), pos[np.maximum(t["left"][order], 0)]) + offset)
+            parts["missing_right"].append(~leaf & ~t["missing_left"][order])
+            parts["value"].append(t["value"][order])
+            roots.append(offset)
+            offset += len(order)
+        out = {k: np.concatenate(v) for k, v in parts.items()}
+        out["feature"] = out["feature"].astype(np.intp)
+        out["left"] = out["left"].astype(np.intp)
+        thr = out["threshold"].astype(threshold_dtype)
+        if threshold_dtype == np.float32:
+            # x <= t for a float32 x is x <= (largest float32 <= t): round down, never up
+            up = thr.astype(np.float64) > out["threshold"]
+            thr[up] = np.nextafter(thr[up], np.float32(-np.inf))
+        out["threshold"] = thr
+        out["roots"] = np.asarray(roots, dtype=np.intp)
+        out["depth"] = np.int64(max(int(t["depth"]) for t in trees))
+        return out
+
+    def leaves(self, X: np.ndarray) -> np.ndarray:
+        """(n_trees, n_rows) global leaf index reached by each row in each tree."""
+        X = np.ascontiguousarray(X, dtype=self.threshold.dtype)
+        flat_x = X.ravel()
+        row_base = np.arange(X.shape[0], dtype=np.intp) * X.shape[1]
+        node = np.repeat(self.roots[:, None], X.shape[0], axis=1)
+        check_nan = self.has_missing and bool(np.isnan(flat_x).any())
+        for _ in range(self.depth):
+            x = flat_x.take(self.feature.take(node) + row_base)
+            went_right = x > self.threshold.take(node)
+            if check_nan:
+                went_right |= np.isnan(x) & self.missing_right.take(node)
+            node = self.left.take(node) + went_right
+        return node
+
+class FlatForest(_FlatTrees):
+    """RandomForestClassifier / ExtraTreesClassifier: mean of the per-tree leaf class fractions."""
+    kind = "forest"
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        super().__init__(arrays)
+        self.value = arrays["value"]
+        self.classes_ = arrays["classes"]
+
+    @classmethod
+    def export(cls, est) -> Dict[str, np.ndarray]:
+        if est.n_outputs_ != 1:
+            raise TypeError("Only single-output forests can be flattened.")
+        n_classes = int(est.n_classes_)
+        trees = []
+        for e in est.estimators_:
+            t = e.tree_
+            trees.append({
+                "feature": t.feature,
+                "threshold": t.threshold,
+                "left": t.children_left,
+                "right": t.children_right,
+                "is_leaf": t.children_left < 0,
+                "missing_left": np.asarray(getattr(t, "missing_go_to_left", np.ones(t.node_count)), dtype=bool),
+                "value": t.value[:, 0, :n_classes].astype(np.float64),
+                "depth": t.max_depth,
+            })
+        # sklearn trees score float32 inputs, so thresholds can be compared in float32 too
+        arrays = cls._pack(trees, threshold_dtype=np.float32)
+        arrays["classes"] = np.asarray(est.classes_)
+        return arrays
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32)
+        out = np.empty((X.shape[0], self.value.shape[1]), dtype=np.float64)
+        for lo in range(0, X.shape[0], BLOCK_ROWS):
+            leaf_vals = self.value.take(self.leaves(X[lo:lo + BLOCK_ROWS]), axis=0)  # (trees, rows, classes)
+            # summing over the leading axis adds tree by tree, in the order sklearn accumulates
+            out[lo:lo + BLOCK_ROWS] = leaf_vals.sum(axis=0) / len(self.roots)
+        return out
+
+def _expected_values(nodes: np.ndarray) -> np.ndarray:
+    """
+    HistGB node values with each split node set to the sample-weighted mean of its leaves
+    (sklearn keeps an unshrunk value there). Scoring only reads leaves; explain.py reads the
+    split nodes as the expected output below them.
+    """
+    value = nodes["value"].astype(np.float64)
+    count = nodes["count"].astype(np.float64)
+    for i in range(len(nodes) - 1, -1, -1):   # children are stored after their parent
+        if not nodes["is_leaf"][i]:
+            left, right = nodes["left"][i], nodes["right"][i]
+            value[i] = (value[left] * count[left] + value[right] * count[right]) / max(count[left] + count[right], 1.0)
+    return value
+
+class FlatBoosting(_FlatTrees):
+    """HistGradientBoostingClassifier on numeric features: baseline + sum of leaf values, then the loss link."""
+    kind = "boosting"
+
+    def __init__(self, arrays: Dict[str, np.ndarray], loss: Any):
+        super().__init__(arrays)
+        self.value = arrays["value"]
+        self.tree_class = arrays["tree_class"]
+        self.baseline = arrays["baseline"]
+        self.classes_ = arrays["classes"]
+        self.loss = loss
+
+    @classmethod
+    def export(cls, est) -> Dict[str, np.ndarray]:
+        categorical = getattr(est, "is_categorical_", None)
+        if getattr(est, "_preprocessor", None) is not None or (categorical is not None and np.any(categorical)):
+            raise TypeError("Categorical HistGradientBoosting splits are not supported by the fast path.")
+        trees, tree_class = [], []
+        for iteration in est._predictors:
+            for k, predictor in enumerate(iteration):
+                nodes = predictor.nodes
+                trees.append({
+                    "feature": nodes["feature_idx"].astype(np.intp),
+                    "threshold": nodes["num_threshold"].astype(np.float64),
+                    "left": nodes["left"].astype(np.intp),
+                    "right": nodes["right"].astype(np.intp),
+                    "is_leaf": nodes["is_leaf"].astype(bool),
+                    "missing_left": nodes["missing_go_to_left"].astype(bool),
+                    "value": _expected_values(nodes),
+                    "depth": int(nodes["depth"].max()),
+                })
+                tree_class.append(k)
+        arrays = cls._pack(trees)
+        arrays["tree_class"] = np.asarray(tree_class, dtype=np.intp)
+        arrays["baseline"] = np.asarray(est._baseline_prediction, dtype=np.float64).reshape(-1)
+        arrays["classes"] = np.asarray(est.classes_)
+        return arrays
+
+    def raw_predict(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        raw = np.empty((X.shape[0], len(self.baseline)), dtype=np.float64, order="F")
+        for lo in range(0, X.shape[0], BLOCK_ROWS):
+            leaf_vals = self.value.take(self.leaves(X[lo:lo + BLOCK_ROWS]))  # (trees, rows)
+            for k, base in enumerate(self.baseline):
+                # baseline first, then iteration order, as sklearn accumulates. cumsum is always
+                # sequential; sum(axis=0) turns pairwise (different rounding) on a single row.
+                terms = np.concatenate([np.full((1, leaf_vals.shape[1]), base), leaf_vals[self.tree_class == k]])
+                raw[lo:lo + BLOCK_ROWS, k] = np.cumsum(terms, axis=0)[-1]
+        return raw
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self.loss.predict_proba(self.raw_predict(X))
+
+class FastPipeline:
+    """
+    Drop-in for pipe.predict / pipe.predict_proba: the pipeline's preprocessing steps run in
+    sklearn as usual, the final ensemble runs on the flattened arrays.
+    """
+    def __init__(self, pipe, flat):
+        self.pipe = pipe
+        self.flat = flat
+        self.classes_ = flat.classes_
+
+    def _transform(self, X):
+        Xt = self.pipe[:-1].transform(X) if len(self.pipe) > 1 else X
+        return np.asarray(Xt)
+
+    def predict_proba(self, X) -> np.ndarray:
+        return self.flat.predict_proba(self._transform(X))
+
+    def predict(self, X) -> np.ndarray:
+        return self.classes_.take(np.argmax(self.predict_proba(X), axis=1), axis=0)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"kind": self.flat.kind, "trees": int(len(self.flat.roots)),
+                "nodes": int(len(self.flat.feature)), "depth": self.flat.depth}
+
+def _flatten(est):
+    name = type(est).__name__
+    if name in ("RandomForestClassifier", "ExtraTreesClassifier"):
+        return FlatForest, FlatForest.export(est)
+    if name == "HistGradientBoostingClassifier":
+        return FlatBoosting, FlatBoosting.export(est)
+    raise TypeError(f"No fast path for {name}.")
+
+def _build(cls, arrays, est):
+    return FlatForest(arrays) if cls is FlatForest else FlatBoosting(arrays, est._loss)
+
+def probe_rows(flat: _FlatTrees, n_rows: int, seed: int = 0) -> np.ndarray:
+    """Rows built from the split thresholds themselves (exact, just above, just below, NaN)."""
+    rng = np.random.default_rng(seed)
+    n_features = int(flat.feature.max()) + 1
+    inner = np.isfinite(flat.threshold)
+    X = rng.normal(size=(n_rows, n_features))
+    for j in range(n_features):
+        thr = flat.threshold[inner & (flat.feature == j)]
+        if len(thr):
+            pick = rng.choice(thr, n_rows) + rng.choice([-1e-6, 0.0, 1e-6], n_rows)
+            X[:, j] = np.where(rng.random(n_rows) < 0.8, pick, X[:, j])
+    return X
+
+def check_parity(fast: FastPipeline, est, X: np.ndarray) -> None:
+    """Assert the flattened model reproduces est.predict_proba / est.predict on X (post-preprocessing) bit for bit."""
+    got = fast.flat.predict_proba(X)
+    np.testing.assert_array_equal(got, est.predict_proba(X))
+    np.testing.assert_array_equal(fast.classes_.take(np.argmax(got, axis=1)), est.predict(X))
+
+def export(pipeline_path: str, out_path: Optional[str] = None, check_rows: int = 20000) -> str:
+    pipe = joblib.load(pipeline_path)
+    est = pipe[-1] if hasattr(pipe, "steps") else pipe
+    cls, arrays = _flatten(est)
+    fast = FastPipeline(pipe, _build(cls, arrays, est))
+    X = probe_rows(fast.flat, check_rows)
+    if cls is FlatBoosting:
+        X[np.random.default_rng(1).random(X.shape) < 0.05] = np.nan  # HistGB routes NaN itself
+    check_parity(fast, est, X)
+    arrays.update({
+        "format_version": np.int64(FORMAT_VERSION),
+        "kind": np.array(cls.kind),
+        "source_sha256": np.array(file_sha256(pipeline_path)),
+    })
+    out_path = out_path or fastpath_path(pipeline_path)
+    joblib.dump(arrays, out_path)  # uncompressed: loadable with mmap_mode
+    print(f"{pipeline_path}: {fast.describe()} -> {out_path} (bit-identical on {check_rows} rows)")
+    return out_path
+
+def load_fastpath(pipeline_path: str, pipe, mmap_mode: Optional[str] = None) -> Optional[FastPipeline]:
+    """The exported fast path for this pipeline, or None if absent or exported from a different file."""
+    path = fastpath_path(pipeline_path)
+    if not os.path.exists(path):
+        return None
+    arrays = joblib.load(path, mmap_mode=mmap_mode)
+    if int(arrays.get("format_version", -1)) != FORMAT_VERSION:
+        raise ValueError(f"{path}: unsupported fast-path format; re-export it.")
+    if str(arrays["source_sha256"]) != file_sha256(pipeline_path):
+        raise ValueError(f"{path} was exported from a different pipeline file; re-export it.")
+    est = pipe[-1] if hasattr(pipe, "steps") else pipe
+    cls = FlatForest if str(arrays["kind"]) == FlatForest.kind else FlatBoosting
+    return FastPipeline(pipe, _build(cls, arrays, est))
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Export flattened fast-path arrays for tree-ensemble pipelines")
+    ap.add_argument("pipelines", nargs="+", help="pipeline .joblib files")
+    ap.add_argument("--check-rows", type=int, default=20000)
+    args = ap.parse_args()
+    for path in args.pipelines:
+        export(path, check_rows=args.check_rows)
+
+if __name__ == "__main__":
+    main()
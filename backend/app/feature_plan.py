@@ -0,0 +1,251 @@
+# feature_plan.py
+# Declarative preprocessing: each ModelSpec describes its transforms (drops, *lim drop,
+# relative-error features, one-hot columns, *_was_missing flags) and that description is
+# compiled once, against the model's train_features, into a FeaturePlan. The plan fills a
+# preallocated float64 (or, for models that compute in float32, float32) matrix in
+# train_features order in a single pass over the outputs. Values are computed in float64
+# and rounded once when stored, exactly as the estimator would round a float64 matrix.
+
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+MISSING_SUFFIX = "_was_missing"
+REL_ERROR_SUFFIX = "_rel_error"
+REL_UPPER_SUFFIX = "_rel_err_upper"
+REL_LOWER_SUFFIX = "_rel_err_lower"
+
+@dataclass(frozen=True)
+class FeatureOp:
+    """How one output column is produced from the parsed upload."""
+    kind: str                          # "raw" | "rel" | "onehot" | "flag"
+    source: str                        # raw column, rel-error base or one-hot source column
+    arg: Optional[str] = None          # rel variant ("mean"/"upper"/"lower") or one-hot level
+    inner: Optional["FeatureOp"] = None  # for flags: the value the flag is computed on
+
+def _to_float(s: pd.Series) -> np.ndarray:
+    """Numeric coercion (pd.to_numeric(errors='coerce')) straight to a float64 array."""
+    if s.dtype.kind not in "biuf":
+        s = pd.to_numeric(s, errors="coerce")
+    return s.to_numpy(dtype=np.float64, na_value=np.nan)
+
+def numeric_block(df: pd.DataFrame, cols: Sequence[str], cache: Optional[Dict[str, np.ndarray]] = None) -> np.ndarray:
+    """Stack numeric-coerced columns into one preallocated (n_rows, len(cols)) float64 array."""
+    out = np.empty((len(df), len(cols)), dtype=np.float64, order="F")
+    for j, c in enumerate(cols):
+        v = cache.get(c) if cache is not None else None
+        if v is None:
+            v = _to_float(df[c])
+            if cache is not None:
+                cache[c] = v
+        out[:, j] = v
+    return out
+
+def relative_errors(val: np.ndarray,
+                    err1: np.ndarray,
+                    err2: np.ndarray,
+                    min_den: float,
+                    asymmetric: bool = False,
+                    copy: bool = True) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+    Relative errors for a whole block of value/err1/err2 columns at once (arrays of equal
+    shape). Returns (mean, upper, lower); upper/lower are None unless asymmetric.
+    With copy=False the input blocks are reused as scratch/output space.
+    """
+    if copy:
+        val, err1, err2 = val.copy(), err1.copy(), err2.copy()
+    denom = np.abs(val, out=val)
+    np.maximum(denom, min_den, out=denom)
+    np.abs(err1, out=err1)
+    np.abs(err2, out=err2)
+    mean = np.add(err1, err2, out=None if asymmetric else err1)
+    mean /= 2.0
+    mean /= denom
+    if not asymmetric:
+        return mean, None, None
+    err1 /= denom
+    err2 /= denom
+    return mean, err1, err2
+
+class _Binding:
+    """The subset of a plan that is computable for one particular set of input columns."""
+    def __init__(self, plan: "FeaturePlan", columns: Sequence[str]):
+        kept = [c for c in columns
+                if c not in plan.cols_to_drop and not (plan.drop_lim_cols and str(c).endswith("lim"))]
+        kept_set = set(kept)
+        # _err1/_err2 pairs are consumed by the relative-error step (even if the base is missing)
+        self.err_pairs = {str(c)[:-5] for c in kept
+                          if str(c).endswith("_err1") and f"{str(c)[:-5]}_err2" in kept_set}
+        consumed = {f"{b}_err{k}" for b in self.err_pairs for k in (1, 2)}
+        self.onehot_sources = {c for c in plan.one_hot_cols if c in kept_set}
+        self.numeric = kept_set - consumed - set(plan.one_hot_cols) - {plan.label_col}
+
+    def available(self, op: FeatureOp) -> bool:
+        if op.kind == "raw":
+            return op.source in self.numeric
+        if op.kind == "rel":
+            return op.source in self.err_pairs and op.source in self.numeric
+        if op.kind == "onehot":
+            return op.source in self.onehot_sources
+        return True  # flags are always computable (from a NaN column if need be)
+
+class FeaturePlan:
+    """
+    Compiled per-model preprocessing. Output semantics, per train_features column:
+      - <col>                 numeric value of <col> (NaN if absent/dropped)
+      - <base>_rel_error      mean(|err1|, |err2|) / max(|base|, min_den) from <base>_err1/_err2
+      - <src>_<level>         one-hot of a one_hot_cols source against the training vocabulary
+                              (<src>_nan marks missing; NaN if the source column is absent)
+      - <col>_was_missing     1.0 where the value of <col> is missing, else 0.0
+    Every rule is row-local, so transforming chunks gives the same rows as transforming the
+    whole file.
+    """
+    def __init__(self,
+                 features: List[str],
+                 ops: List[FeatureOp],
+                 *,
+                 cols_to_drop: Iterable[str],
+                 drop_lim_cols: bool,
+                 one_hot_cols: Iterable[str],
+                 label_col: Optional[str],
+                 min_den: float):
+        self.features = list(features)
+        self.ops = ops
+        self.cols_to_drop = frozenset(cols_to_drop)
+        self.drop_lim_cols = drop_lim_cols
+        self.one_hot_cols = tuple(one_hot_cols)
+        self.label_col = label_col
+        self.min_den = min_den
+        self._bindings: Dict[Tuple[str, ...], _Binding] = {}
+
+    @classmethod
+    def compile(cls,
+                train_features: List[str],
+                *,
+                cols_to_drop: Iterable[str] = (),
+                drop_lim_cols: bool = False,
+                one_hot_cols: Iterable[str] = (),
+                missing_flags: bool = False,
+                keep_asymmetric: bool = False,
+                min_den: float = 1e-12,
+                label_col: Optional[str] = None) -> "FeaturePlan":
+        one_hot_cols = list(one_hot_cols)
+        rel_suffixes = [(REL_ERROR_SUFFIX, "mean")]
+        if keep_asymmetric:
+            rel_suffixes += [(REL_UPPER_SUFFIX, "upper"), (REL_LOWER_SUFFIX, "lower")]
+
+        def value_op(name: str) -> FeatureOp:
+            for src in one_hot_cols:
+                if name.startswith(src + "_"):
+                    return FeatureOp("onehot", src, name[len(src) + 1:])
+            for suffix, variant in rel_suffixes:
+                if name.endswith(suffix):
+                    return FeatureOp("rel", name[:-len(suffix)], variant)
+            return FeatureOp("raw", name)
+
+        ops = []
+        for name in train_features:
+            if missing_flags and name.endswith(MISSING_SUFFIX):
+                base = name[:-len(MISSING_SUFFIX)]
+                ops.append(FeatureOp("flag", base, inner=value_op(base)))
+            else:
+                ops.append(value_op(name))
+        return cls(train_features, ops,
+                   cols_to_drop=cols_to_drop, drop_lim_cols=drop_lim_cols,
+                   one_hot_cols=one_hot_cols, label_col=label_col, min_den=min_den)
+
+    def _bind(self, columns: Sequence[str]) -> _Binding:
+        key = tuple(columns)
+        b = self._bindings.get(key)
+        if b is None:
+            if len(self._bindings) >= 32:
+                self._bindings.clear()
+            b = self._bindings[key] = _Binding(self, key)
+        return b
+
+    def input_columns(self, columns: Sequence[str]) -> List[str]:
+        """
+        The columns (of `columns`, in order) that transform_matrix reads, plus the label column.
+        Binding just these gives the same outputs as binding all of them, so columnar readers
+        can project at read time.
+        """
+        binding = self._bind(columns)
+        needed = {self.label_col} if self.label_col else set()
+        for op in self.ops:
+            op = op.inner if op.kind == "flag" else op
+            if op is None or not binding.available(op):
+                continue
+            if op.kind == "rel":
+                needed.update((op.source, f"{op.source}_err1", f"{op.source}_err2"))
+            else:
+                needed.add(op.source)
+        return [c for c in columns if c in needed]
+
+    def _relative_errors(self,
+                         df: pd.DataFrame,
+                         binding: _Binding,
+                         numeric: Dict[str, np.ndarray]) -> Dict[Tuple[str, str], np.ndarray]:
+        """All relative-error outputs the binding can compute, in one vectorized block."""
+        ops = [op.inner if op.kind == "flag" else op for op in self.ops]
+        bases = list(dict.fromkeys(op.source for op in ops
+                                   if op is not None and op.kind == "rel" and binding.available(op)))
+        if not bases:
+            return {}
+        asymmetric = any(op is not None and op.kind == "rel" and op.arg != "mean" for op in ops)
+        val = numeric_block(df, bases, numeric)
+        err1 = numeric_block(df, [f"{b}_err1" for b in bases], numeric)
+        err2 = numeric_block(df, [f"{b}_err2" for b in bases], numeric)
+        out = {}
+        for variant, block in zip(("mean", "upper", "lower"),
+                                  relative_errors(val, err1, err2, self.min_den, asymmetric, copy=False)):
+            if block is not None:
+                out.update({(b, variant): block[:, j] for j, b in enumerate(bases)})
+        return out
+
+    def transform_matrix(self, df: pd.DataFrame, dtype: type = np.float64) -> np.ndarray:
+        """Return the aligned (n_rows, n_features) matrix of `dtype` for a parsed upload frame."""
+        binding = self._bind(df.columns)
+        n = len(df)
+        X = np.empty((n, len(self.features)), dtype=dtype, order="F")
+        numeric: Dict[str, np.ndarray] = {}
+        factorized: Dict[str, Tuple[np.ndarray, Dict[str, int]]] = {}
+        rel = self._relative_errors(df, binding, numeric)
+
+        def num(col: str) -> np.ndarray:
+            v = numeric.get(col)
+            if v is None:
+                v = numeric[col] = _to_float(df[col])
+            return v
+
+        def value(op: FeatureOp) -> Optional[np.ndarray]:
+            if not binding.available(op):
+                return None
+            if op.kind == "raw":
+                return num(op.source)
+            if op.kind == "rel":
+                return rel[(op.source, op.arg)]
+            # one-hot: factorize the source once, then compare integer codes per level
+            f = factorized.get(op.source)
+            if f is None:
+                codes, uniques = pd.factorize(df[op.source])
+                f = factorized[op.source] = (codes, {str(u): i for i, u in enumerate(uniques)})
+            codes, lookup = f
+            code = -1 if op.arg == "nan" else lookup.get(op.arg)
+            if code is None:
+                return np.zeros(n, dtype=bool)
+            return codes == code
+
+        for j, op in enumerate(self.ops):
+            if op.kind == "flag":
+                v = value(op.inner)
+                X[:, j] = 1.0 if v is None else np.isnan(v)
+            else:
+                v = value(op)
+                X[:, j] = np.nan if v is None else v
+        return X
+
+    def transform(self, df: pd.DataFrame, dtype: type = np.float64) -> pd.DataFrame:
+        """transform_matrix wrapped (without copying) in a frame with train_features columns."""
+        return pd.DataFrame(self.transform_matrix(df, dtype), columns=self.features, index=df.index, copy=False)
@@ -0,0 +1,126 @@
+# headers.py
+# Header sniffing on a bounded prefix of an upload. Only the first max_lines lines (and at
+# most max_bytes bytes) are decoded and split, each row is normalized once, and identifier
+# lookups are set intersections against token sets precomputed per model.
+#
+# sniff_catalog() also tells which registered model a file belongs to: every model has a
+# signature (the raw column names its catalog carries: header identifiers, label, dropped
+# ID columns and the sources of its training features), and the header row is scored
+# against all of them in one pass.
+
+import csv
+import io
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+from .feature_plan import MISSING_SUFFIX, REL_ERROR_SUFFIX
+
+SNIFF_LINES = 200
+SNIFF_BYTES = 1 << 20
+
+def normalize(name: Any) -> str:
+    return str(name).strip().lower()
+
+def token_set(names: Iterable[Any]) -> FrozenSet[str]:
+    """Normalized column names; a frozenset is taken as already normalized and passed through."""
+    if isinstance(names, frozenset):
+        return names
+    return frozenset(normalize(n) for n in names)
+
+def prefix_lines(content: bytes, max_lines: int = SNIFF_LINES, max_bytes: int = SNIFF_BYTES) -> bytes:
+    """The bytes of the first max_lines lines, cut at max_bytes (no full-payload copy or decode)."""
+    limit = min(len(content), max_bytes)
+    end = 0
+    for _ in range(max_lines):
+        nl = content.find(b"\n", end, limit)
+        if nl < 0:
+            return content[:limit]
+        end = nl + 1
+    return content[:end]
+
+def read_stream_prefix(fobj, max_lines: int = SNIFF_LINES, max_bytes: int = SNIFF_BYTES) -> bytes:
+    """prefix_lines() for a binary file object, which is rewound afterwards."""
+    fobj.seek(0)
+    lines, left = [], max_bytes
+    for _ in range(max_lines):
+        line = fobj.readline(left)
+        if not line:
+            break
+        lines.append(line)
+        left -= len(line)
+        if left <= 0:
+            break
+    fobj.seek(0)
+    return b"".join(lines)
+
+def header_rows(prefix: bytes, max_lines: int = SNIFF_LINES) -> Iterator[Tuple[int, Set[str]]]:
+    """(row index, normalized cells) for each CSV row of the prefix."""
+    reader = csv.reader(io.StringIO(prefix.decode("utf-8", errors="ignore")))
+    try:
+        for i, row in enumerate(reader):
+            if i >= max_lines:
+                return
+            yield i, {c.strip().lower() for c in row}
+    except csv.Error:   # the prefix ended inside a quoted field
+        return
+
+def find_header_row(prefix: bytes, tokens: FrozenSet[str], max_lines: int = SNIFF_LINES) -> Optional[int]:
+    """Index of the first row containing any of `tokens`, or None."""
+    for i, cells in header_rows(prefix, max_lines):
+        if not tokens.isdisjoint(cells):
+            return i
+    return None
+
+def catalog_signature(header_identifiers: Iterable[str],
+                      label_col: str,
+                      cols_to_drop: Sequence[str],
+                      one_hot_cols: Sequence[str],
+                      train_features: Optional[Sequence[str]]) -> FrozenSet[str]:
+    """
+    The raw columns an upload of this catalog carries. Derived training features are mapped
+    back to their sources: <base>_rel_error to <base>, <base>_err1 and <base>_err2; one-hot
+    columns to the categorical; <col>_was_missing flags are skipped.
+    """
+    names: List[str] = [*header_identifiers, label_col, *cols_to_drop, *one_hot_cols]
+    for f in train_features or ():
+        if f.endswith(MISSING_SUFFIX) or any(f.startswith(c + "_") for c in one_hot_cols):
+            continue
+        if f.endswith(REL_ERROR_SUFFIX):
+            base = f[:-len(REL_ERROR_SUFFIX)]
+            names.extend((base, f"{base}_err1", f"{base}_err2"))
+        else:
+            names.append(f)
+    return token_set(names)
+
+def score_catalogs(cells: Set[str], signatures: Dict[str, FrozenSet[str]]) -> Dict[str, Tuple[int, float]]:
+    """Per model: (signature columns present in the header, fraction of the signature present)."""
+    out = {}
+    for slug, sig in signatures.items():
+        hits = len(sig.intersection(cells))
+        out[slug] = (hits, hits / len(sig) if sig else 0.0)
+    return out
+
+def best_catalog(cells: Set[str],
+                 identifiers: Dict[str, FrozenSet[str]],
+                 signatures: Dict[str, FrozenSet[str]]) -> Tuple[Optional[str], Dict[str, Tuple[int, float]]]:
+    """
+    The model whose signature shares the most columns with a header (ties: the larger share
+    of the signature), or None if the header has none of the models' identifiers.
+    """
+    if all(ids.isdisjoint(cells) for ids in identifiers.values()):
+        return None, {}
+    scores = score_catalogs(cells, signatures)
+    return max(scores, key=lambda slug: scores[slug]), scores
+
+def sniff_catalog(prefix: bytes,
+                  identifiers: Dict[str, FrozenSet[str]],
+                  signatures: Dict[str, FrozenSet[str]],
+                  max_lines: int = SNIFF_LINES) -> Tuple[Optional[int], Optional[str], Dict[str, Tuple[int, float]]]:
+    """
+    Find the header row (the first row with any model's identifier) and its best_catalog().
+    Returns (header row, slug, scores); (None, None, {}) if no row has an identifier.
+    """
+    for i, cells in header_rows(prefix, max_lines):
+        slug, scores = best_catalog(cells, identifiers, signatures)
+        if slug is not None:
+            return i, slug, scores
+    return None, None, {}
@@ -0,0 +1,203 @@
+# jobs.py
+# On-disk job store for long-running batch requests (whole-catalog /analyze and /evaluate).
+# One SQLite table holds every job's parameters, status and progress; the uploaded file and
+# the finished result live next to it as plain files. SQLite serializes the writers, so
+# several uvicorn worker processes can share one store: claiming a queued job is a single
+# transaction, and cancellation is a flag any process can set and the runner polls.
+
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, BinaryIO, Dict, List, Optional
+
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED = ("done", "failed", "cancelled")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id          TEXT PRIMARY KEY,
+    kind        TEXT NOT NULL,
+    model       TEXT NOT NULL,
+    fmt         TEXT NOT NULL,
+    params      TEXT NOT NULL,
+    status      TEXT NOT NULL,
+    rows_done   INTEGER NOT NULL DEFAULT 0,
+    rows_total  INTEGER,
+    cancel      INTEGER NOT NULL DEFAULT 0,
+    worker      TEXT,
+    error       TEXT,
+    error_status INTEGER,
+    input_path  TEXT,
+    input_bytes INTEGER,
+    result_path TEXT,
+    created     REAL NOT NULL,
+    started     REAL,
+    finished    REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created);
+"""
+
+class JobCancelled(BaseException):
+    """
+    Raised inside a running job once its cancel flag is seen. A BaseException, like
+    asyncio.CancelledError, so the request path's `except Exception` handlers let it through.
+    """
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def _alive(worker: Optional[str]) -> bool:
+    """Whether the process that claimed a job still runs (only decidable on this host)."""
+    if not worker:
+        return False
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except (OSError, ValueError):
+        return False
+    return True
+
+class JobStore:
+    DB_NAME = "jobs.sqlite3"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._db = sqlite3.connect(os.path.join(root, self.DB_NAME), timeout=30,
+                                   isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(_SCHEMA)
+
+    @classmethod
+    def exists(cls, root: str) -> bool:
+        """Whether a store has been created under root (opening one creates it)."""
+        return os.path.exists(os.path.join(root, cls.DB_NAME))
+
+    def _exec(self, sql: str, args: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    def path(self, job_id: str, suffix: str) -> str:
+        return os.path.join(self.root, f"{job_id}.{suffix}")
+
+    # ---- submit / inspect ----
+    def create(self, kind: str, model: str, fmt: str, params: Dict[str, Any], fobj: BinaryIO) -> str:
+        """Copy the upload next to the store and queue a job for it. Blocking: run it off the loop."""
+        job_id = uuid.uuid4().hex
+        input_path = self.path(job_id, "input")
+        with open(input_path, "wb") as out:
+            shutil.copyfileobj(fobj, out, 1 << 20)
+        self._exec(
+            "INSERT INTO jobs (id, kind, model, fmt, params, status, input_path, input_bytes, created) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, kind, model, fmt, json.dumps(params), input_path, os.path.getsize(input_path), time.time()),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        row = self._exec("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row is not None else None
+
+    def list(self, limit: int = 50, status: Optional[str] = None) -> List[Dict[str, Any]]:
+        if status:
+            rows = self._exec("SELECT * FROM jobs WHERE status = ? ORDER BY created DESC LIMIT ?", (status, limit))
+        else:
+            rows = self._exec("SELECT * FROM jobs ORDER BY created DESC LIMIT ?", (limit,))
+        return [dict(r) for r in rows.fetchall()]
+
+    def counts(self) -> Dict[str, int]:
+        rows = self._exec("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {s: 0 for s in STATUSES} | {r[0]: r[1] for r in rows}
+
+    # ---- runner side ----
+    def claim(self) -> Optional[Dict[str, Any]]:
+        """Atomically move the oldest queued job to running and return it."""
+        row = self._exec(
+            "UPDATE jobs SET status = 'running', started = ?, worker = ? "
+            "WHERE id = (SELECT id FROM jobs WHERE status = 'queued' ORDER BY created LIMIT 1) "
+            "RETURNING *",
+            (time.time(), _worker_id()),
+        ).fetchone()
+        return dict(row) if row is not None else None
+
+    def progress(self, job_id: str, rows_done: int, rows_total: Optional[int] = None) -> None:
+        if rows_total is None:
+            self._exec("UPDATE jobs SET rows_done = ? WHERE id = ?", (rows_done, job_id))
+        else:
+            self._exec("UPDATE jobs SET rows_done = ?, rows_total = ? WHERE id = ?", (rows_done, rows_total, job_id))
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self._exec("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def finish(self, job_id: str, status: str, result_path: Optional[str] = None,
+               error: Optional[str] = None, error_status: Optional[int] = None) -> None:
+        job = self.get(job_id)
+        self._exec(
+            "UPDATE jobs SET status = ?, result_path = ?, error = ?, error_status = ?, finished = ?, "
+            "input_path = NULL WHERE id = ?",
+            (status, result_path, error, error_status, time.time(), job_id),
+        )
+        if job is not None and job["input_path"]:
+            _remove(job["input_path"])  # the upload is not needed once the job has an outcome
+
+    def requeue_orphans(self) -> int:
+        """Jobs left 'running' by a process that no longer exists are queued again."""
+        rows = self._exec("SELECT id, worker FROM jobs WHERE status = 'running'").fetchall()
+        orphans = [r["id"] for r in rows if not _alive(r["worker"])]
+        for job_id in orphans:
+            self.requeue(job_id)
+        return len(orphans)
+
+    def requeue(self, job_id: str) -> None:
+        """Put a running job back in the queue (its runner is shutting down)."""
+        self._exec("UPDATE jobs SET status = 'queued', rows_done = 0, worker = NULL "
+                   "WHERE id = ? AND status = 'running'", (job_id,))
+
+    # ---- cancel / delete / expiry ----
+    def cancel(self, job_id: str) -> Optional[str]:
+        """Cancel a queued job now, flag a running one. Returns the status afterwards."""
+        job = self.get(job_id)
+        if job is None:
+            return None
+        self._exec("UPDATE jobs SET cancel = 1 WHERE id = ? AND status IN ('queued', 'running')", (job_id,))
+        cur = self._exec("UPDATE jobs SET status = 'cancelled', finished = ?, input_path = NULL "
+                         "WHERE id = ? AND status = 'queued'", (time.time(), job_id))
+        if cur.rowcount and job["input_path"]:
+            _remove(job["input_path"])
+        return self.get(job_id)["status"]
+
+    def delete(self, job_id: str) -> None:
+        job = self.get(job_id)
+        if job is None:
+            return
+        for p in (job["input_path"], job["result_path"]):
+            if p:
+                _remove(p)
+        self._exec("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def purge(self, older_than_s: float) -> int:
+        """Delete finished jobs (and their files) that finished more than older_than_s ago."""
+        cutoff = time.time() - older_than_s
+        rows = self._exec(
+            f"SELECT id FROM jobs WHERE status IN {FINISHED} AND finished < ?", (cutoff,)
+        ).fetchall()
+        for r in rows:
+            self.delete(r[0])
+        return len(rows)
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
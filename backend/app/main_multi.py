@@ -5,38 +5,111 @@ import os
 import io
 import csv
 import json
-from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import gc
+import hashlib
+import threading
+import time
+import zlib
+from concurrent.futures import Executor
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple, Union
 
 import joblib
 import numpy as np
 import pandas as pd
 import sklearn
-from sklearn.metrics import (
-    accuracy_score, f1_score, balanced_accuracy_score,
-    classification_report, confusion_matrix
-)
 
 from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import iterate_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+
+try:  # optional: faster JSON encoding of large responses
+    import orjson
+except ImportError:
+    orjson = None
+
+from .approx import ApproxPipeline, approx_path, load_approx
+from .archive import ArchiveError, archive_format, iter_members
+from .batching import MicroBatcher
+from .columnar import FORMAT_LABELS, column_names, read_columnar, upload_format
+from .confusion import ConfusionAccumulator
+from .drift import DriftSketch, baseline_path, compare, load_baseline, psi
+from .explain import Explainer, top_features
+from .fastpath import FastPipeline, load_fastpath
+from .headers import (SNIFF_BYTES, SNIFF_LINES, best_catalog, catalog_signature, find_header_row, normalize,
+                      prefix_lines, read_stream_prefix, sniff_catalog, token_set)
+from .feature_plan import FeaturePlan, numeric_block, relative_errors
+from .jobs import FINISHED, STATUSES, JobCancelled, JobStore
+from .metrics import (Gauge, MetricsMiddleware, add_rows, bind_context, observe_rows, render as render_metrics,
+                      set_model, stage_timer, start_context)
+from .result_cache import ResultCache, content_digest, make_key
+from .row_memo import RowMemo, row_keys, unique_rows
+from .workers import AdmissionGate, Overloaded, make_executor
 
 # ============================================================
 # Shared helpers
 # ============================================================
+HEADER_SNIFF_LINES = int(os.environ.get("EXO_HEADER_SNIFF_LINES", str(SNIFF_LINES)))  # lines searched for the header
+HEADER_SNIFF_BYTES = int(os.environ.get("EXO_HEADER_SNIFF_BYTES", str(SNIFF_BYTES)))  # ... within this many bytes
+
 def detect_header_row_from_bytes(content: bytes,
-                                 identifiers: List[str],
-                                 max_lines: int = 200) -> int:
-    text = content.decode("utf-8", errors="ignore")
-    reader = csv.reader(io.StringIO(text))
-    for i, row in enumerate(reader):
-        if i >= max_lines:
-            break
-        norm = [str(c).strip().lower() for c in row]
-        for token in identifiers:
-            if str(token).strip().lower() in norm:
-                return i
-    raise ValueError("Could not detect header. Update header_identifiers if needed.")
+                                 identifiers: Iterable[str],
+                                 max_lines: int = HEADER_SNIFF_LINES) -> int:
+    """
+    Index of the first line (among the first max_lines, within HEADER_SNIFF_BYTES) naming any
+    of `identifiers`. Pass spec.header_tokens to skip normalizing the identifiers per call.
+    """
+    hdr = find_header_row(prefix_lines(content, max_lines, HEADER_SNIFF_BYTES), token_set(identifiers), max_lines)
+    if hdr is None:
+        raise ValueError("Could not detect header. Update header_identifiers if needed.")
+    return hdr
+
+def read_upload_frame(content: bytes,
+                      identifiers: Iterable[str],
+                      fmt: str = "csv",
+                      project: Optional[Callable[[List[str]], List[str]]] = None) -> pd.DataFrame:
+    """
+    Stage 1 of the request pipeline: detect the header on the file prefix, parse the CSV
+    bytes once and drop fully-empty rows. The resulting frame is shared by label
+    extraction, spec.preprocess_fn and the annotated CSV output.
+    Parquet / Arrow uploads have their header in the schema; `project` picks the columns
+    to read from it (None reads all).
+    """
+    if fmt != "csv":
+        tokens = token_set(identifiers)
+
+        def check_and_project(names: List[str]) -> List[str]:
+            if tokens.isdisjoint(normalize(c) for c in names):
+                raise ValueError("Could not find the expected columns. Update header_identifiers if needed.")
+            return project(names) if project is not None else names
+        with stage_timer("parse"):
+            return read_columnar(content, fmt, check_and_project).dropna(how="all")
+    with stage_timer("header"):
+        hdr = detect_header_row_from_bytes(content, identifiers)
+    with stage_timer("parse"):
+        df = pd.read_csv(io.BytesIO(content), header=hdr, encoding="utf-8", encoding_errors="ignore")
+        return df.dropna(how="all")
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return jsonable_encoder(obj)
+
+def json_bytes(payload: Any) -> bytes:
+    """Compact UTF-8 JSON for a response payload; orjson (NumPy arrays natively) when installed."""
+    with stage_timer("serialize"):
+        if orjson is not None:
+            return orjson.dumps(payload, default=_json_default,
+                                option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+        return json.dumps(payload, default=_json_default, ensure_ascii=False, allow_nan=False,
+                          separators=(",", ":")).encode("utf-8")
 
 def add_uncertainty_features(df_in: pd.DataFrame,
                              keep_asymmetric: bool,
@@ -44,42 +117,41 @@ def add_uncertainty_features(df_in: pd.DataFrame,
     """
     Converts paired _err1/_err2 columns into <base>_rel_error (and optional asymmetric rel errors),
     then drops the raw error columns. Works with exact suffixes '_err1'/'_err2'.
+    All value/err1/err2 columns are stacked into 2-D blocks and computed in one NumPy pass;
+    the input frame is not copied.
     """
-    df_out = df_in.copy()
-    err1_cols = [c for c in df_out.columns if c.endswith("_err1")]
-    base_to_errs = {}
-    for e1 in err1_cols:
-        base = e1[:-5]  # strip "_err1"
-        e2 = f"{base}_err2"
-        if e2 in df_out.columns:
-            base_to_errs[base] = (e1, e2)
-
-    new_cols = {}
-    for base, (e1, e2) in base_to_errs.items():
-        if base not in df_out.columns:
-            continue
-        val  = pd.to_numeric(df_out[base], errors="coerce")
-        err1 = pd.to_numeric(df_out[e1], errors="coerce").abs()
-        err2 = pd.to_numeric(df_out[e2], errors="coerce").abs()
-
-        abs_err_mean = (err1 + err2) / 2.0
-        denom = np.maximum(np.abs(val), min_den)
-        rel_err = abs_err_mean / denom
-        new_cols[f"{base}_rel_error"] = rel_err
-
-        if keep_asymmetric:
-            new_cols[f"{base}_rel_err_upper"] = err1 / denom
-            new_cols[f"{base}_rel_err_lower"] = err2 / denom
-
-    for k, v in new_cols.items():
-        df_out[k] = v
-
-    drop_cols_local = []
-    for base, (e1, e2) in base_to_errs.items():
-        drop_cols_local.extend([e1, e2])
-    df_out = df_out.drop(columns=drop_cols_local, errors="ignore")
-
-    return df_out, sorted(new_cols.keys())
+    colset = set(df_in.columns)
+    pairs = [(c[:-5], c, f"{c[:-5]}_err2") for c in df_in.columns
+             if c.endswith("_err1") and f"{c[:-5]}_err2" in colset]
+    bases = [b for b, _, _ in pairs if b in colset]
+    df_out = df_in.drop(columns=[e for _, e1, e2 in pairs for e in (e1, e2)])
+    if not bases:
+        return df_out, []
+
+    mean, upper, lower = relative_errors(
+        numeric_block(df_in, bases),
+        numeric_block(df_in, [f"{b}_err1" for b in bases]),
+        numeric_block(df_in, [f"{b}_err2" for b in bases]),
+        min_den,
+        asymmetric=keep_asymmetric,
+        copy=False,
+    )
+    if keep_asymmetric:
+        names = [f"{b}{sfx}" for b in bases for sfx in ("_rel_error", "_rel_err_upper", "_rel_err_lower")]
+        block = np.stack([mean, upper, lower], axis=2).reshape(len(df_in), 3 * len(bases))
+    else:
+        names = [f"{b}_rel_error" for b in bases]
+        block = mean
+
+    # Names that already exist are overwritten in place; the rest are appended in order.
+    new = [j for j, k in enumerate(names) if k not in df_out.columns]
+    for j, k in enumerate(names):
+        if k in df_out.columns:
+            df_out[k] = block[:, j]
+    if new:
+        df_new = pd.DataFrame(block[:, new], columns=[names[j] for j in new], index=df_in.index)
+        df_out = pd.concat([df_out, df_new], axis=1)
+    return df_out, sorted(names)
 
 # <-- ADD THIS AS A TOP-LEVEL HELPER (not nested) -->
 def _predict_proba_safe(pipe, X: pd.DataFrame):
@@ -118,26 +190,43 @@ class ModelSpec:
     keep_asymmetric: bool
     min_den: float
     header_identifiers: List[str]
-    # KOI-only cols to drop
-    koi_cols_to_drop: Optional[List[str]] = None
-    # K2-only drops & one-hot
-    k2_cols_to_drop: Optional[List[str]] = None
-    k2_drop_lim_cols: bool = False
-    k2_one_hot_cols: Optional[List[str]] = None
-    # TESS-only drops & lim flag
-    tess_cols_to_drop: Optional[List[str]] = None
-    tess_drop_lim_cols: bool = False
+    # Declarative transforms, compiled into a FeaturePlan at load time (see feature_plan.py)
+    cols_to_drop: List[str] = field(default_factory=list)     # IDs, coordinates, dates, flags
+    drop_lim_cols: bool = False                                 # drop *lim columns
+    one_hot_cols: List[str] = field(default_factory=list)     # categoricals one-hot encoded in training
+    missing_flags: bool = False                                 # model uses <col>_was_missing indicators
     # Functions
-    preprocess_fn: Optional[Callable[[bytes], pd.DataFrame]] = None
+    preprocess_fn: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None  # parsed frame -> X
     # Loaded runtime objects
+    plan: Optional[FeaturePlan] = None
+    batcher: Optional[MicroBatcher] = None
+    gate: Optional[AdmissionGate] = None
     pipe: Any = None
+    fastpath: Optional[FastPipeline] = None                     # flattened ensemble, if exported
+    approx: Optional[ApproxPipeline] = None                     # mode=fast approximation, if built
+    explainer: Optional[Explainer] = None                       # built on the first /explain
+    drift_baseline: Optional[Dict[str, Any]] = None             # drift_baseline.json record, if built
+    drift: Optional[DriftSketch] = None                         # uploads' features since start (or reset)
+    version: Optional[str] = None                               # artifact fingerprint, part of cache keys
     class_names: Optional[List[str]] = None
     train_features: Optional[List[str]] = None
+    feature_dtype: type = np.float64                            # X's dtype; float32 when the model computes in it
+    # Lazy-loading bookkeeping
+    load_seconds: Optional[float] = None
+    mem_bytes: Optional[int] = None                             # RSS growth while loading (>= artifact size)
+    last_used: float = 0.0
+    jobs: int = 0                                               # background jobs currently using the model
+    # Header sniffing
+    header_tokens: FrozenSet[str] = field(init=False)           # normalized header_identifiers
+    signature: Optional[FrozenSet[str]] = None                  # catalog columns, see catalog_columns()
+
+    def __post_init__(self):
+        self.header_tokens = token_set(self.header_identifiers)
 
 REGISTRY: Dict[str, ModelSpec] = {}
 
 # ============================================================
-# KOI model spec + preprocessing
+# KOI model spec
 # ============================================================
 KOI_SPEC = ModelSpec(
     slug="koi",
@@ -148,7 +237,7 @@ KOI_SPEC = ModelSpec(
     keep_asymmetric=False,
     min_den=1e-12,
     header_identifiers=["koi_period", "koi_depth", "koi_duration", "koi_pdisposition"],
-    koi_cols_to_drop=[
+    cols_to_drop=[
         "kepid", "kepoi_name", "kepler_name",
         "koi_disposition", "koi_score",
         "koi_fpflag_nt", "koi_fpflag_ss", "koi_fpflag_co", "koi_fpflag_ec",
@@ -156,39 +245,8 @@ KOI_SPEC = ModelSpec(
     ],
 )
 
-def preprocess_koi(content: bytes, spec: ModelSpec) -> pd.DataFrame:
-    hdr = detect_header_row_from_bytes(content, spec.header_identifiers)
-    text = content.decode("utf-8", errors="ignore")
-    df = pd.read_csv(io.StringIO(text), header=hdr)
-
-    df.dropna(how="all", inplace=True)
-    df.dropna(axis=1, how="all", inplace=True)
-
-    if spec.koi_cols_to_drop:
-        df = df.drop(columns=spec.koi_cols_to_drop, errors="ignore")
-
-    df, _ = add_uncertainty_features(df, keep_asymmetric=spec.keep_asymmetric, min_den=spec.min_den)
-
-    if spec.label_col in df.columns:
-        df = df.drop(columns=[spec.label_col])
-
-    df = df.apply(pd.to_numeric, errors="coerce")
-
-    if spec.train_features is not None:
-        for col in spec.train_features:
-            if col not in df.columns:
-                df[col] = np.nan
-        extra = [c for c in df.columns if c not in spec.train_features]
-        if extra:
-            df = df.drop(columns=extra)
-        df = df[spec.train_features]
-
-    return df
-
-KOI_SPEC.preprocess_fn = lambda content: preprocess_koi(content, KOI_SPEC)
-
 # ============================================================
-# K2 model spec + preprocessing
+# K2 model spec
 # ============================================================
 K2_SPEC = ModelSpec(
     slug="k2",
@@ -199,65 +257,19 @@ K2_SPEC = ModelSpec(
     keep_asymmetric=False,
     min_den=1e-12,
     header_identifiers=["pl_orbper", "pl_rade", "st_teff", "disposition"],
-    k2_cols_to_drop=[
+    cols_to_drop=[
         "pl_name", "hostname", "disp_refname", "pl_refname", "st_refname", "sy_refname",
         "rastr", "ra", "decstr", "dec",
         "rowupdate", "pl_pubdate", "releasedate",
         "default_flag", "pl_controv_flag"
     ],
-    k2_drop_lim_cols=True,
-    k2_one_hot_cols=["discoverymethod", "disc_facility", "soltype"],
+    drop_lim_cols=True,
+    one_hot_cols=["discoverymethod", "disc_facility", "soltype"],
+    missing_flags=True,
 )
 
-def preprocess_k2(content: bytes, spec: ModelSpec) -> pd.DataFrame:
-    hdr = detect_header_row_from_bytes(content, spec.header_identifiers)
-    text = content.decode("utf-8", errors="ignore")
-    df = pd.read_csv(io.StringIO(text), header=hdr)
-
-    df.dropna(how="all", inplace=True)
-    df.dropna(axis=1, how="all", inplace=True)
-
-    if spec.k2_cols_to_drop:
-        df = df.drop(columns=spec.k2_cols_to_drop, errors="ignore")
-
-    if spec.k2_drop_lim_cols:
-        lim_cols = [c for c in df.columns if str(c).endswith("lim")]
-        if lim_cols:
-            df = df.drop(columns=lim_cols, errors="ignore")
-
-    df, _ = add_uncertainty_features(df, keep_asymmetric=spec.keep_asymmetric, min_den=spec.min_den)
-
-    if spec.k2_one_hot_cols:
-        present = [c for c in spec.k2_one_hot_cols if c in df.columns]
-        if present:
-            df = pd.get_dummies(df, columns=present, dummy_na=True)
-
-    if spec.label_col in df.columns:
-        df = df.drop(columns=[spec.label_col])
-
-    df = df.apply(pd.to_numeric, errors="coerce")
-
-    # Add *_was_missing flags (done in training BEFORE split)
-    for col in list(df.columns):
-        if df[col].isna().any():
-            df[f"{col}_was_missing"] = df[col].isna().astype(int)
-
-    # Strict alignment to training features (no dynamic drops at inference)
-    if spec.train_features is not None:
-        for col in spec.train_features:
-            if col not in df.columns:
-                df[col] = 0 if col.endswith("_was_missing") else np.nan
-        extra = [c for c in df.columns if c not in spec.train_features]
-        if extra:
-            df = df.drop(columns=extra)
-        df = df[spec.train_features]
-
-    return df
-
-K2_SPEC.preprocess_fn = lambda content: preprocess_k2(content, K2_SPEC)
-
 # ============================================================
-# TESS model spec + preprocessing
+# TESS model spec
 # ============================================================
 TESS_SPEC = ModelSpec(
     slug="tess",
@@ -268,54 +280,10 @@ TESS_SPEC = ModelSpec(
     keep_asymmetric=False,
     min_den=1e-12,
     header_identifiers=["tfopwg_disp", "toi_period", "toi_depth"],
-    tess_cols_to_drop=["toi", "tid", "rastr", "decstr", "toi_created", "rowupdate"],
-    tess_drop_lim_cols=True,
+    cols_to_drop=["toi", "tid", "rastr", "decstr", "toi_created", "rowupdate"],
+    drop_lim_cols=True,
 )
 
-def preprocess_tess(content: bytes, spec: ModelSpec) -> pd.DataFrame:
-    # 1) detect header and load CSV
-    hdr = detect_header_row_from_bytes(content, spec.header_identifiers)
-    text = content.decode("utf-8", errors="ignore")
-    df = pd.read_csv(io.StringIO(text), header=hdr)
-
-    # 2) drop empty rows/cols
-    df.dropna(how="all", inplace=True)
-    df.dropna(axis=1, how="all", inplace=True)
-
-    # 3) drop TESS-specific non-predictive columns
-    if spec.tess_cols_to_drop:
-        df = df.drop(columns=spec.tess_cols_to_drop, errors="ignore")
-
-    # 4) drop *_lim columns
-    if spec.tess_drop_lim_cols:
-        lim_cols = [c for c in df.columns if str(c).endswith("lim")]
-        if lim_cols:
-            df = df.drop(columns=lim_cols, errors="ignore")
-
-    # 5) add uncertainty features, then drop raw *_err1/_err2
-    df, _ = add_uncertainty_features(df, keep_asymmetric=spec.keep_asymmetric, min_den=spec.min_den)
-
-    # 6) remove label column at inference if present
-    if spec.label_col in df.columns:
-        df = df.drop(columns=[spec.label_col])
-
-    # 7) numeric coercion (imputer lives in the pipeline)
-    df = df.apply(pd.to_numeric, errors="coerce")
-
-    # 8) strict alignment to training feature order
-    if spec.train_features is not None:
-        for col in spec.train_features:
-            if col not in df.columns:
-                df[col] = np.nan
-        extra = [c for c in df.columns if c not in spec.train_features]
-        if extra:
-            df = df.drop(columns=extra)
-        df = df[spec.train_features]
-
-    return df
-
-TESS_SPEC.preprocess_fn = lambda content: preprocess_tess(content, TESS_SPEC)
-
 # ============================================================
 # Registry loading
 # ============================================================
@@ -331,35 +299,972 @@ def _load_feature_names(path: Optional[str]) -> Optional[List[str]]:
         pass
     return None
 
+def _compile_plan(spec: ModelSpec, train_features: List[str]) -> FeaturePlan:
+    return FeaturePlan.compile(
+        train_features,
+        cols_to_drop=spec.cols_to_drop,
+        drop_lim_cols=spec.drop_lim_cols,
+        one_hot_cols=spec.one_hot_cols,
+        missing_flags=spec.missing_flags,
+        keep_asymmetric=spec.keep_asymmetric,
+        min_den=spec.min_den,
+        label_col=spec.label_col,
+    )
+
+def _artifact_version(spec: ModelSpec) -> str:
+    """Fingerprint of the artifact files (path, size, mtime); changes whenever one is replaced."""
+    h = hashlib.sha256()
+    for path in (spec.pipeline_path, spec.label_encoder_path, spec.feature_names_path):
+        if path and os.path.exists(path):
+            st = os.stat(path)
+            h.update(f"{path}:{st.st_size}:{st.st_mtime_ns};".encode("utf-8"))
+    return h.hexdigest()[:16]
+
+# Large numeric arrays (SVM support vectors, HistGB predictor nodes, imputer statistics, ...) are
+# memory-mapped from the uncompressed joblib artifacts instead of copied into each process, so
+# uvicorn workers share one page-cache copy. "c" (copy-on-write) rather than "r" because libsvm
+# insists on writeable buffers; pages are only duplicated if something actually writes to them.
+# RandomForest trees are still copied: sklearn's Tree unpickling copies its node arrays.
+MMAP_MODE = os.environ.get("EXO_MMAP_MODE", "c") or None   # "" loads artifacts fully into memory
+# Use <pipeline>.fastpath.joblib (see fastpath.py) when it has been exported for the pipeline
+FASTPATH_ENABLED = os.environ.get("EXO_FASTPATH", "1") != "0"
+# Above this many rows sklearn's compiled tree walk is faster than the NumPy one
+FASTPATH_MAX_ROWS = int(os.environ.get("EXO_FASTPATH_MAX_ROWS", "2000"))
+# Track input drift for models with a drift_baseline.json (see drift.py)
+DRIFT_ENABLED = os.environ.get("EXO_DRIFT", "1") != "0"
+# Larger batches update the drift sketch from this many evenly spaced rows; 0 = every row
+DRIFT_SAMPLE_ROWS = int(os.environ.get("EXO_DRIFT_SAMPLE_ROWS", "1024"))
+# /explain works through an upload this many rows per worker-pool task
+EXPLAIN_CHUNK_ROWS = int(os.environ.get("EXO_EXPLAIN_CHUNK_ROWS", "4096"))
+
+def _load_artifact(path: str) -> Any:
+    return joblib.load(path, mmap_mode=MMAP_MODE)
+
+def _rss_bytes() -> Optional[int]:
+    """Resident set size of this process (Linux /proc), or None where unavailable."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+# Feature matrices are built in float32 for pipelines that would round them to float32 anyway:
+# sklearn's trees and tree ensembles (other than HistGradientBoosting) cast X to float32, and an
+# imputer in front of them only fills in values, so predictions are identical while X, the
+# imputer's copy and the estimator's float32 copy take 4 bytes per cell instead of 8 + 8 + 4.
+COMPACT_FEATURES = os.environ.get("EXO_COMPACT_FEATURES", "1") != "0"
+
+def _feature_dtype(pipe) -> type:
+    from sklearn.ensemble import (ExtraTreesClassifier, GradientBoostingClassifier, RandomForestClassifier)
+    from sklearn.impute import SimpleImputer
+    from sklearn.tree import DecisionTreeClassifier, ExtraTreeClassifier
+    if not COMPACT_FEATURES:
+        return np.float64
+    steps = [step for _, step in pipe.steps] if hasattr(pipe, "steps") else [pipe]
+    float32_models = (RandomForestClassifier, ExtraTreesClassifier, GradientBoostingClassifier,
+                      DecisionTreeClassifier, ExtraTreeClassifier)
+    if isinstance(steps[-1], float32_models) and all(isinstance(s, SimpleImputer) for s in steps[:-1]):
+        return np.float32
+    return np.float64
+
 def _load_model(spec: ModelSpec) -> None:
-    print(f"[startup] Loading model '{spec.slug}'")
-    spec.pipe = joblib.load(spec.pipeline_path)
+    """
+    Load spec's artifacts. Everything is built into locals and published with spec.pipe last:
+    the unlocked `spec.pipe is not None` checks in _ensure_loaded/_load_async must never see a
+    half-built model.
+    """
+    print(f"[models] Loading model '{spec.slug}'")
+    t0, rss0 = time.perf_counter(), _rss_bytes()
+    pipe = _load_artifact(spec.pipeline_path)
+    version = _artifact_version(spec)
+    fastpath = None
+    if FASTPATH_ENABLED:
+        try:
+            fastpath = load_fastpath(spec.pipeline_path, pipe, MMAP_MODE)
+        except Exception as e:
+            print(f"[models] -> fast path ignored: {e}")
+    approx = None
+    try:
+        approx = load_approx(spec.pipeline_path, pipe, MMAP_MODE)
+    except Exception as e:
+        print(f"[models] -> approximation ignored: {e}")
+    class_names = None
     if spec.label_encoder_path and os.path.exists(spec.label_encoder_path):
         try:
             le = joblib.load(spec.label_encoder_path)
-            spec.class_names = list(le.classes_) if hasattr(le, "classes_") else None
+            class_names = list(le.classes_) if hasattr(le, "classes_") else None
         except Exception:
-            spec.class_names = None
-    spec.train_features = _load_feature_names(spec.feature_names_path)
-    print(f"[startup] -> classes: {spec.class_names}")
-    print(f"[startup] -> features: {len(spec.train_features or [])}")
+            class_names = None
+    train_features = _load_feature_names(spec.feature_names_path)
+    plan = _compile_plan(spec, train_features) if train_features is not None else None
+    feature_dtype = _feature_dtype(pipe)
+    drift_baseline = None
+    if DRIFT_ENABLED and plan is not None:
+        try:
+            drift_baseline = load_baseline(baseline_path(spec.pipeline_path), train_features)
+        except Exception as e:
+            print(f"[models] -> drift baseline ignored: {e}")
+    if drift_baseline is None:
+        drift = None
+    elif spec.drift is None or not np.array_equal(spec.drift.edges, drift_baseline["sketch"].edges):
+        drift = drift_baseline["sketch"].empty()
+    else:
+        drift = spec.drift   # kept across evictions while the baseline holds
+    rss1 = _rss_bytes()
+    spec.version = version
+    spec.fastpath = fastpath
+    spec.approx = approx
+    spec.explainer = None
+    spec.class_names = class_names
+    spec.train_features = train_features
+    spec.plan = plan
+    spec.feature_dtype = feature_dtype
+    spec.preprocess_fn = partial(plan.transform, dtype=feature_dtype) if plan is not None else None
+    spec.drift_baseline = drift_baseline
+    spec.drift = drift
+    spec.load_seconds = time.perf_counter() - t0
+    spec.mem_bytes = max(rss1 - rss0 if rss0 is not None and rss1 is not None else 0,
+                         os.path.getsize(spec.pipeline_path))
+    spec.pipe = pipe
+    print(f"[models] -> classes: {spec.class_names}")
+    print(f"[models] -> features: {len(spec.train_features or [])} ({np.dtype(spec.feature_dtype).name})")
+    if spec.fastpath is not None:
+        print(f"[models] -> fast path: {spec.fastpath.describe()}")
+    if spec.approx is not None:
+        print(f"[models] -> mode=fast: {spec.approx.describe()}")
+    if spec.drift_baseline is not None:
+        print(f"[models] -> drift baseline: {spec.drift_baseline['sketch'].rows} rows of {spec.drift_baseline.get('data')}")
+    print(f"[models] -> loaded in {spec.load_seconds:.2f}s, ~{spec.mem_bytes / 2**20:.1f} MiB, "
+          f"process RSS {((rss1 or 0) / 2**20):.0f} MiB")
+
+def _unload_model(spec: ModelSpec) -> None:
+    print(f"[models] Evicting idle model '{spec.slug}'")
+    spec.pipe = None   # first, so the unlocked fast paths stop handing the model out
+    spec.fastpath = None
+    spec.approx = None
+    spec.explainer = None
+    spec.plan = None
+    spec.preprocess_fn = None
+    spec.version = None
+    gc.collect()
 
 for s in (KOI_SPEC, K2_SPEC, TESS_SPEC):
-    _load_model(s)
     REGISTRY[s.slug] = s
 
 DEFAULT_MODEL = "koi"  # change default if you prefer
 
+# ---- Lazy loading: models load on first use and idle ones are evicted over the memory budget ----
+MODEL_MEMORY_BUDGET = int(float(os.environ.get("EXO_MODEL_MEMORY_MB", "0")) * 2**20)   # 0 = unlimited
+WARMUP_MODELS = [m.strip() for m in os.environ.get("EXO_WARMUP_MODELS", "").split(",") if m.strip()]
+
+_LOAD_LOCK = threading.Lock()
+
+def _is_idle(spec: ModelSpec) -> bool:
+    busy = spec.jobs or (spec.gate is not None and (spec.gate.active or spec.gate.waiting))
+    return not busy
+
+def _make_room(keep: ModelSpec, needed: int) -> None:
+    """Evict least-recently-used idle models until `needed` more bytes fit in the budget."""
+    if not MODEL_MEMORY_BUDGET:
+        return
+    loaded = [s for s in REGISTRY.values() if s.pipe is not None and s is not keep]
+    total = sum(s.mem_bytes or 0 for s in loaded) + needed
+    for s in sorted(loaded, key=lambda s: s.last_used):
+        if total <= MODEL_MEMORY_BUDGET:
+            break
+        if _is_idle(s):
+            total -= s.mem_bytes or 0
+            _unload_model(s)
+
+def _ensure_loaded(spec: ModelSpec) -> ModelSpec:
+    spec.last_used = time.monotonic()
+    if spec.pipe is not None:
+        return spec
+    with _LOAD_LOCK:  # one load at a time keeps peak memory and the budget accounting simple
+        if spec.pipe is None:
+            estimate = spec.mem_bytes or (os.path.getsize(spec.pipeline_path)
+                                          if os.path.exists(spec.pipeline_path) else 0)
+            _make_room(spec, estimate)
+            _load_model(spec)   # publishes nothing if it raises
+            _make_room(spec, spec.mem_bytes or 0)
+    return spec
+
+def _load_or_503(spec: ModelSpec) -> ModelSpec:
+    try:
+        return _ensure_loaded(spec)
+    except Exception as e:
+        raise HTTPException(503, f"Model '{spec.slug}' is unavailable: {type(e).__name__}: {e}")
+
+async def _load_async(spec: ModelSpec) -> ModelSpec:
+    if spec.pipe is not None:
+        spec.last_used = time.monotonic()
+        return spec
+    return await asyncio.get_running_loop().run_in_executor(None, _load_or_503, spec)
+
 def _get_spec(slug: Optional[str]) -> ModelSpec:
+    """Look up a registered model (not necessarily loaded yet)."""
     key = slug or DEFAULT_MODEL
     if key not in REGISTRY:
         raise HTTPException(400, f"Unknown model '{key}'. Available: {list(REGISTRY.keys())}")
+    set_model(key)
     return REGISTRY[key]
 
+# ---- Model auto-detection: which registered catalog an upload belongs to ----
+def catalog_columns(spec: ModelSpec) -> FrozenSet[str]:
+    """The raw columns of spec's catalog, from its feature-name file (no model load needed)."""
+    if spec.signature is None:
+        features = spec.train_features or _load_feature_names(spec.feature_names_path)
+        spec.signature = catalog_signature(spec.header_identifiers, spec.label_col, spec.cols_to_drop,
+                                           spec.one_hot_cols, features)
+    return spec.signature
+
+def detect_model(file: UploadFile, fmt: str = "csv") -> Tuple[Optional[str], Dict[str, Tuple[int, float]]]:
+    """
+    The model an upload most likely belongs to, from its header (CSV prefix or columnar
+    schema) scored against every model's catalog columns in one pass, plus the scores.
+    """
+    identifiers = {slug: spec.header_tokens for slug, spec in REGISTRY.items()}
+    signatures = {slug: catalog_columns(spec) for slug, spec in REGISTRY.items()}
+    if fmt == "csv":
+        prefix = read_stream_prefix(file.file, HEADER_SNIFF_LINES, HEADER_SNIFF_BYTES)
+        _, slug, scores = sniff_catalog(prefix, identifiers, signatures, HEADER_SNIFF_LINES)
+        return slug, scores
+    names = {normalize(c) for c in column_names(file.file, fmt)}
+    return best_catalog(names, identifiers, signatures)
+
+def _resolve_spec(model: Optional[str], file: UploadFile, fmt: str) -> ModelSpec:
+    """The requested model, or the one detect_model() picks when none was given."""
+    if model:
+        return _get_spec(model)
+    try:
+        with stage_timer("header"):
+            slug, _ = detect_model(file, fmt)
+    except Exception as e:
+        raise HTTPException(400, f"{FORMAT_LABELS[fmt]} read error: {e}")
+    if slug is None:
+        raise HTTPException(400, "Could not tell which model this file belongs to; pass ?model= "
+                                 f"(one of {list(REGISTRY.keys())}).")
+    return _get_spec(slug)
+
+for _slug in WARMUP_MODELS:
+    try:
+        _ensure_loaded(_get_spec(_slug))
+    except Exception as e:
+        print(f"[models] Warm-up of '{_slug}' failed: {e}")
+
+# ============================================================
+# Streaming (chunked) inference
+# ============================================================
+STREAM_CHUNK_ROWS = int(os.environ.get("EXO_STREAM_CHUNK_ROWS", "5000"))
+
+def detect_header_row_from_stream(fobj, identifiers: Iterable[str], max_lines: int = HEADER_SNIFF_LINES) -> int:
+    """
+    Same as detect_header_row_from_bytes, but only reads the first max_lines lines of a
+    binary file object, then rewinds it.
+    """
+    return detect_header_row_from_bytes(read_stream_prefix(fobj, max_lines, HEADER_SNIFF_BYTES), identifiers, max_lines)
+
+def _iter_csv_chunks(fobj, hdr: int, chunk_rows: int):
+    """Yield DataFrame chunks of at most chunk_rows rows from a binary CSV file object."""
+    text = io.TextIOWrapper(fobj, encoding="utf-8", errors="ignore", newline="")
+    try:
+        with pd.read_csv(text, header=hdr, chunksize=chunk_rows) as reader:
+            for chunk in reader:
+                yield chunk
+    finally:
+        text.detach()  # leave the upload's file object open for FastAPI to close
+
+def _class_labels(spec: ModelSpec, idx: np.ndarray) -> List[Any]:
+    """Class names for an array of class indices (one take), or the indices if the model has none."""
+    if spec.class_names is None:
+        return np.asarray(idx).tolist()
+    return np.asarray(spec.class_names, dtype=object).take(idx).tolist()
+
+def _topk_proba(spec: ModelSpec, P: np.ndarray, top_k: int, columns: bool = False):
+    """
+    Top-k classes per row, for all rows in one sort. Rows layout: a list of
+    [{"label", "prob"}, ...] per row. Columns layout: parallel (n_rows, k) arrays of class
+    indices (into class_names) and probabilities.
+    """
+    # argsort along axis 1 sorts each row exactly as np.argsort(row) does, so ties keep their order
+    idx = np.argsort(P, axis=1)[:, ::-1][:, :top_k]
+    prob = np.take_along_axis(P, idx, axis=1)
+    if columns:
+        return {"index": idx, "prob": prob}
+    labels = np.asarray(spec.class_names, dtype=object).take(idx).tolist()
+    return [[{"label": l, "prob": p} for l, p in zip(ls, ps)] for ls, ps in zip(labels, prob.tolist())]
+
+def _label_indices(spec: ModelSpec, labels: pd.Series) -> Tuple[np.ndarray, np.ndarray]:
+    """Map raw ground-truth labels to class indices. Returns (indices, valid_mask)."""
+    y_true_raw = labels.astype(str)
+    if spec.class_names is not None:
+        mapping = {lbl: i for i, lbl in enumerate(spec.class_names)}
+        y_true_idx = y_true_raw.map(mapping)
+    else:
+        y_true_idx = pd.to_numeric(y_true_raw, errors="coerce")
+    mask = y_true_idx.notna().to_numpy()
+    return y_true_idx[mask].astype(int).to_numpy(), mask
+
+def _iter_stream_ndjson(spec: ModelSpec,
+                        fobj,
+                        hdr: int,
+                        include_proba: bool = False,
+                        top_k: int = 3,
+                        evaluate: bool = False,
+                        columns: bool = False):
+    """
+    Runs preprocessing + predict chunk by chunk and yields one NDJSON record per chunk,
+    followed by a final summary record. Only one chunk is held in memory at a time.
+    """
+    n_classes = len(spec.class_names) if spec.class_names is not None else None
+    counts: Dict[Any, int] = {}
+    cm = ConfusionAccumulator(n_classes) if evaluate else None
+    has_label = False
+    n_rows = 0
+    try:
+        for i, chunk in enumerate(_iter_csv_chunks(fobj, hdr, STREAM_CHUNK_ROWS)):
+            chunk = chunk.dropna(how="all")
+            if chunk.empty:
+                continue
+            with stage_timer("preprocess", spec.slug):
+                X = spec.preprocess_fn(chunk)
+            _observe_drift(spec, X)
+            pred_idx, P = _score_batch(spec.slug, X, include_proba)
+            add_rows(len(X))
+            pred_labels = _class_labels(spec, pred_idx)
+
+            u, c = np.unique(pred_idx, return_counts=True)
+            for k, n in zip(u, c):
+                key = spec.class_names[k] if spec.class_names is not None else int(k)
+                counts[key] = counts.get(key, 0) + int(n)
+
+            rec: Dict[str, Any] = {
+                "chunk": i,
+                "offset": n_rows,
+                "n_rows": int(X.shape[0]),
+                "pred_labels": pred_labels,
+            }
+            if include_proba:
+                if P is not None and spec.class_names is not None:
+                    rec["topk_proba"] = _topk_proba(spec, P, top_k, columns)
+                    rec["max_confidence"] = P.max(axis=1)
+            if cm is not None and spec.label_col in chunk.columns:
+                has_label = True
+                y_true, mask = _label_indices(spec, chunk[spec.label_col])
+                cm.update(y_true, pred_idx[mask])
+
+            n_rows += int(X.shape[0])
+            yield json_bytes(rec) + b"\n"
+    except Exception as e:
+        # Headers are already sent, so the error has to travel in-band.
+        yield json_bytes({"error": f"{type(e).__name__}: {e}", "n_rows": n_rows}) + b"\n"
+        return
+
+    summary: Dict[str, Any] = {
+        "done": True,
+        "mode": "evaluate" if has_label else "predict",
+        "model": spec.slug,
+        "n_rows": n_rows,
+        "class_names": spec.class_names,
+        "counts_by_class": counts,
+    }
+    if has_label:
+        summary["evaluated_rows"] = cm.total
+        if cm.total:  # the same metrics as /evaluate, from the matrix accumulated over the chunks
+            summary.update(cm.metrics(spec.class_names))
+        else:
+            summary["accuracy"] = None
+            summary["confusion_matrix"] = {"labels": spec.class_names, "matrix": cm.matrix().tolist()}
+    yield json_bytes(summary) + b"\n"
+
+class _AdmittedStream(StreamingResponse):
+    """
+    A StreamingResponse over a sync generator that holds its model's admission slot (already
+    acquired, so overload is still a plain 503) until the body is done or abandoned. The slot
+    is released once, by whichever ends first: the body iterator, or the response itself, which
+    also covers a client that is gone before the body ever starts.
+    """
+    def __init__(self, spec: ModelSpec, body, **kwargs):
+        self._gate = spec.gate
+        self._held = True
+        super().__init__(self._iterate(body), **kwargs)
+
+    def _release(self) -> None:
+        if self._held:
+            self._held = False
+            self._gate.release()
+
+    async def _iterate(self, body):
+        try:
+            async for chunk in iterate_in_threadpool(body):
+                yield chunk
+        finally:
+            self._release()
+
+    async def __call__(self, scope, receive, send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+async def _stream_response(spec: ModelSpec, file: UploadFile, **kwargs) -> StreamingResponse:
+    try:
+        with stage_timer("header"):
+            hdr = detect_header_row_from_stream(file.file, spec.header_tokens)
+    except Exception as e:
+        raise HTTPException(400, f"CSV read error: {e}")
+    await _acquire(spec)
+    return _AdmittedStream(spec, _iter_stream_ndjson(spec, file.file, hdr, **kwargs),
+                           media_type="application/x-ndjson")
+
+def _iter_annotated_csv(spec: ModelSpec, chunks, compress: bool = False):
+    """
+    The /predict_csv output (input rows + prediction [+ prediction_confidence]) produced one
+    chunk at a time and encoded as it goes, optionally as a single gzip stream.
+    """
+    want_proba = hasattr(spec.pipe[-1], "predict_proba")
+    z = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None  # wbits 31: gzip container
+    first = True
+    for chunk in chunks:
+        chunk = chunk.dropna(how="all")
+        if chunk.empty:
+            continue
+        with stage_timer("preprocess", spec.slug):
+            X = spec.preprocess_fn(chunk)
+        _observe_drift(spec, X)
+        pred_idx, P = _score_batch(spec.slug, X, want_proba)
+        add_rows(len(X))
+        pred_labels = _class_labels(spec, pred_idx)
+        confidence = P.max(axis=1) if P is not None else None
+        data = _annotated_csv_stage(chunk, pred_labels, confidence, header=first).encode("utf-8")
+        first = False
+        yield z.compress(data) if z is not None else data
+    if z is not None:
+        yield z.flush()
+
+async def _csv_download_response(spec: ModelSpec, file: UploadFile, fmt: str, compress: bool) -> StreamingResponse:
+    if fmt == "csv":
+        try:
+            with stage_timer("header"):
+                hdr = detect_header_row_from_stream(file.file, spec.header_tokens)
+        except Exception as e:
+            raise HTTPException(400, f"CSV read error: {e}")
+        chunks = _iter_csv_chunks(file.file, hdr, STREAM_CHUNK_ROWS)
+    else:  # columnar uploads are compact already; read once, emit in blocks
+        try:
+            df = await _run_cpu(read_upload_frame, await file.read(), spec.header_tokens, fmt)
+        except Exception as e:
+            raise HTTPException(400, f"{FORMAT_LABELS[fmt]} read error: {e}")
+        chunks = (df.iloc[lo:lo + STREAM_CHUNK_ROWS] for lo in range(0, len(df), STREAM_CHUNK_ROWS))
+    await _acquire(spec)
+    headers = {"Content-Disposition": f'attachment; filename="{spec.slug}_predictions.csv"'}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return _AdmittedStream(
+        spec,
+        _iter_annotated_csv(spec, chunks, compress),
+        media_type="text/csv; charset=utf-8",
+        headers=headers,
+    )
+
+# ============================================================
+# Worker pool, admission control & micro-batched inference
+# ============================================================
+WORKER_KIND = os.environ.get("EXO_WORKER_KIND", "thread")              # "thread" | "process"
+WORKER_COUNT = int(os.environ.get("EXO_WORKERS", "0")) or None          # 0 -> executor default
+MODEL_CONCURRENCY = int(os.environ.get("EXO_MODEL_CONCURRENCY", "8"))   # heavy requests running per model
+MODEL_QUEUE = int(os.environ.get("EXO_MODEL_QUEUE", "32"))              # requests waiting per model before 503
+RETRY_AFTER_S = int(os.environ.get("EXO_RETRY_AFTER_S", "1"))
+INLINE_MAX_BYTES = int(os.environ.get("EXO_INLINE_MAX_BYTES", str(64 * 1024)))  # smaller uploads parse on the loop
+BATCH_WINDOW_MS = float(os.environ.get("EXO_BATCH_WINDOW_MS", "5"))   # 0 disables batching
+BATCH_MAX_ROWS = int(os.environ.get("EXO_BATCH_MAX_ROWS", "8192"))
+
+_EXECUTOR: Optional[Executor] = None
+
+def _executor() -> Executor:
+    global _EXECUTOR
+    if _EXECUTOR is None:
+        _EXECUTOR = make_executor(WORKER_KIND, WORKER_COUNT)
+    return _EXECUTOR
+
+async def _run_cpu(fn, *args):
+    """Run a CPU-heavy stage in the worker pool (fn and args must be picklable in process mode)."""
+    executor = _executor()
+    return await asyncio.get_running_loop().run_in_executor(executor, bind_context(executor, fn), *args)
+
+async def _acquire(spec: ModelSpec) -> None:
+    if spec.gate is None:
+        spec.gate = AdmissionGate(MODEL_CONCURRENCY, MODEL_QUEUE, RETRY_AFTER_S)
+    try:
+        await spec.gate.acquire()
+    except Overloaded as e:
+        raise HTTPException(503, f"Model '{spec.slug}' is busy, retry shortly.",
+                            headers={"Retry-After": str(e.retry_after)})
+    try:
+        await _load_async(spec)  # an admitted model is never idle, so it cannot be evicted meanwhile
+    except BaseException:
+        spec.gate.release()
+        raise
+
+@asynccontextmanager
+async def _admit(spec: ModelSpec):
+    """Hold one of the model's concurrency slots (loading it if needed) for the heavy part of a request."""
+    await _acquire(spec)
+    try:
+        yield
+    finally:
+        spec.gate.release()
+
+# ---- CPU stages: module-level and keyed by slug so they also run in a process pool ----
+class StageError(Exception):
+    """A stage failure tagged with where it happened ("read", "preprocess" or "predict")."""
+    def __init__(self, stage: str, message: str):
+        super().__init__(stage, message)
+        self.stage = stage
+        self.message = message
+
+    def __str__(self) -> str:
+        return self.message
+
+def _frame_stage(slug: str,
+                 content: bytes,
+                 keep_raw: bool = False,
+                 fmt: str = "csv",
+                 all_columns: bool = False) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Parse the upload and build X. Returns (X, parsed frame if keep_raw else None).
+    Columnar uploads only read the plan's input columns and the label, unless all_columns.
+    """
+    spec = _ensure_loaded(REGISTRY[slug])
+    project = spec.plan.input_columns if spec.plan is not None and not all_columns else None
+    try:
+        raw_df = read_upload_frame(content, spec.header_tokens, fmt, project)
+    except Exception as e:
+        raise StageError("read", str(e))
+    return _preprocess_stage(slug, raw_df), (raw_df if keep_raw else None)
+
+def _preprocess_stage(slug: str, raw_df: pd.DataFrame) -> pd.DataFrame:
+    """Build X from an already parsed upload frame."""
+    spec = _ensure_loaded(REGISTRY[slug])
+    try:
+        if spec.preprocess_fn is None:
+            raise ValueError("No preprocessing function configured.")
+        with stage_timer("preprocess", slug):
+            X = spec.preprocess_fn(raw_df)
+    except Exception as e:
+        raise StageError("preprocess", str(e))
+    _observe_drift(spec, X)
+    return X
+
+def _observe_drift(spec: ModelSpec, X: pd.DataFrame) -> None:
+    """Add a preprocessed batch to the model's drift sketch (in this process; see drift.py)."""
+    if spec.drift is not None and len(X):
+        with stage_timer("drift", spec.slug):
+            spec.drift.update(X.to_numpy(), DRIFT_SAMPLE_ROWS)
+
+def _shared_frame_stage(slugs: List[str], content: bytes, fmt: str = "csv") -> Tuple[pd.DataFrame, List[str]]:
+    """
+    Parse an upload once for several models: the header is detected with all of their
+    identifiers, and columnar uploads read the union of their plans' input columns.
+    Returns (frame, slugs of the models whose header identifiers appear in the header).
+    """
+    specs = [_ensure_loaded(REGISTRY[slug]) for slug in slugs]
+    identifiers = frozenset().union(*(spec.header_tokens for spec in specs))
+    header: List[str] = []
+
+    def project(names: List[str]) -> List[str]:
+        header.extend(names)
+        if any(spec.plan is None for spec in specs):
+            return names
+        wanted = {c for spec in specs for c in spec.plan.input_columns(names)}
+        return [c for c in names if c in wanted]
+
+    try:
+        raw_df = read_upload_frame(content, identifiers, fmt, project)
+    except Exception as e:
+        raise StageError("read", str(e))
+    norm = {normalize(c) for c in (header or raw_df.columns)}
+    matched = [spec.slug for spec in specs if not spec.header_tokens.isdisjoint(norm)]
+    return raw_df, matched
+
+# ---- Row memo: per-row predictions kept across uploads (opt-in, see row_memo.py) ----
+ROW_MEMO_PATH = os.environ.get("EXO_ROW_MEMO_PATH") or None   # SQLite file; unset disables the memo
+
+_ROW_MEMO: Optional[RowMemo] = None
+_ROW_MEMO_LOCK = threading.Lock()
+
+def _row_memo() -> Optional[RowMemo]:
+    """The memo, opened on first use (so each worker process gets its own connection)."""
+    global _ROW_MEMO
+    if ROW_MEMO_PATH is None:
+        return None
+    if _ROW_MEMO is None:
+        with _ROW_MEMO_LOCK:
+            if _ROW_MEMO is None:
+                os.makedirs(os.path.dirname(os.path.abspath(ROW_MEMO_PATH)), exist_ok=True)
+                _ROW_MEMO = RowMemo(ROW_MEMO_PATH)
+    return _ROW_MEMO
+
+def _score_batch(slug: str, X: pd.DataFrame, want_proba: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    spec = _ensure_loaded(REGISTRY[slug])
+    memo = _row_memo()
+    if memo is not None and spec.version is not None and len(X):
+        return _score_memoized(spec, memo, X, want_proba)
+    return _score_rows(spec, X, want_proba)
+
+def _score_memoized(spec: ModelSpec,
+                    memo: RowMemo,
+                    X: pd.DataFrame,
+                    want_proba: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """
+    _score_rows for the rows whose feature vectors are neither memoized nor repeated earlier
+    in X; every row's answer is then gathered back in X's order.
+    """
+    try:
+        values = X.to_numpy(dtype=np.float64)
+    except (TypeError, ValueError):   # non-numeric features: nothing to hash
+        return _score_rows(spec, X, want_proba)
+    with stage_timer("memo", spec.slug):
+        h1, h2 = row_keys(values, list(X.columns))
+        first, inverse = unique_rows(h1, h2)
+        u1, u2 = h1[first], h2[first]
+        pos, pred_hit, P_hit = memo.lookup(spec.slug, spec.version, u1, u2, want_proba)
+    todo = np.ones(len(first), dtype=bool)
+    todo[pos] = False
+    todo = np.flatnonzero(todo)
+    pred_new = P_new = None
+    if todo.size:
+        pred_new, P_new = _score_rows(spec, X.iloc[first[todo]], want_proba)
+        if not np.issubdtype(np.asarray(pred_new).dtype, np.integer):   # only class indices are memoized
+            return _score_rows(spec, X, want_proba)
+        with stage_timer("memo", spec.slug):
+            memo.store(spec.slug, spec.version, u1[todo], u2[todo], pred_new, P_new)
+
+    parts = [(idx, p, P) for idx, p, P in ((pos, pred_hit, P_hit), (todo, pred_new, P_new)) if len(idx)]
+    pred = np.empty(len(first), dtype=parts[-1][1].dtype)
+    for idx, p, _ in parts:
+        pred[idx] = p
+    P = None
+    if want_proba and all(part[2] is not None for part in parts):
+        P = np.empty((len(first), parts[-1][2].shape[1]), dtype=parts[-1][2].dtype)
+        for idx, _, part_P in parts:
+            P[idx] = part_P
+    return pred[inverse], (P[inverse] if P is not None else None)
+
+def _score_rows(spec: ModelSpec, X: pd.DataFrame, want_proba: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    slug = spec.slug
+    if spec.fastpath is not None and len(X) <= FASTPATH_MAX_ROWS:
+        with stage_timer("predict", slug):  # one pass gives labels and probabilities
+            P = spec.fastpath.predict_proba(X)
+            pred_idx = spec.fastpath.classes_.take(np.argmax(P, axis=1), axis=0)
+        return pred_idx, (P if want_proba else None)
+    with stage_timer("predict", slug):
+        pred_idx = np.asarray(spec.pipe.predict(X))
+    P = None
+    if want_proba:
+        with stage_timer("predict_proba", slug):
+            P = _predict_proba_safe(spec.pipe, X)
+    return pred_idx, P
+
+def _approx_stage(slug: str, X: pd.DataFrame, want_proba: bool) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """_score_rows on the model's mode=fast approximation (no batching, fast path or row memo)."""
+    approx = _ensure_loaded(REGISTRY[slug]).approx
+    with stage_timer("predict", slug):
+        pred_idx = np.asarray(approx.predict(X))
+    P = None
+    if want_proba:
+        with stage_timer("predict_proba", slug):
+            P = approx.predict_proba(X)
+    return pred_idx, P
+
+def _metrics_stage(class_names: Optional[List[str]],
+                   y_true_eval: np.ndarray,
+                   y_pred_eval: np.ndarray,
+                   slug: Optional[str] = None) -> Tuple[Dict[str, Any], Dict[Any, int]]:
+    """Evaluation metrics for the labelled rows. Returns (metrics, prediction counts by class)."""
+    with stage_timer("metrics", slug):
+        cm = ConfusionAccumulator(len(class_names) if class_names is not None else None)
+        cm.update(y_true_eval, y_pred_eval)
+        return cm.metrics(class_names), cm.prediction_counts(class_names)
+
+def _annotated_csv_stage(raw_df: pd.DataFrame,
+                         pred_labels: List[Any],
+                         confidence: Optional[np.ndarray],
+                         header: bool = True) -> str:
+    with stage_timer("serialize"):
+        out_df = raw_df.copy()
+        out_df["prediction"] = pred_labels
+
+        if confidence is not None:
+            out_df["prediction_confidence"] = confidence
+
+        buf = io.StringIO()
+        out_df.to_csv(buf, index=False, header=header)
+        return buf.getvalue()
+
+async def _frame_async(spec: ModelSpec,
+                       content: bytes,
+                       keep_raw: bool = False,
+                       fmt: str = "csv",
+                       all_columns: bool = False) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """_frame_stage in the worker pool, or inline for tiny uploads where the hand-off costs more than the parse."""
+    if len(content) <= INLINE_MAX_BYTES:
+        return _frame_stage(spec.slug, content, keep_raw, fmt, all_columns)
+    return await _run_cpu(_frame_stage, spec.slug, content, keep_raw, fmt, all_columns)
+
+async def _predict_async(spec: ModelSpec, X: pd.DataFrame, want_proba: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """predict (+ optional probabilities) for X, coalesced with concurrent requests for the same model."""
+    add_rows(len(X))
+    if spec.batcher is None:
+        spec.batcher = MicroBatcher(partial(_score_batch, spec.slug),
+                                    window_ms=BATCH_WINDOW_MS, max_rows=BATCH_MAX_ROWS,
+                                    executor=_executor())
+    return await spec.batcher.submit(X, want_proba)
+
+def _explain_stage(slug: str, X: pd.DataFrame, top: int, target: Optional[Any]) -> Dict[str, Any]:
+    """Explainer.explain for one chunk of X; the explainer is built on first use (per process)."""
+    spec = _ensure_loaded(REGISTRY[slug])
+    if spec.explainer is None:
+        spec.explainer = Explainer(spec.pipe, list(X.columns))
+    with stage_timer("explain", slug):
+        out = spec.explainer.explain(X, top, target)
+    out["contributions"] = top_features(spec.explainer.feature_names,
+                                        out.pop("feature"), out.pop("value"), out.pop("contribution"))
+    out["describe"] = spec.explainer.describe()
+    return out
+
+async def _predict_fast(spec: ModelSpec, X: pd.DataFrame, want_proba: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+    """_predict_async for mode=fast."""
+    add_rows(len(X))
+    return await _run_cpu(_approx_stage, spec.slug, X, want_proba)
+
+# ---- Inference modes: "exact", and "fast" where an approximation was built (see approx.py) ----
+def _modes(spec: ModelSpec) -> List[str]:
+    built = spec.approx is not None if spec.pipe is not None else os.path.exists(approx_path(spec.pipeline_path))
+    return ["exact", "fast"] if built else ["exact"]
+
+async def _require_mode(spec: ModelSpec, mode: str) -> None:
+    if mode == "fast":
+        await _load_async(spec)
+        if spec.approx is None:
+            raise HTTPException(400, f"Model '{spec.slug}' has no mode=fast approximation "
+                                     f"(available modes: {', '.join(_modes(spec))}).")
+
+def _stream_mode(mode: str) -> None:
+    if mode != "exact":
+        raise HTTPException(400, "mode=fast is not supported with stream=true.")
+
+def _mode_params(spec: ModelSpec, mode: str) -> Dict[str, Any]:
+    """Extra result-cache key parts: fast results depend on the approximation built."""
+    return {"mode": json.dumps(spec.approx.describe(), sort_keys=True)} if mode == "fast" else {}
+
+def _with_mode(spec: ModelSpec, mode: str, resp: Dict[str, Any]) -> Dict[str, Any]:
+    if mode == "fast":
+        resp["approximation"] = spec.approx.describe()
+    return resp
+
+# ============================================================
+# Result cache
+# ============================================================
+CACHE_MAX_BYTES = int(os.environ.get("EXO_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))   # 0 disables the memory tier
+CACHE_DIR = os.environ.get("EXO_CACHE_DIR") or None                                    # set to enable the disk tier
+CACHE_DISK_MAX_BYTES = int(os.environ.get("EXO_CACHE_DISK_MAX_BYTES", str(1024 ** 3)))
+# Part of every cache key: bump it whenever a cached response body changes for the same
+# inputs (fields, values or encoding), or the disk tier serves bodies from older code.
+#   2: compact json_bytes encoding, /evaluate metrics from the confusion matrix,
+#      "approximation" records for mode=fast
+CACHE_SCHEMA = 2
+
+RESULT_CACHE = ResultCache(CACHE_MAX_BYTES, CACHE_DIR, CACHE_DISK_MAX_BYTES)
+
+async def _cache_key(spec: ModelSpec, endpoint: str, content: bytes, **params) -> Optional[str]:
+    if not RESULT_CACHE.enabled:
+        return None
+    if len(content) <= INLINE_MAX_BYTES:
+        digest = content_digest(content)
+    else:  # hashlib releases the GIL, so a plain thread is enough
+        digest = await asyncio.get_running_loop().run_in_executor(None, content_digest, content)
+    version = spec.version or _artifact_version(spec)  # cache hits never need the model loaded
+    return make_key(CACHE_SCHEMA, endpoint, spec.slug, version, digest,
+                    *(f"{k}={v}" for k, v in sorted(params.items())))
+
+def _cache_lookup(key: Optional[str]) -> Optional[Response]:
+    body = RESULT_CACHE.get(key) if key is not None else None
+    if body is None:
+        return None
+    return Response(body, media_type="application/json", headers={"X-Cache": "hit"})
+
+def _cache_store(key: Optional[str], payload: Dict[str, Any]) -> Response:
+    """Serialize the payload once; the same bytes go to the client and into the cache."""
+    resp = Response(json_bytes(payload), media_type="application/json")
+    if key is not None:
+        RESULT_CACHE.put(key, resp.body)
+        resp.headers["X-Cache"] = "miss"
+    return resp
+
+# ============================================================
+# Background jobs (submit / poll / fetch for very large uploads)
+# ============================================================
+JOBS_DIR = os.environ.get("EXO_JOBS_DIR", "jobs")                     # SQLite job store, uploads and results
+JOB_WORKERS = int(os.environ.get("EXO_JOB_WORKERS", "1"))             # jobs run at once by this process; 0 = submit only
+JOB_CHUNK_ROWS = int(os.environ.get("EXO_JOB_CHUNK_ROWS", "10000"))   # progress / cancellation granularity
+JOB_POLL_S = float(os.environ.get("EXO_JOB_POLL_S", "2"))             # idle runners look for jobs from other processes
+JOB_TTL_S = float(os.environ.get("EXO_JOB_TTL_S", str(24 * 3600)))   # finished jobs and their files are purged after this
+
+_JOB_STORE: Optional[JobStore] = None
+_JOB_EXECUTOR: Optional[Executor] = None
+_JOB_RUNNERS: List[asyncio.Task] = []
+_JOB_WAKE: Optional[asyncio.Event] = None
+
+def _jobs(create: bool = True) -> Optional[JobStore]:
+    """
+    The job store, opened on first use. With create=False it is None until some process has
+    submitted a job, so a server that never gets one leaves no JOBS_DIR behind.
+    """
+    global _JOB_STORE
+    if _JOB_STORE is None and (create or JobStore.exists(JOBS_DIR)):
+        _JOB_STORE = JobStore(JOBS_DIR)
+    return _JOB_STORE
+
+def _job_executor() -> Executor:
+    """Threads of their own, so batch jobs never queue in front of interactive requests."""
+    global _JOB_EXECUTOR
+    if _JOB_EXECUTOR is None:
+        _JOB_EXECUTOR = make_executor("thread", max(JOB_WORKERS, 1))
+    return _JOB_EXECUTOR
+
+async def _run_job_cpu(fn, *args):
+    executor = _job_executor()
+    return await asyncio.get_running_loop().run_in_executor(executor, bind_context(executor, fn), *args)
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+def _write_job_result(path: str, payload: Dict[str, Any]) -> None:
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(json_bytes(payload))
+    os.replace(tmp, path)  # a result file is either complete or absent
+
+async def _run_job(job: Dict[str, Any]) -> None:
+    """
+    Run one claimed job to completion: the same parse / preprocess / predict / metrics as the
+    endpoint, but scored JOB_CHUNK_ROWS at a time so progress is recorded and a cancel request
+    takes effect between chunks. The result is written next to the store as <job_id>.json.
+    """
+    store, job_id, fmt = _jobs(), job["id"], job["fmt"]
+    spec = REGISTRY[job["model"]]
+    params = json.loads(job["params"])
+    ctx = start_context(f"job:{job['kind']}")  # this runner task's context; stages report under it
+    ctx.model = spec.slug
+    t0 = time.perf_counter()
+
+    async def predict(X: pd.DataFrame, want_proba: bool = False) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        parts = []
+        for start in range(0, len(X), JOB_CHUNK_ROWS) or (0,):
+            if store.cancel_requested(job_id):
+                raise JobCancelled()
+            parts.append(await _run_job_cpu(_score_batch, spec.slug, X.iloc[start:start + JOB_CHUNK_ROWS], want_proba))
+            add_rows(len(parts[-1][0]))
+            store.progress(job_id, min(start + JOB_CHUNK_ROWS, len(X)))
+        pred = np.concatenate([p for p, _ in parts])
+        P = np.concatenate([q for _, q in parts]) if parts[0][1] is not None else None
+        return pred, P
+
+    spec.jobs += 1  # keeps the model from being evicted while the job runs
+    try:
+        await _run_job_cpu(_load_or_503, spec)
+        content = await _run_job_cpu(_read_file, job["input_path"])
+        try:
+            X, raw_df = await _run_job_cpu(_frame_stage, spec.slug, content, True, fmt)
+        except StageError as e:
+            if e.stage == "read":
+                raise HTTPException(400, f"{FORMAT_LABELS[fmt]} read error: {e}")
+            raise HTTPException(400, f"Preprocessing error: {e}")
+        del content
+        store.progress(job_id, 0, len(X))
+        if job["kind"] == "evaluate" and spec.label_col not in raw_df.columns:
+            raise HTTPException(400, f"Label column '{spec.label_col}' not found in the uploaded {FORMAT_LABELS[fmt]}.")
+
+        payload = await _analyze_payload(spec, X, raw_df, params.get("include_proba", True),
+                                         params.get("top_k", 3), params.get("layout", "rows"), predict=predict)
+        if job["kind"] == "evaluate":
+            payload.pop("mode")  # same body as /evaluate
+        result_path = store.path(job_id, "json")
+        await _run_job_cpu(_write_job_result, result_path, payload)
+    except JobCancelled:
+        store.finish(job_id, "cancelled")
+    except HTTPException as e:
+        store.finish(job_id, "failed", error=str(e.detail), error_status=e.status_code)
+    except asyncio.CancelledError:
+        store.requeue(job_id)  # server shutting down: another runner (or the next start) picks it up
+        raise
+    except Exception as e:
+        store.finish(job_id, "failed", error=f"{type(e).__name__}: {e}", error_status=500)
+    else:
+        store.finish(job_id, "done", result_path)
+        observe_rows(ctx, time.perf_counter() - t0)
+    finally:
+        spec.jobs -= 1
+
+async def _job_runner() -> None:
+    while True:
+        try:
+            _JOB_WAKE.clear()
+            store = _jobs(create=False)
+            job = store.claim() if store is not None else None
+            if job is None:
+                if store is not None:
+                    store.purge(JOB_TTL_S)
+                try:
+                    await asyncio.wait_for(_JOB_WAKE.wait(), JOB_POLL_S)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await _run_job(job)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[jobs] Runner error: {type(e).__name__}: {e}")
+            await asyncio.sleep(JOB_POLL_S)
+
+def _ensure_job_runners() -> None:
+    """Start this process's job runners on the running loop (once; again if the loop changed)."""
+    global _JOB_WAKE
+    if JOB_WORKERS <= 0:
+        return
+    loop = asyncio.get_running_loop()
+    if _JOB_RUNNERS and _JOB_RUNNERS[0].get_loop() is loop and not any(t.done() for t in _JOB_RUNNERS):
+        return
+    for t in _JOB_RUNNERS:
+        t.cancel()
+    _JOB_RUNNERS.clear()
+    _JOB_WAKE = asyncio.Event()
+    store = _jobs(create=False)
+    n = store.requeue_orphans() if store is not None else 0
+    if n:
+        print(f"[jobs] Requeued {n} job(s) left running by a stopped process")
+    _JOB_RUNNERS.extend(loop.create_task(_job_runner()) for _ in range(JOB_WORKERS))
+
+def _wake_job_runners() -> None:
+    _ensure_job_runners()
+    if _JOB_WAKE is not None:
+        _JOB_WAKE.set()
+
+@asynccontextmanager
+async def _lifespan(app: FastAPI):
+    _ensure_job_runners()  # resume jobs queued before a restart
+    yield
+    for t in _JOB_RUNNERS:
+        t.cancel()
+    await asyncio.gather(*_JOB_RUNNERS, return_exceptions=True)
+    _JOB_RUNNERS.clear()
+
 # ============================================================
 # FastAPI app
 # ============================================================
-app = FastAPI(title="Multi-Model Inference API", version="1.1.0")
+app = FastAPI(title="Multi-Model Inference API", version="1.1.0", lifespan=_lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -368,6 +1273,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(MetricsMiddleware)
 
 @app.get("/", include_in_schema=False)
 def root():
@@ -375,11 +1281,31 @@ def root():
 
 @app.get("/models")
 def models():
-    return {"available": list(REGISTRY.keys()), "default": DEFAULT_MODEL}
+    now = time.monotonic()
+    return {
+        "available": list(REGISTRY.keys()),
+        "default": DEFAULT_MODEL,
+        "loaded": [s.slug for s in REGISTRY.values() if s.pipe is not None],
+        "memory": {
+            "rss_bytes": _rss_bytes(),
+            "budget_bytes": MODEL_MEMORY_BUDGET or None,
+            "mmap_mode": MMAP_MODE,
+            "models": {
+                s.slug: {
+                    "loaded": s.pipe is not None,
+                    "load_seconds": s.load_seconds,
+                    "mem_bytes": s.mem_bytes,
+                    "feature_dtype": np.dtype(s.feature_dtype).name if s.pipe is not None else None,
+                    "idle_seconds": (now - s.last_used) if s.last_used else None,
+                }
+                for s in REGISTRY.values()
+            },
+        },
+    }
 
 @app.get("/health")
 def health(model: Optional[str] = Query(None)):
-    spec = _get_spec(model)
+    spec = _load_or_503(_get_spec(model))
     # report if model_card.json exists
     base_dir = os.path.dirname(spec.pipeline_path)
     card_path = os.path.join(base_dir, "model_card.json")
@@ -390,8 +1316,66 @@ def health(model: Optional[str] = Query(None)):
         "class_names": spec.class_names,
         "has_feature_names": spec.train_features is not None,
         "has_model_card": os.path.exists(card_path),
+        "batching": spec.batcher.stats() if spec.batcher is not None else None,
+        "admission": spec.gate.stats() if spec.gate is not None else None,
+        "fastpath": spec.fastpath.describe() if spec.fastpath is not None else None,
+        "modes": _modes(spec),
+        "approximation": spec.approx.describe() if spec.approx is not None else None,
+        "workers": {"kind": WORKER_KIND, "max_workers": WORKER_COUNT},
     }
 
+def _cache_report() -> Dict[str, Any]:
+    memo = _row_memo()
+    return {**RESULT_CACHE.stats(), "row_memo": memo.stats() if memo is not None else {"enabled": False}}
+
+@app.get("/cache")
+def cache_stats():
+    return _cache_report()
+
+@app.delete("/cache")
+def cache_clear():
+    RESULT_CACHE.clear()
+    memo = _row_memo()
+    if memo is not None:
+        memo.clear()
+    return _cache_report()
+
+# Point-in-time gauges, refreshed when /metrics is scraped
+MODEL_LOADED = Gauge("exo_model_loaded", "1 if the model is loaded.", ("model",))
+MODEL_MEMORY = Gauge("exo_model_memory_bytes", "RSS growth measured while loading the model.", ("model",))
+MODEL_LOAD_SECONDS = Gauge("exo_model_load_seconds", "Time the last load of the model took.", ("model",))
+ADMISSION = Gauge("exo_admission_requests", "Heavy requests running or waiting for a model slot.", ("model", "state"))
+CACHE_LOOKUPS = Gauge("exo_result_cache_lookups", "Result cache lookups since start.", ("result",))
+ROW_MEMO_LOOKUPS = Gauge("exo_row_memo_rows", "Distinct rows looked up in the row memo since start.", ("result",))
+JOBS = Gauge("exo_jobs", "Background jobs in the store by status.", ("status",))
+DRIFT_PSI = Gauge("exo_drift_max_psi", "Largest per-feature PSI of uploads against the drift baseline.", ("model",))
+
+@app.get("/metrics")
+def prometheus_metrics():
+    """Prometheus text exposition: request/stage latency histograms, rows scored, and service gauges."""
+    for s in REGISTRY.values():
+        MODEL_LOADED.set(s.pipe is not None, model=s.slug)
+        MODEL_MEMORY.set(s.mem_bytes or 0, model=s.slug)
+        MODEL_LOAD_SECONDS.set(s.load_seconds or 0, model=s.slug)
+        if s.gate is not None:
+            ADMISSION.set(s.gate.active, model=s.slug, state="active")
+            ADMISSION.set(s.gate.waiting, model=s.slug, state="waiting")
+    cache = RESULT_CACHE.stats()
+    CACHE_LOOKUPS.set(cache["hits"], result="hit")
+    CACHE_LOOKUPS.set(cache["misses"], result="miss")
+    if _ROW_MEMO is not None:
+        ROW_MEMO_LOOKUPS.set(_ROW_MEMO.hits, result="hit")
+        ROW_MEMO_LOOKUPS.set(_ROW_MEMO.misses, result="miss")
+    if _JOB_STORE is not None:
+        for status, n in _JOB_STORE.counts().items():
+            JOBS.set(n, status=status)
+    for s in REGISTRY.values():
+        if s.drift is not None:
+            scores = psi(s.drift, s.drift_baseline["sketch"])
+            DRIFT_PSI.set(float(np.nanmax(scores)) if np.isfinite(scores).any() else 0.0, model=s.slug)
+    gauges = (MODEL_LOADED, MODEL_MEMORY, MODEL_LOAD_SECONDS, ADMISSION, CACHE_LOOKUPS, ROW_MEMO_LOOKUPS, JOBS, DRIFT_PSI)
+    return Response(render_metrics(gauges), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # ... (everything above unchanged)
 
 @app.get("/model_card")
@@ -414,284 +1398,671 @@ def model_card_path(model: str):
     with open(card_path, "r", encoding="utf-8") as f:
         return json.load(f)
 
+def _drift_or_404(model: Optional[str]) -> ModelSpec:
+    spec = _load_or_503(_get_spec(model))
+    if spec.drift is None:
+        raise HTTPException(404, f"No drift baseline for model '{spec.slug}'; build one with "
+                                 f"`python -m app.drift {spec.slug} --data <training catalog.csv>`.")
+    return spec
+
+def _drift_report(spec: ModelSpec) -> Dict[str, Any]:
+    baseline = spec.drift_baseline
+    onehot: Dict[str, List[int]] = {}
+    for j, op in enumerate(spec.plan.ops):
+        if op.kind == "onehot":
+            onehot.setdefault(op.source, []).append(j)
+    return {
+        "model": spec.slug,
+        "baseline": {k: baseline.get(k) for k in ("data", "created")},
+        **compare(spec.drift, baseline["sketch"], onehot),
+    }
+
+@app.get("/drift")
+def drift(model: Optional[str] = Query(None)):
+    """
+    How the features of uploads since start (or the last reset) compare with the training
+    catalog: PSI per feature (most drifted first; >= threshold listed under "drifted"),
+    missing rates, means and medians, and one-hot category shares. Sketches are kept per
+    process, so with EXO_WORKER_KIND=process only uploads preprocessed in the server count.
+    """
+    return _drift_report(_drift_or_404(model))
+
+@app.delete("/drift")
+def drift_reset(model: Optional[str] = Query(None)):
+    spec = _drift_or_404(model)
+    spec.drift = spec.drift.empty()
+    return _drift_report(spec)
+
 # ----------------- Endpoints -----------------
+def _upload_format(file: UploadFile, stream: bool = False) -> str:
+    """csv / parquet / arrow, from the upload's magic bytes or extension; 400 if unsupported."""
+    head = file.file.read(8)
+    file.file.seek(0)
+    fmt = upload_format(file.filename, head)
+    if fmt is None:
+        raise HTTPException(400, "Please upload a .csv, .parquet or .arrow file.")
+    if stream and fmt != "csv":
+        raise HTTPException(400, "Streaming is only supported for .csv uploads.")
+    return fmt
+
+# ---- Archive uploads: a zip or tar of catalog files, each routed to its model and scored ----
+ARCHIVE_MAX_FILES = int(os.environ.get("EXO_ARCHIVE_MAX_FILES", "1000"))
+ARCHIVE_MAX_BYTES = int(float(os.environ.get("EXO_ARCHIVE_MAX_MB", "2048")) * 2**20)   # decompressed, all files
+# Files in flight at once. Each takes a slot of its model's admission gate, so an archive's own
+# members must never overflow it: the default stays within the slots that run at once (members
+# of one model cannot run faster than that anyway), and a set value within the gate's capacity.
+ARCHIVE_PARALLEL = min(int(os.environ.get("EXO_ARCHIVE_PARALLEL", "0"))
+                       or min(WORKER_COUNT or os.cpu_count() or 1, MODEL_CONCURRENCY),
+                       MODEL_CONCURRENCY + MODEL_QUEUE)
+
+def _archive_kind(file: UploadFile) -> Optional[str]:
+    """"zip" / "tar" if the upload is an archive (see archive.archive_format), else None."""
+    head = file.file.read(512)
+    file.file.seek(0)
+    return archive_format(file.filename, head)
+
+def _member_stage(slug: str,
+                  content: bytes,
+                  fmt: str,
+                  want_proba: bool,
+                  fast: bool) -> Tuple[pd.DataFrame, np.ndarray, Optional[np.ndarray]]:
+    """
+    Parse, preprocess and score one archive member in a single worker-pool call. Returns the
+    label column (a frame without columns when the member has none) and the predictions;
+    probabilities are only computed for unlabelled members.
+    """
+    spec = _ensure_loaded(REGISTRY[slug])
+    X, raw_df = _frame_stage(slug, content, True, fmt)
+    labels = raw_df[[spec.label_col]] if spec.label_col in raw_df.columns else raw_df.iloc[:, :0]
+    want_proba = want_proba and labels.shape[1] == 0
+    try:
+        pred, P = _approx_stage(slug, X, want_proba) if fast else _score_rows(spec, X, want_proba)
+    except Exception as e:
+        raise StageError("predict", str(e))
+    add_rows(len(X))
+    return labels, pred, P
+
+async def _archive_member(name: str,
+                          content: Union[bytes, ArchiveError],
+                          endpoint: str,
+                          model: Optional[str],
+                          mode: str,
+                          params: Dict[str, Any]) -> Dict[str, Any]:
+    """One member's /predict or /analyze response (or its error) under "file": name."""
+    spec = None
+    try:
+        if isinstance(content, ArchiveError):
+            raise HTTPException(400, str(content))
+        fmt = upload_format(name, content[:8])
+        if fmt is None:
+            raise HTTPException(400, "Unsupported file; archives may hold .csv, .parquet and .arrow files.")
+        spec = _resolve_spec(model, UploadFile(io.BytesIO(content), filename=name), fmt)
+        await _require_mode(spec, mode)
+        # same keys as single-file uploads, so members and single files share cache entries
+        key = await _cache_key(spec, endpoint, content, **params, **_mode_params(spec, mode))
+        body = RESULT_CACHE.get(key) if key is not None else None
+        if body is not None:
+            return {"file": name, **json.loads(body)}
+
+        async with _admit(spec):
+            want_proba = endpoint == "analyze" and params["include_proba"]
+            try:
+                labels, pred, P = await _run_cpu(_member_stage, spec.slug, content, fmt, want_proba, mode == "fast")
+            except StageError as e:
+                if e.stage == "read":
+                    raise HTTPException(400, f"{FORMAT_LABELS[fmt]} read error: {e}")
+                if e.stage == "preprocess":
+                    raise HTTPException(400, f"Preprocessing error: {e}")
+                raise HTTPException(500, f"Inference error: {e}")
+
+        if endpoint == "predict":
+            payload = _predict_payload(spec, pred)
+        else:
+            async def scored(_X, want_proba=False):
+                return pred, P
+            # the label frame stands in for X and the parsed frame: one row per scored row
+            payload = await _analyze_payload(spec, labels, labels, predict=scored, **params)
+        payload = _with_mode(spec, mode, payload)
+        if key is not None:
+            RESULT_CACHE.put(key, json_bytes(payload))
+        return {"file": name, **payload}
+    except HTTPException as e:
+        error = {"status": e.status_code, "detail": e.detail}
+    except Exception as e:
+        error = {"status": 500, "detail": f"Inference error: {e}"}
+    return {"file": name, "model": spec.slug if spec is not None else None, "error": error}
+
+def _archive_aggregate(files: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Totals over an archive's members: files, rows and predicted classes per model, plus the
+    metrics of the merged confusion matrix of the model's labelled members.
+    """
+    models: Dict[str, Dict[str, Any]] = {}
+    confusion: Dict[str, Tuple[ConfusionAccumulator, Optional[List[str]]]] = {}
+    for f in files:
+        if "error" in f:
+            continue
+        agg = models.setdefault(f["model"], {"files": 0, "n_rows": 0, "counts_by_class": {}})
+        agg["files"] += 1
+        agg["n_rows"] += f.get("n_rows", f.get("evaluated_rows", 0))
+        for cls, n in (f.get("counts_by_class") or f.get("prediction_counts") or {}).items():
+            agg["counts_by_class"][cls] = agg["counts_by_class"].get(cls, 0) + n
+        cm = f.get("confusion_matrix")
+        if cm is not None and cm["labels"] is not None:   # fixed class set: matrices line up
+            acc, _ = confusion.setdefault(f["model"], (ConfusionAccumulator(len(cm["labels"])), cm["labels"]))
+            acc.cm += np.asarray(cm["matrix"], dtype=np.int64)
+    for slug, (acc, labels) in confusion.items():
+        models[slug].update({"evaluated_rows": acc.total, **acc.metrics(labels)})
+    ok = sum(1 for f in files if "error" not in f)
+    return {
+        "files": len(files),
+        "succeeded": ok,
+        "failed": len(files) - ok,
+        "n_rows": sum(agg["n_rows"] for agg in models.values()),
+        "models": models,
+    }
+
+async def _archive_response(file: UploadFile,
+                            kind: str,
+                            endpoint: str,
+                            model: Optional[str],
+                            stream: bool,
+                            mode: str,
+                            **params) -> Response:
+    """
+    /predict or /analyze for an archive of catalog files. Members are decompressed one at a
+    time off the event loop and fanned out to the worker pool as they come (at most
+    EXO_ARCHIVE_PARALLEL in flight, so memory stays bounded); each is routed to its model by
+    its header unless model= is given, and scored whole in one _member_stage call. Returns
+    {"archive": kind, "files": [{"file": name, <the single-file response>} or {"file", "model",
+    "error": {"status", "detail"}}, ...] in archive order, "aggregate": _archive_aggregate()}.
+    """
+    if stream:
+        raise HTTPException(400, "Streaming is only supported for .csv uploads.")
+    if model:
+        _get_spec(model)
+    slots = asyncio.Semaphore(ARCHIVE_PARALLEL)
+    tasks: List[asyncio.Task] = []
+
+    async def run(name: str, content: Union[bytes, ArchiveError]) -> Dict[str, Any]:
+        try:
+            return await _archive_member(name, content, endpoint, model, mode, params)
+        finally:
+            slots.release()
+
+    members = iter_members(file.file, kind, ARCHIVE_MAX_FILES, ARCHIVE_MAX_BYTES)
+    try:
+        async for name, content in iterate_in_threadpool(members):
+            await slots.acquire()
+            tasks.append(asyncio.create_task(run(name, content)))
+        if not tasks:
+            raise HTTPException(400, "The archive holds no files.")
+        files = list(await asyncio.gather(*tasks))
+    except BaseException as e:
+        # whatever fails (or cancels the request), no member keeps running on the pool
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if isinstance(e, ArchiveError):
+            raise HTTPException(400, str(e))
+        raise
+    slugs = sorted({f["model"] for f in files if f.get("model")})
+    if slugs:
+        set_model(",".join(slugs))
+    return Response(json_bytes({"archive": kind, "files": files, "aggregate": _archive_aggregate(files)}),
+                    media_type="application/json")
+
 @app.post("/predict")
 async def predict(file: UploadFile = File(...),
-                  model: Optional[str] = Query(None)) -> Dict[str, Any]:
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(400, "Please upload a .csv file.")
+                  model: Optional[str] = Query(None),
+                  stream: bool = Query(False, description="Stream NDJSON results chunk by chunk"),
+                  mode: str = Query("exact", pattern="^(exact|fast)$",
+                                    description="fast: score with the model's precomputed approximation (see /health modes)")) -> Any:
+    kind = _archive_kind(file)
+    if kind is not None:
+        return await _archive_response(file, kind, "predict", model, stream, mode)
+    fmt = _upload_format(file, stream)
     spec = _get_spec(model)
+    if stream:
+        _stream_mode(mode)
+        return await _stream_response(spec, file)
+    await _require_mode(spec, mode)
     content = await file.read()
+    key = await _cache_key(spec, "predict", content, **_mode_params(spec, mode))
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
 
-    try:
-        X = spec.preprocess_fn(content) if spec.preprocess_fn else None
-        if X is None:
-            raise ValueError("No preprocessing function configured.")
-    except Exception as e:
-        raise HTTPException(400, f"Preprocessing error: {e}")
+    async with _admit(spec):
+        try:
+            X, _ = await _frame_async(spec, content, fmt=fmt)
+        except StageError as e:
+            raise HTTPException(400, f"Preprocessing error: {e}")
 
-    try:
-        pred_idx = spec.pipe.predict(X).tolist()
-        pred_labels = [spec.class_names[i] for i in pred_idx] if spec.class_names is not None else pred_idx
-        u, c = np.unique(pred_idx, return_counts=True)
-        counts_by_class = {
-            (spec.class_names[i] if spec.class_names is not None else int(i)): int(n)
-            for i, n in zip(u, c)
-        }
-        return {
-            "model": spec.slug,
-            "n_rows": int(X.shape[0]),
-            "pred_labels": pred_labels,
-            "class_names": spec.class_names,
-            "counts_by_class": counts_by_class
-        }
-    except Exception as e:
-        raise HTTPException(500, f"Inference error: {e}")
+        try:
+            pred, _ = await (_predict_fast if mode == "fast" else _predict_async)(spec, X)
+            return _cache_store(key, _with_mode(spec, mode, _predict_payload(spec, pred)))
+        except Exception as e:
+            raise HTTPException(500, f"Inference error: {e}")
+
+def _predict_payload(spec: ModelSpec, pred: np.ndarray) -> Dict[str, Any]:
+    """The /predict response for the predicted class indices of an upload."""
+    u, c = np.unique(pred, return_counts=True)
+    counts_by_class = {
+        (spec.class_names[i] if spec.class_names is not None else int(i)): int(n)
+        for i, n in zip(u, c)
+    }
+    return {
+        "model": spec.slug,
+        "n_rows": int(len(pred)),
+        "pred_labels": _class_labels(spec, pred),
+        "class_names": spec.class_names,
+        "counts_by_class": counts_by_class
+    }
 
 @app.post("/predict_csv")
 async def predict_csv(file: UploadFile = File(...),
-                      model: Optional[str] = Query(None)) -> Dict[str, str]:
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(400, "Please upload a .csv file.")
+                      model: Optional[str] = Query(None),
+                      stream: bool = Query(False, description="Return the annotated CSV as a chunked text/csv download"),
+                      gzip: bool = Query(False, description="gzip the streamed download (Content-Encoding: gzip)")) -> Any:
+    fmt = _upload_format(file)
     spec = _get_spec(model)
+    if stream:
+        return await _csv_download_response(spec, file, fmt, gzip)
     content = await file.read()
+    key = await _cache_key(spec, "predict_csv", content)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
 
-    hdr = detect_header_row_from_bytes(content, spec.header_identifiers)
-    raw_df = pd.read_csv(io.StringIO(content.decode("utf-8", errors="ignore")), header=hdr)
+    async with _admit(spec):
+        X, raw_df = await _frame_async(spec, content, True, fmt, all_columns=True)  # every column goes back out
+        pred, P = await _predict_async(spec, X, want_proba=hasattr(spec.pipe[-1], "predict_proba"))
+        pred_labels = _class_labels(spec, pred)
 
-    X = spec.preprocess_fn(content)
-    pred_idx = spec.pipe.predict(X).tolist()
-    pred_labels = [spec.class_names[i] for i in pred_idx] if spec.class_names is not None else pred_idx
-
-    out_df = raw_df.copy()
-    out_df["prediction"] = pred_labels
-
-    if hasattr(spec.pipe[-1], "predict_proba"):
-        try:
-            P = spec.pipe.predict_proba(X)
-            out_df["prediction_confidence"] = P.max(axis=1)
-        except Exception:
-            pass
-
-    buf = io.StringIO()
-    out_df.to_csv(buf, index=False)
-    return {"model": spec.slug, "csv_data_url": "data:text/csv;charset=utf-8," + buf.getvalue()}
+        confidence = P.max(axis=1) if P is not None else None
+        csv_text = await _run_cpu(_annotated_csv_stage, raw_df, pred_labels, confidence)
+    return _cache_store(key, {"model": spec.slug, "csv_data_url": "data:text/csv;charset=utf-8," + csv_text})
 
 @app.post("/evaluate")
 async def evaluate(file: UploadFile = File(...),
-                   model: Optional[str] = Query(None)) -> Dict[str, Any]:
-    if not file.filename.lower().endswith(".csv"):
-        raise HTTPException(400, "Please upload a .csv file.")
+                   model: Optional[str] = Query(None)) -> Any:
+    fmt = _upload_format(file)
     spec = _get_spec(model)
     content = await file.read()
+    key = await _cache_key(spec, "evaluate", content)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
+
+    async with _admit(spec):
+        X, raw_df = await _frame_async(spec, content, True, fmt)
+        if spec.label_col not in raw_df.columns:
+            raise HTTPException(400, f"Label column '{spec.label_col}' not found in the uploaded {FORMAT_LABELS[fmt]}.")
+        payload = await _evaluation_payload(spec, X, raw_df, partial(_predict_async, spec))
+    return _cache_store(key, payload)
 
-    hdr = detect_header_row_from_bytes(content, spec.header_identifiers)
-    raw_df = pd.read_csv(io.StringIO(content.decode("utf-8", errors="ignore")), header=hdr)
-    if spec.label_col not in raw_df.columns:
-        raise HTTPException(400, f"Label column '{spec.label_col}' not found in the uploaded CSV.")
-
-    X = spec.preprocess_fn(content)
-    y_pred_idx = spec.pipe.predict(X)
+    #===== 2) Add this new endpoint with the other endpoints (after /evaluate is fine) =====
 
-    y_true_raw = raw_df[spec.label_col].astype(str)
-    mask = y_true_raw.notna()
 
-    if spec.class_names is not None:
-        mapping = {lbl: i for i, lbl in enumerate(spec.class_names)}
-        y_true_idx = y_true_raw.map(mapping)
-        mask = mask & y_true_idx.notna()
-        y_true_idx = y_true_idx.astype(int).to_numpy()
-    else:
-        y_true_idx = pd.to_numeric(y_true_raw, errors="coerce")
-        mask = mask & y_true_idx.notna()
-        y_true_idx = y_true_idx.astype(int).to_numpy()
+async def _evaluation_payload(spec: ModelSpec,
+                              X: pd.DataFrame,
+                              raw_df: pd.DataFrame,
+                              predict: Callable) -> Dict[str, Any]:
+    """The /evaluate response (also /analyze's when the label column is present)."""
+    try:
+        y_pred_idx, _ = await predict(X)
+    except Exception as e:
+        raise HTTPException(500, f"Inference error: {e}")
 
+    y_true_eval, mask = _label_indices(spec, raw_df[spec.label_col])
     y_pred_idx = np.asarray(y_pred_idx)
     if y_pred_idx.shape[0] != mask.shape[0]:
         raise HTTPException(500, "Shape mismatch between predictions and labels after preprocessing.")
-
-    y_true_eval = y_true_idx[mask.to_numpy()]
-    y_pred_eval = y_pred_idx[mask.to_numpy()]
-
     if y_true_eval.size == 0:
         raise HTTPException(400, "No valid rows with recognizable ground-truth labels to evaluate.")
 
-    acc  = float(accuracy_score(y_true_eval, y_pred_eval))
-    f1m  = float(f1_score(y_true_eval, y_pred_eval, average="macro"))
-    bacc = float(balanced_accuracy_score(y_true_eval, y_pred_eval))
-
-    labels_range = list(range(len(spec.class_names))) if spec.class_names is not None else None
-    cm = confusion_matrix(y_true_eval, y_pred_eval, labels=labels_range).tolist() \
-         if labels_range is not None else confusion_matrix(y_true_eval, y_pred_eval).tolist()
-
-    cr = classification_report(
-        y_true_eval, y_pred_eval,
-        labels=labels_range,
-        target_names=spec.class_names if spec.class_names is not None else None,
-        output_dict=True,
-        zero_division=0
-    )
-
-    u, c = np.unique(y_pred_eval, return_counts=True)
-    counts_by_class = {
-        (spec.class_names[i] if spec.class_names is not None else int(i)): int(n)
-        for i, n in zip(u, c)
-    }
-
+    # one bincount into a confusion matrix; cheap enough to stay on the loop
+    metrics, counts_by_class = _metrics_stage(spec.class_names, y_true_eval, y_pred_idx[mask], spec.slug)
     return {
         "model": spec.slug,
         "evaluated_rows": int(y_true_eval.shape[0]),
-        "accuracy": acc,
-        "macro_f1": f1m,
-        "balanced_accuracy": bacc,
-        "confusion_matrix": {"labels": spec.class_names, "matrix": cm},
-        "classification_report": cr,
+        **metrics,
         "class_names": spec.class_names,
         "prediction_counts": counts_by_class
     }
 
-    #===== 2) Add this new endpoint with the other endpoints (after /evaluate is fine) =====
+async def _analyze_payload(spec: ModelSpec,
+                           X: pd.DataFrame,
+                           raw_df: pd.DataFrame,
+                           include_proba: bool,
+                           top_k: int,
+                           layout: str,
+                           predict: Optional[Callable] = None) -> Dict[str, Any]:
+    """
+    The /analyze response for one model: evaluation if the label column is present, else predictions.
+    predict(X, want_proba) defaults to the micro-batched _predict_async (jobs pass a chunked one).
+    """
+    predict = predict or partial(_predict_async, spec)
+    has_label = spec.label_col in raw_df.columns
+
+    # --------- Path A: Evaluate (labels present) ---------
+    if has_label:
+        return {"mode": "evaluate", **await _evaluation_payload(spec, X, raw_df, predict)}
 
+    # --------- Path B: Predict (labels missing) ---------
+    try:
+        pred, P = await predict(X, want_proba=include_proba)
+        pred_labels = _class_labels(spec, pred)
+
+        u, c = np.unique(pred, return_counts=True)
+        counts_by_class = {
+            (spec.class_names[i] if spec.class_names is not None else int(i)): int(n)
+            for i, n in zip(u, c)
+        }
+
+        resp: Dict[str, Any] = {
+            "mode": "predict",
+            "model": spec.slug,
+            "n_rows": int(X.shape[0]),
+            "pred_labels": pred_labels,
+            "class_names": spec.class_names,
+            "counts_by_class": counts_by_class
+        }
+
+        if include_proba:
+            if P is not None and spec.class_names is not None:
+                resp["topk_proba"] = _topk_proba(spec, P, top_k, columns=layout == "columns")
+                resp["max_confidence"] = P.max(axis=1)
+            else:
+                resp["topk_proba"] = None
+                resp["max_confidence"] = None
+
+        return resp
+
+    except Exception as e:
+        raise HTTPException(500, f"Inference error: {e}")
 
 @app.post("/analyze")
 async def analyze(
         file: UploadFile = File(...),
         model: Optional[str] = Query(None),
         include_proba: bool = Query(True, description="Include top-k probabilities when labels are missing"),
-        top_k: int = Query(3, ge=1, le=10, description="Top-k classes to return when predicting")
-) -> Dict[str, Any]:
+        top_k: int = Query(3, ge=1, le=10, description="Top-k classes to return when predicting"),
+        stream: bool = Query(False, description="Stream NDJSON results chunk by chunk"),
+        layout: str = Query("rows", pattern="^(rows|columns)$",
+                            description="topk_proba as per-row objects (rows) or parallel index/prob arrays (columns)"),
+        mode: str = Query("exact", pattern="^(exact|fast)$",
+                          description="fast: score with the model's precomputed approximation (see /health modes)")
+) -> Any:
         """
         Smart endpoint:
-          - If the uploaded CSV HAS the label column for the chosen model -> returns full evaluation (metrics + CM + per-class report)
+          - If the upload (CSV, Parquet or Arrow) HAS the label column for the chosen model -> returns full evaluation (metrics + CM + per-class report)
           - Otherwise -> returns predictions (labels + optional top-k probabilities)
         Frontend can just call /analyze for both cases.
+        Without model=, the model is picked from the upload's header (see detect_model).
+        With stream=true, results are emitted as NDJSON (one record per chunk, then a summary
+        record with counts and, when labels are present, accuracy + confusion matrix).
+        layout=columns returns topk_proba as {"index": [[...]], "prob": [[...]]} (class indices
+        into class_names), which is much smaller and faster to build for large uploads.
+        mode=fast scores with the model's approximation (an "approximation" key describes it
+        and its measured agreement with the exact model); /health lists the modes per model.
+        A zip or tar archive of such files is analyzed file by file (see _archive_response).
         """
-        if not file.filename.lower().endswith(".csv"):
-            raise HTTPException(400, "Please upload a .csv file.")
-        spec = _get_spec(model)
+        kind = _archive_kind(file)
+        if kind is not None:
+            return await _archive_response(file, kind, "analyze", model, stream, mode,
+                                           include_proba=include_proba, top_k=top_k, layout=layout)
+        fmt = _upload_format(file, stream)
+        spec = _resolve_spec(model, file, fmt)
+        if stream:
+            _stream_mode(mode)
+            return await _stream_response(spec, file, include_proba=include_proba, top_k=top_k,
+                                          evaluate=True, columns=layout == "columns")
+        await _require_mode(spec, mode)
         content = await file.read()
+        key = await _cache_key(spec, "analyze", content, include_proba=include_proba, top_k=top_k, layout=layout,
+                               **_mode_params(spec, mode))
+        cached = _cache_lookup(key)
+        if cached is not None:
+            return cached
+
+        async with _admit(spec):
+            # Parse once and build X once; the same frame feeds label detection
+            try:
+                X, raw_df = await _frame_async(spec, content, True, fmt)
+            except StageError as e:
+                if e.stage == "read":
+                    raise HTTPException(400, f"{FORMAT_LABELS[fmt]} read error: {e}")
+                raise HTTPException(400, f"Preprocessing error: {e}")
+
+            predict = partial(_predict_fast, spec) if mode == "fast" else None
+            payload = await _analyze_payload(spec, X, raw_df, include_proba, top_k, layout, predict)
+            return _cache_store(key, _with_mode(spec, mode, payload))
+
+async def _analyze_model_body(spec: ModelSpec,
+                              raw_df: pd.DataFrame,
+                              include_proba: bool,
+                              top_k: int,
+                              layout: str) -> bytes:
+    try:
+        X = await _run_cpu(_preprocess_stage, spec.slug, raw_df)
+    except StageError as e:
+        raise HTTPException(400, f"Preprocessing error: {e}")
+    return json_bytes(await _analyze_payload(spec, X, raw_df, include_proba, top_k, layout))
 
-        # Peek header to see if label exists
-        try:
-            hdr = detect_header_row_from_bytes(content, spec.header_identifiers)
-            raw_df = pd.read_csv(io.StringIO(content.decode("utf-8", errors="ignore")), header=hdr)
-        except Exception as e:
-            raise HTTPException(400, f"CSV read error: {e}")
-
-        has_label = spec.label_col in raw_df.columns
+@app.post("/explain")
+async def explain(file: UploadFile = File(...),
+                  model: Optional[str] = Query(None),
+                  top: int = Query(5, ge=1, le=50, description="Contributions per row, largest |contribution| first"),
+                  target: Optional[str] = Query(None, description="Explain this class instead of each row's prediction")) -> Any:
+    """
+    Per-row feature contributions: why each row got its predicted class (or how it scores
+    for `target`). Tree ensembles report path contributions, which add up with base_value
+    to the model output (class probability for forests, log-odds for gradient boosting); the
+    KOI SVM reports occlusion (the decision-function change when a feature is reset to its
+    imputed median). The upload is processed EXO_EXPLAIN_CHUNK_ROWS rows at a time.
+    """
+    fmt = _upload_format(file, False)
+    spec = _resolve_spec(model, file, fmt)
+    content = await file.read()
+    key = await _cache_key(spec, "explain", content, top=top, target=target)
+    cached = _cache_lookup(key)
+    if cached is not None:
+        return cached
 
-        # Build X once (shared)
+    async with _admit(spec):
         try:
-            X = spec.preprocess_fn(content) if spec.preprocess_fn else None
-            if X is None:
-                raise ValueError("No preprocessing function configured.")
-        except Exception as e:
+            X, _ = await _frame_async(spec, content, fmt=fmt)
+        except StageError as e:
+            if e.stage == "read":
+                raise HTTPException(400, f"{FORMAT_LABELS[fmt]} read error: {e}")
             raise HTTPException(400, f"Preprocessing error: {e}")
 
-        # --------- Path A: Evaluate (labels present) ---------
-        if has_label:
-            try:
-                y_pred_idx = spec.pipe.predict(X)
-            except Exception as e:
-                raise HTTPException(500, f"Inference error: {e}")
+        target_value = None
+        if target is not None:
+            if spec.class_names is None or target not in spec.class_names:
+                raise HTTPException(400, f"Unknown class '{target}'; expected one of {spec.class_names}.")
+            target_value = spec.class_names.index(target)
 
-            y_true_raw = raw_df[spec.label_col].astype(str)
-            mask = y_true_raw.notna()
-
-            if spec.class_names is not None:
-                mapping = {lbl: i for i, lbl in enumerate(spec.class_names)}
-                y_true_idx = y_true_raw.map(mapping)
-                mask = mask & y_true_idx.notna()
-                try:
-                    y_true_idx = y_true_idx.astype(int).to_numpy()
-                except Exception:
-                    raise HTTPException(400, "Ground-truth labels could not be mapped to known classes.")
-            else:
-                y_true_idx = pd.to_numeric(y_true_raw, errors="coerce")
-                mask = mask & y_true_idx.notna()
-                y_true_idx = y_true_idx.astype(int).to_numpy()
-
-            y_pred_idx = np.asarray(y_pred_idx)
-            if y_pred_idx.shape[0] != mask.shape[0]:
-                raise HTTPException(500, "Shape mismatch between predictions and labels after preprocessing.")
-
-            y_true_eval = y_true_idx[mask.to_numpy()]
-            y_pred_eval = y_pred_idx[mask.to_numpy()]
-
-            if y_true_eval.size == 0:
-                raise HTTPException(400, "No valid rows with recognizable ground-truth labels to evaluate.")
-
-            acc = float(accuracy_score(y_true_eval, y_pred_eval))
-            f1m = float(f1_score(y_true_eval, y_pred_eval, average="macro"))
-            bacc = float(balanced_accuracy_score(y_true_eval, y_pred_eval))
-
-            labels_range = list(range(len(spec.class_names))) if spec.class_names is not None else None
-            cm = confusion_matrix(y_true_eval, y_pred_eval, labels=labels_range).tolist() \
-                if labels_range is not None else confusion_matrix(y_true_eval, y_pred_eval).tolist()
-
-            cr = classification_report(
-                y_true_eval, y_pred_eval,
-                labels=labels_range,
-                target_names=spec.class_names if spec.class_names is not None else None,
-                output_dict=True,
-                zero_division=0
-            )
-
-            u, c = np.unique(y_pred_eval, return_counts=True)
-            counts_by_class = {
-                (spec.class_names[i] if spec.class_names is not None else int(i)): int(n)
-                for i, n in zip(u, c)
-            }
-
-            return {
-                "mode": "evaluate",
-                "model": spec.slug,
-                "evaluated_rows": int(y_true_eval.shape[0]),
-                "accuracy": acc,
-                "macro_f1": f1m,
-                "balanced_accuracy": bacc,
-                "confusion_matrix": {"labels": spec.class_names, "matrix": cm},
-                "classification_report": cr,
-                "class_names": spec.class_names,
-                "prediction_counts": counts_by_class
-            }
-
-        # --------- Path B: Predict (labels missing) ---------
         try:
-            pred_idx = spec.pipe.predict(X).tolist()
-            pred_labels = [spec.class_names[i] for i in pred_idx] if spec.class_names is not None else pred_idx
+            parts = [await _run_cpu(_explain_stage, spec.slug, X.iloc[lo:lo + EXPLAIN_CHUNK_ROWS], top, target_value)
+                     for lo in range(0, max(len(X), 1), EXPLAIN_CHUNK_ROWS)]
+        except TypeError as e:
+            raise HTTPException(400, f"Model '{spec.slug}' cannot be explained: {e}")
+        except Exception as e:
+            raise HTTPException(500, f"Explanation error: {e}")
+        add_rows(len(X))
 
-            u, c = np.unique(pred_idx, return_counts=True)
-            counts_by_class = {
-                (spec.class_names[i] if spec.class_names is not None else int(i)): int(n)
-                for i, n in zip(u, c)
-            }
+        def joined(name: str) -> np.ndarray:
+            return np.concatenate([p[name] for p in parts])
 
-            resp: Dict[str, Any] = {
-                "mode": "predict",
-                "model": spec.slug,
-                "n_rows": int(X.shape[0]),
-                "pred_labels": pred_labels,
-                "class_names": spec.class_names,
-                "counts_by_class": counts_by_class
-            }
+        return _cache_store(key, {
+            "model": spec.slug,
+            "n_rows": int(X.shape[0]),
+            **parts[0]["describe"],
+            "class_names": spec.class_names,
+            "pred_labels": _class_labels(spec, joined("pred")),
+            "explained_labels": _class_labels(spec, joined("target")),
+            "base_value": joined("base"),
+            "output": joined("output"),
+            "contributions": [row for p in parts for row in p["contributions"]],
+        })
+
+@app.post("/analyze_multi")
+async def analyze_multi(
+        file: UploadFile = File(...),
+        models: Optional[str] = Query(None, description="Comma-separated model slugs (default: all registered models)"),
+        include_proba: bool = Query(True, description="Include top-k probabilities when labels are missing"),
+        top_k: int = Query(3, ge=1, le=10, description="Top-k classes to return when predicting"),
+        layout: str = Query("rows", pattern="^(rows|columns)$",
+                            description="topk_proba as per-row objects (rows) or parallel index/prob arrays (columns)")
+) -> Any:
+        """
+        /analyze against several models from one upload. Returns {"models": {slug: <the
+        /analyze?model=slug response>}, "errors": {slug: {"status", "detail"}}}; per-model results
+        share /analyze's cache entries. The upload is parsed once for all models that are not
+        cached, then each model builds its X from the shared frame and runs concurrently under
+        its own admission slot. A model that cannot run (missing artifacts, busy, bad labels)
+        is reported under "errors" instead of failing the whole request.
+        """
+        fmt = _upload_format(file)
+        slugs = [m.strip().lower() for m in models.split(",") if m.strip()] if models else list(REGISTRY)
+        specs = [_get_spec(slug) for slug in dict.fromkeys(slugs)]
+        set_model(",".join(sorted(spec.slug for spec in specs)))
+        content = await file.read()
+        params = dict(include_proba=include_proba, top_k=top_k, layout=layout)
+        keys = {spec.slug: await _cache_key(spec, "analyze", content, **params) for spec in specs}
+        bodies = {slug: (RESULT_CACHE.get(key) if key is not None else None) for slug, key in keys.items()}
+        n_cached = sum(body is not None for body in bodies.values())
+        errors: Dict[str, Dict[str, Any]] = {}
+
+        todo = sorted((spec for spec in specs if bodies[spec.slug] is None), key=lambda sp: sp.slug)
+        if todo:
+            async with AsyncExitStack() as stack:
+                admitted = []
+                for spec in todo:  # fixed (sorted) order, so concurrent multi-model requests cannot deadlock
+                    try:
+                        await stack.enter_async_context(_admit(spec))
+                        admitted.append(spec)
+                    except HTTPException as e:
+                        errors[spec.slug] = {"status": e.status_code, "detail": e.detail}
+                if admitted:
+                    admitted_slugs = [spec.slug for spec in admitted]
+                    raw_df, matched, read_error = None, [], None
+                    try:
+                        if len(content) <= INLINE_MAX_BYTES:
+                            raw_df, matched = _shared_frame_stage(admitted_slugs, content, fmt)
+                        else:
+                            raw_df, matched = await _run_cpu(_shared_frame_stage, admitted_slugs, content, fmt)
+                    except StageError as e:
+                        read_error = str(e)
+                    for spec in admitted:  # same outcome as /analyze for a file it cannot read
+                        if spec.slug not in matched:
+                            detail = read_error or "Could not detect header. Update header_identifiers if needed."
+                            errors[spec.slug] = {"status": 400, "detail": f"{FORMAT_LABELS[fmt]} read error: {detail}"}
+                    admitted = [spec for spec in admitted if spec.slug in matched]
+                    results = await asyncio.gather(
+                        *[_analyze_model_body(spec, raw_df, **params) for spec in admitted],
+                        return_exceptions=True,
+                    )
+                    for spec, res in zip(admitted, results):
+                        if isinstance(res, HTTPException):
+                            errors[spec.slug] = {"status": res.status_code, "detail": res.detail}
+                        elif isinstance(res, BaseException):
+                            errors[spec.slug] = {"status": 500, "detail": f"Inference error: {res}"}
+                        else:
+                            bodies[spec.slug] = res
+                            if keys[spec.slug] is not None:
+                                RESULT_CACHE.put(keys[spec.slug], res)
+
+        parts = [json_bytes(spec.slug) + b":" + bodies[spec.slug] for spec in specs if bodies[spec.slug] is not None]
+        body = b'{"models":{' + b",".join(parts) + b'},"errors":' + json_bytes(errors) + b"}"
+        headers = {}
+        if any(key is not None for key in keys.values()):
+            headers["X-Cache"] = "hit" if n_cached == len(specs) else ("partial" if n_cached else "miss")
+        return Response(body, media_type="application/json", headers=headers)
+
+# ----------------- Background jobs -----------------
+def _job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    total = job["rows_total"]
+    return {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "model": job["model"],
+        "status": job["status"],
+        "rows_done": job["rows_done"],
+        "rows_total": total,
+        "progress": round(job["rows_done"] / total, 4) if total else None,
+        "input_bytes": job["input_bytes"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+        "error": {"status": job["error_status"], "detail": job["error"]} if job["error"] else None,
+        "result_url": f"/jobs/{job['id']}/result" if job["status"] == "done" else None,
+    }
 
-            if include_proba:
-                P = _predict_proba_safe(spec.pipe, X)
-                if P is not None and spec.class_names is not None:
-                    topk_rows = []
-                    for row in P:
-                        idx = np.argsort(row)[::-1][:top_k]
-                        topk_rows.append(
-                            [{"label": spec.class_names[i], "prob": float(row[i])} for i in idx]
-                        )
-                    resp["topk_proba"] = topk_rows
-                    resp["max_confidence"] = [float(row.max()) for row in P]
-                else:
-                    resp["topk_proba"] = None
-                    resp["max_confidence"] = None
-
-            return resp
+def _job_or_404(job_id: str) -> Dict[str, Any]:
+    store = _jobs(create=False)
+    job = store.get(job_id) if store is not None else None
+    if job is None:
+        raise HTTPException(404, f"Job '{job_id}' not found.")
+    return job
 
-        except Exception as e:
-            raise HTTPException(500, f"Inference error: {e}")
\ No newline at end of file
+@app.post("/jobs", status_code=202)
+async def submit_job(
+        file: UploadFile = File(...),
+        kind: str = Query("analyze", pattern="^(analyze|evaluate)$", description="Endpoint the job runs as"),
+        model: Optional[str] = Query(None),
+        include_proba: bool = Query(True, description="Include top-k probabilities when labels are missing"),
+        top_k: int = Query(3, ge=1, le=10, description="Top-k classes to return when predicting"),
+        layout: str = Query("rows", pattern="^(rows|columns)$",
+                            description="topk_proba as per-row objects (rows) or parallel index/prob arrays (columns)")
+) -> Any:
+        """
+        Queue an /analyze or /evaluate run for a large upload and return at once (202) with the
+        job id. Poll GET /jobs/{job_id} for status and rows processed, fetch the result from
+        GET /jobs/{job_id}/result when it is done (the same JSON the endpoint would return), and
+        DELETE /jobs/{job_id} to cancel it. Jobs run in the background whether or not the
+        client stays connected, and are resumed if the server restarts.
+        """
+        fmt = _upload_format(file)
+        spec = _resolve_spec(model, file, fmt) if kind == "analyze" else _get_spec(model)
+        params = dict(include_proba=include_proba, top_k=top_k, layout=layout)
+        store = _jobs()
+        job_id = await asyncio.get_running_loop().run_in_executor(
+            None, store.create, kind, spec.slug, fmt, params, file.file)
+        _wake_job_runners()
+        return _job_view(store.get(job_id))
+
+@app.get("/jobs")
+def list_jobs(status: Optional[str] = Query(None, pattern="^(queued|running|done|failed|cancelled)$"),
+              limit: int = Query(50, ge=1, le=1000)):
+    store = _jobs(create=False)
+    if store is None:
+        return {"counts": {s: 0 for s in STATUSES}, "jobs": []}
+    return {"counts": store.counts(), "jobs": [_job_view(j) for j in store.list(limit, status)]}
+
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    return _job_view(_job_or_404(job_id))
+
+@app.get("/jobs/{job_id}/result")
+def job_result(job_id: str):
+    job = _job_or_404(job_id)
+    if job["status"] != "done":
+        raise HTTPException(409, f"Job '{job_id}' is {job['status']}; no result to fetch.")
+    if not job["result_path"] or not os.path.exists(job["result_path"]):
+        raise HTTPException(410, f"Result of job '{job_id}' is no longer available.")
+    return FileResponse(job["result_path"], media_type="application/json")
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    """Cancel a queued or running job; delete a finished one together with its result."""
+    job = _job_or_404(job_id)
+    store = _jobs()
+    if job["status"] in FINISHED:
+        store.delete(job_id)
+        return {**_job_view(job), "deleted": True}
+    store.cancel(job_id)
+    return {**_job_view(store.get(job_id)), "deleted": False}
@@ -0,0 +1,246 @@
+# metrics.py
+# Prometheus-style metrics without the client library: labelled counters, gauges and
+# histograms rendered in the text exposition format by GET /metrics, an ASGI middleware
+# that records request latency, in-flight requests and rows per second, and stage timers
+# for the CPU stages (upload read, header detection, parse, preprocess, predict,
+# predict_proba, metrics, serialization).
+#
+# Stages run in worker threads, so the request they belong to travels in a ContextVar:
+# bind_context() carries it into thread pools. Stages that run in a process pool
+# (EXO_WORKER_KIND=process) are timed in the worker process and do not show up here.
+
+import contextvars
+import threading
+import time
+from functools import partial
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+RATE_BUCKETS = tuple(float(10 ** (e / 2)) for e in range(2, 15))   # 10 .. 10M rows/s, half-decade steps
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+def _labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _num(x: float) -> str:
+    if x == float("inf"):
+        return "+Inf"
+    return repr(float(x)) if not float(x).is_integer() else str(int(x))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.doc = doc
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.label_names)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            series = sorted(self._series.items())
+        for key, value in series:
+            lines.extend(self._render_series(key, value))
+        return lines
+
+    def _render_series(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        return [f"{self.name}{_labels(self.label_names, key)} {_num(value)}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._series[self._key(labels)] = float(value)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0, 0.0]   # bucket counts, count, sum
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            series[1] += 1
+            series[2] += value
+
+    def _render_series(self, key: Tuple[str, ...], value: Any) -> List[str]:
+        counts, count, total = value
+        lines, cumulative = [], 0
+        for bound, n in zip(self.buckets, counts):
+            cumulative += n
+            le = 'le="%s"' % _num(bound)
+            lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {cumulative}")
+        le = 'le="+Inf"'
+        lines.append(f"{self.name}_bucket{_labels(self.label_names, key, le)} {count}")
+        lines.append(f"{self.name}_sum{_labels(self.label_names, key)} {_num(total)}")
+        lines.append(f"{self.name}_count{_labels(self.label_names, key)} {count}")
+        return lines
+
+# ---- The service's metrics ----
+REQUESTS = Counter("exo_requests_total", "HTTP requests by route, model and status code.",
+                   ("endpoint", "model", "status"))
+REQUEST_SECONDS = Histogram("exo_request_seconds", "Request latency until the last body byte is sent.",
+                            ("endpoint", "model"))
+IN_FLIGHT = Gauge("exo_requests_in_flight", "Requests currently being served.")
+STAGE_SECONDS = Histogram("exo_stage_seconds", "Time spent in each request stage.", ("endpoint", "model", "stage"))
+ROWS = Counter("exo_rows_total", "Rows scored.", ("endpoint", "model"))
+ROWS_PER_SECOND = Histogram("exo_rows_per_second", "Rows scored per second of request time.",
+                            ("endpoint", "model"), buckets=RATE_BUCKETS)
+
+ALL = (REQUESTS, REQUEST_SECONDS, IN_FLIGHT, STAGE_SECONDS, ROWS, ROWS_PER_SECOND)
+
+def render(extra: Sequence[_Metric] = ()) -> str:
+    lines: List[str] = []
+    for metric in (*ALL, *extra):
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# ---- Request context ----
+class RequestContext:
+    """What the stages of one request (or background job) report under."""
+    __slots__ = ("scope", "endpoint", "model", "rows")
+
+    def __init__(self, scope: Optional[dict] = None, endpoint: Optional[str] = None):
+        self.scope = scope
+        self.endpoint = endpoint
+        self.model: Optional[str] = None
+        self.rows = 0
+
+    def endpoint_label(self) -> str:
+        if self.endpoint is not None:
+            return self.endpoint
+        route = self.scope.get("route") if self.scope is not None else None
+        return getattr(route, "path", None) or "other"   # unmatched paths share one label
+
+_CURRENT: contextvars.ContextVar[Optional[RequestContext]] = contextvars.ContextVar("exo_request", default=None)
+
+def current() -> Optional[RequestContext]:
+    return _CURRENT.get()
+
+def start_context(endpoint: str) -> RequestContext:
+    """Attribute what follows in this task (e.g. a background job) to `endpoint`."""
+    ctx = RequestContext(endpoint=endpoint)
+    _CURRENT.set(ctx)
+    return ctx
+
+def set_model(slug: str) -> None:
+    ctx = _CURRENT.get()
+    if ctx is not None:
+        ctx.model = slug
+
+def add_rows(n: int) -> None:
+    ctx = _CURRENT.get()
+    if ctx is not None:
+        ctx.rows += n
+
+def bind_context(executor: Optional[Executor], fn: Callable) -> Callable:
+    """fn bound to the caller's context for a thread pool (run_in_executor does not copy it)."""
+    if isinstance(executor, ProcessPoolExecutor):
+        return fn
+    return partial(contextvars.copy_context().run, fn)
+
+def observe_rows(ctx: RequestContext, seconds: float) -> None:
+    """Rows scored by a finished request or job, and its throughput."""
+    if not ctx.rows:
+        return
+    endpoint, model = ctx.endpoint_label(), ctx.model or ""
+    ROWS.inc(ctx.rows, endpoint=endpoint, model=model)
+    ROWS_PER_SECOND.observe(ctx.rows / seconds if seconds > 0 else 0.0, endpoint=endpoint, model=model)
+
+@contextmanager
+def stage_timer(name: str, model: Optional[str] = None) -> Iterator[None]:
+    """Time a block as `name` for the current request's endpoint and model."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        ctx = _CURRENT.get()
+        STAGE_SECONDS.observe(time.perf_counter() - t0,
+                              endpoint=ctx.endpoint_label() if ctx is not None else "none",
+                              model=model or (ctx.model if ctx is not None else None) or "",
+                              stage=name)
+
+# ---- ASGI middleware ----
+class MetricsMiddleware:
+    """
+    Per-request latency, status and in-flight count, the upload body's arrival time (stage
+    "upload"), and rows scored per second. A plain ASGI middleware rather than
+    BaseHTTPMiddleware, so streamed responses are timed until their last chunk.
+    """
+    def __init__(self, app, skip: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.skip = tuple(skip)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.skip:
+            await self.app(scope, receive, send)
+            return
+        ctx = RequestContext(scope)
+        token = _CURRENT.set(ctx)
+        t0 = time.perf_counter()
+        status = [500]
+        upload = [None]   # seconds until the whole request body had arrived
+        IN_FLIGHT.inc()
+
+        async def timed_receive():
+            message = await receive()
+            if upload[0] is None and message["type"] == "http.request" and not message.get("more_body", False):
+                upload[0] = time.perf_counter() - t0
+            return message
+
+        async def timed_send(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, timed_receive, timed_send)
+        finally:
+            elapsed = time.perf_counter() - t0
+            IN_FLIGHT.dec()
+            endpoint, model = ctx.endpoint_label(), ctx.model or ""
+            if upload[0] is not None and scope["method"] in ("POST", "PUT"):
+                STAGE_SECONDS.observe(upload[0], endpoint=endpoint, model=model, stage="upload")
+            REQUESTS.inc(endpoint=endpoint, model=model, status=status[0])
+            REQUEST_SECONDS.observe(elapsed, endpoint=endpoint, model=model)
+            observe_rows(ctx, elapsed)
+            _CURRENT.reset(token)
@@ -0,0 +1,165 @@
+# result_cache.py
+# Content-addressed cache of serialized endpoint responses. Keys are built by the app from
+# the SHA-256 of the uploaded bytes, the model slug, the model's artifact version and the
+# endpoint parameters, so a re-uploaded catalog snapshot is answered without parsing or
+# scoring it again. Memory tier: LRU bounded by total bytes. Optional disk tier: one file per
+# entry under a directory, also bounded by bytes (least recently used files go first).
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+def content_digest(content: bytes) -> str:
+    return hashlib.sha256(content).hexdigest()
+
+def make_key(*parts: object) -> str:
+    """Stable key from the content digest and request parameters."""
+    return hashlib.sha256("\x1f".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+class ResultCache:
+    def __init__(self,
+                 max_bytes: int,
+                 disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 0):
+        self.max_bytes = max(int(max_bytes), 0)
+        self.disk_dir = disk_dir or None
+        self.disk_max_bytes = max(int(disk_max_bytes), 0)
+        self._mem: "OrderedDict[str, bytes]" = OrderedDict()
+        self._mem_bytes = 0
+        self._lock = threading.Lock()
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.evictions = 0
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0 or self.disk_dir is not None
+
+    # ---- memory tier ----
+    def _mem_put(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        old = self._mem.pop(key, None)
+        if old is not None:
+            self._mem_bytes -= len(old)
+        self._mem[key] = value
+        self._mem_bytes += len(value)
+        while self._mem_bytes > self.max_bytes:
+            _, ev = self._mem.popitem(last=False)
+            self._mem_bytes -= len(ev)
+            self.evictions += 1
+
+    # ---- disk tier ----
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = f.read()
+            os.utime(path)  # mtime doubles as the disk tier's recency
+            return value
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, value: bytes) -> None:
+        if self.disk_max_bytes and len(value) > self.disk_max_bytes:
+            return
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                f.write(value)
+            os.replace(tmp, path)  # atomic: concurrent workers never read a partial entry
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return
+        if self.disk_max_bytes:
+            self._disk_trim()
+
+    def _disk_trim(self) -> None:
+        entries = []
+        for name in os.listdir(self.disk_dir):
+            if not name.endswith(".json"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.disk_dir, name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        total = sum(size for _, size, _ in entries)
+        for _, size, name in sorted(entries):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.disk_dir, name))
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+
+    # ---- public API ----
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._mem.get(key)
+            if value is not None:
+                self._mem.move_to_end(key)
+                self.hits_memory += 1
+                return value
+        if self.disk_dir:
+            value = self._disk_get(key)
+            if value is not None:
+                with self._lock:
+                    self.hits_disk += 1
+                    if self.max_bytes:
+                        self._mem_put(key, value)
+                return value
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: str, value: bytes) -> None:
+        if self.max_bytes:
+            with self._lock:
+                self._mem_put(key, value)
+        if self.disk_dir:
+            self._disk_put(key, value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._mem.clear()
+            self._mem_bytes = 0
+        if self.disk_dir:
+            for name in os.listdir(self.disk_dir):
+                if name.endswith(".json"):
+                    try:
+                        os.remove(os.path.join(self.disk_dir, name))
+                    except OSError:
+                        pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.hits_memory + self.hits_disk
+            lookups = hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._mem),
+                "bytes": self._mem_bytes,
+                "max_bytes": self.max_bytes,
+                "disk_dir": self.disk_dir,
+                "hits": hits,
+                "hits_memory": self.hits_memory,
+                "hits_disk": self.hits_disk,
+                "misses": self.misses,
+                "hit_rate": (hits / lookups) if lookups else None,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,174 @@
+# row_memo.py
+# Persistent per-row prediction memo for catalogs that are re-submitted with most rows
+# unchanged. Each row of the feature matrix is keyed by a 128-bit hash of its float64 bit
+# pattern (two independent 64-bit lanes, computed column by column over the whole batch in
+# NumPy), and the predicted class index (plus the probability row, when one was computed) is
+# kept in SQLite, one table per model and artifact version. Only rows not seen before are
+# scored; a new artifact version starts an empty table and drops the old one.
+#
+# The object IDs (kepoi_name, toi, pl_name) are not part of the key: they are dropped before
+# the features are built, and the prediction depends on the feature vector alone.
+
+import itertools
+import re
+import sqlite3
+import threading
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+_SEEDS = (0x243F6A8885A308D3, 0x13198A2E03707344)
+_MULTIPLIERS = (np.uint64(0x9E3779B97F4A7C15), np.uint64(0xC2B2AE3D27D4EB4F))
+_SHIFT = np.uint64(29)
+_CHUNK = 30_000   # keys per SELECT ... IN (...), under SQLite's 32766 host parameters
+
+def row_keys(values: np.ndarray, columns: Sequence[str] = ()) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Two 64-bit hashes (uint64 arrays) of each row of a 2-D float array. Every column step is
+    xor, multiply by an odd constant and xor-shift, a bijection of the running hash, so rows
+    differing in any column differ in both lanes unless they collide by chance. The column
+    names seed the lanes, so a reordered feature matrix never reuses another's keys.
+    """
+    bits = np.asarray(values, dtype=np.float64).view(np.uint64)
+    n = bits.shape[0]
+    salt = hash_names(columns)
+    lanes = [np.full(n, seed ^ salt, dtype=np.uint64) for seed in _SEEDS]
+    tmp = np.empty(n, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        for j in range(bits.shape[1]):
+            col = bits[:, j]
+            for h, m in zip(lanes, _MULTIPLIERS):
+                h ^= col
+                h *= m
+                np.right_shift(h, _SHIFT, out=tmp)
+                h ^= tmp
+    return lanes[0], lanes[1]
+
+def hash_names(columns: Sequence[str]) -> int:
+    """A stable 64-bit FNV-1a hash of the column names (Python's hash() is salted per process)."""
+    h = 0xCBF29CE484222325
+    for byte in "\x1f".join(map(str, columns)).encode("utf-8"):
+        h = ((h ^ byte) * 0x100000001B3) & 0xFFFFFFFFFFFFFFFF
+    return h
+
+def unique_rows(h1: np.ndarray, h2: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """(index of each distinct key's first row, position of every row's key among them)."""
+    keys = np.ascontiguousarray(np.stack([h1, h2], axis=1)).view("V16").ravel()
+    _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    return first, inverse.ravel()
+
+class RowMemo:
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._tables = set()
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+
+    @staticmethod
+    def _table_name(model: str, version: str) -> str:
+        return "memo_" + re.sub(r"[^0-9A-Za-z]", "_", f"{model}__{version}")
+
+    def _table(self, model: str, version: str) -> str:
+        """The table for (model, version), created on first use; other versions of the model are dropped."""
+        name = self._table_name(model, version)
+        if name in self._tables:
+            return name
+        prefix = self._table_name(model, "")
+        self._db.execute(f"CREATE TABLE IF NOT EXISTS {name} "
+                         "(h1 INTEGER PRIMARY KEY, h2 INTEGER NOT NULL, pred INTEGER NOT NULL, proba BLOB)")
+        for (old,) in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+            if old.startswith(prefix) and old != name:
+                self._db.execute(f"DROP TABLE {old}")
+        self._tables.add(name)
+        return name
+
+    def lookup(self,
+               model: str,
+               version: str,
+               h1: np.ndarray,
+               h2: np.ndarray,
+               need_proba: bool) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Memoized answers for distinct keys. Returns (positions found, their predicted class
+        indices, their probability rows or None). With need_proba, rows stored without
+        probabilities count as missing.
+        """
+        s1, s2 = h1.view(np.int64), h2.view(np.int64)
+        where = " AND proba IS NOT NULL" if need_proba else ""
+        order = np.argsort(s1)
+        ordered = s1[order]   # ascending keys walk the rowid B-tree in order
+        rows = []
+        with self._lock:
+            table = self._table(model, version)
+            for lo in range(0, len(ordered), _CHUNK):
+                ids = ordered[lo:lo + _CHUNK].tolist()
+                sql = f"SELECT h1, h2, pred, proba FROM {table} WHERE h1 IN ({','.join('?' * len(ids))}){where}"
+                rows.extend(self._db.execute(sql, ids).fetchall())
+        pos = np.empty(0, dtype=np.int64)
+        pred = np.empty(0, dtype=np.int64)
+        proba = None
+        if rows:
+            found1, found2, preds, blobs = zip(*rows)
+            at = order[np.searchsorted(ordered, np.array(found1, dtype=np.int64))]
+            ok = s2[at] == np.array(found2, dtype=np.int64)   # same first lane, different row: a miss
+            pos, pred = at[ok], np.array(preds, dtype=np.int64)[ok]
+            if need_proba:
+                proba = np.frombuffer(b"".join(blobs), dtype=np.float64).reshape(len(blobs), -1)[ok]
+        with self._lock:
+            self.hits += len(pos)
+            self.misses += len(s1) - len(pos)
+        return pos, pred, proba
+
+    def store(self,
+              model: str,
+              version: str,
+              h1: np.ndarray,
+              h2: np.ndarray,
+              pred: np.ndarray,
+              proba: Optional[np.ndarray]) -> None:
+        if proba is not None:
+            blobs = (row.tobytes() for row in np.ascontiguousarray(proba, dtype=np.float64))
+        else:
+            blobs = itertools.repeat(None)
+        rows = zip(h1.view(np.int64).tolist(), h2.view(np.int64).tolist(), np.asarray(pred).tolist(), blobs)
+        with self._lock:
+            table = self._table(model, version)
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(f"INSERT OR REPLACE INTO {table} VALUES (?, ?, ?, ?)", rows)
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self.stored += len(h1)
+
+    def clear(self) -> None:
+        with self._lock:
+            for (name,) in self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall():
+                if name.startswith("memo_"):
+                    self._db.execute(f"DROP TABLE {name}")
+            self._tables.clear()
+            self._db.execute("VACUUM")
+
+    def stats(self) -> dict:
+        with self._lock:
+            tables = self._db.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'memo\\_%' "
+                                      "ESCAPE '\\'").fetchall()
+            rows = {name: self._db.execute(f"SELECT COUNT(*) FROM {name}").fetchone()[0] for (name,) in tables}
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "path": self.path,
+                "rows": sum(rows.values()),
+                "tables": len(rows),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / lookups) if lookups else None,
+                "stored": self.stored,
+            }
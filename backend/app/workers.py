@@ -0,0 +1,80 @@
+# workers.py
+# Worker pool for the CPU-heavy request stages (CSV parse, preprocessing, predict, metrics,
+# CSV serialization) and per-model admission control, so the event loop stays free for the
+# light endpoints (/health, /models, /model_card) while large uploads are being scored.
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional
+
+def make_executor(kind: str, max_workers: Optional[int] = None) -> Executor:
+    """
+    kind="thread": stages share the loaded models (NumPy/sklearn release the GIL for most of
+    the heavy work). kind="process": stages run in spawned worker processes, each of which
+    imports the app module and loads its own copy of the models; arguments and results are
+    pickled, so stage functions must be module-level and take model slugs, not specs.
+    """
+    kind = kind.strip().lower()
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="exo-cpu")
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+    raise ValueError(f"Unknown worker kind '{kind}' (expected 'thread' or 'process').")
+
+class Overloaded(Exception):
+    """Raised by AdmissionGate when the model already has max_queue requests waiting."""
+    def __init__(self, retry_after: int):
+        super().__init__(retry_after)
+        self.retry_after = retry_after
+
+class AdmissionGate:
+    """
+    Per-model concurrency limit with a bounded wait queue: at most `limit` requests run at
+    once, at most `max_queue` more wait for a slot, and anything beyond that is rejected
+    immediately with Overloaded (mapped to 503 + Retry-After by the app).
+    """
+    def __init__(self, limit: int, max_queue: int, retry_after: int = 1):
+        self.limit = max(int(limit), 1)
+        self.max_queue = max(int(max_queue), 0)
+        self.retry_after = max(int(retry_after), 1)
+        self._sem = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    async def acquire(self) -> None:
+        if self._sem.locked() and self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise Overloaded(self.retry_after)
+        self.waiting += 1
+        try:
+            await self._sem.acquire()
+        finally:
+            self.waiting -= 1
+        self.active += 1
+        self.admitted += 1
+
+    def release(self) -> None:
+        self.active -= 1
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_queue": self.max_queue,
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,68 @@
+# bench_analyze.py
+# Response assembly for the predict path of /analyze on a large upload: the previous per-row
+# argsort + list-of-dicts + jsonable_encoder/JSONResponse vs batched top-k with the rows layout
+# and with the compact columns layout, serialized by json_bytes. Checks the rows layout is
+# identical to the previous output.
+#
+# Run from backend/:  python -m benchmarks.bench_analyze --model k2 --rows 100000
+
+import argparse
+import json
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+import app.main_multi as mm
+from benchmarks.synth import make_frame
+
+def legacy_body(spec, pred, P, top_k: int) -> bytes:
+    pred_idx = pred.tolist()
+    topk_rows = []
+    for row in P:
+        idx = np.argsort(row)[::-1][:top_k]
+        topk_rows.append([{"label": spec.class_names[i], "prob": float(row[i])} for i in idx])
+    resp = {
+        "pred_labels": [spec.class_names[i] for i in pred_idx],
+        "topk_proba": topk_rows,
+        "max_confidence": [float(row.max()) for row in P],
+    }
+    return JSONResponse(jsonable_encoder(resp)).body
+
+def new_body(spec, pred, P, top_k: int, columns: bool) -> bytes:
+    return mm.json_bytes({
+        "pred_labels": mm._class_labels(spec, pred),
+        "topk_proba": mm._topk_proba(spec, P, top_k, columns=columns),
+        "max_confidence": P.max(axis=1),
+    })
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="/analyze response assembly: per-row loop vs batched top-k")
+    ap.add_argument("--model", default="k2")
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--top-k", type=int, default=3)
+    args = ap.parse_args()
+
+    spec = mm._ensure_loaded(mm.REGISTRY[args.model])
+    X = spec.preprocess_fn(make_frame(spec, args.rows, with_label=False))
+    t0 = time.perf_counter()
+    pred, P = mm._score_batch(spec.slug, X, True)
+    t_model = time.perf_counter() - t0
+    print(f"model={args.model} rows={args.rows} top_k={args.top_k} orjson={mm.orjson is not None}")
+    print(f"{'':>16}{'seconds':>9}{'MB':>8}")
+    print(f"{'predict':>16}{t_model:>9.3f}")
+
+    results = {}
+    for name, fn in (("legacy", lambda: legacy_body(spec, pred, P, args.top_k)),
+                     ("rows", lambda: new_body(spec, pred, P, args.top_k, False)),
+                     ("columns", lambda: new_body(spec, pred, P, args.top_k, True))):
+        t0 = time.perf_counter()
+        body = fn()
+        results[name] = body
+        print(f"{name:>16}{time.perf_counter() - t0:>9.3f}{len(body) / 1e6:>8.1f}")
+    assert json.loads(results["rows"]) == json.loads(results["legacy"])
+    print("rows layout == legacy: ok")
+
+if __name__ == "__main__":
+    main()
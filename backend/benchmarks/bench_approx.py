@@ -0,0 +1,40 @@
+# bench_approx.py
+# mode=fast against exact scoring: for each model with an approximation (built with
+# `python -m app.approx`), the predict + predict_proba time of the exact serving path and of
+# the approximation on synthetic uploads, and how often their labels agree.
+#
+# Run from backend/:  python -m benchmarks.bench_approx --models koi k2 --rows 1000 20000
+
+import argparse
+import time
+
+import numpy as np
+
+import app.main_multi as mm
+from benchmarks.synth import make_frame
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Approximate (mode=fast) vs exact scoring latency")
+    ap.add_argument("--models", nargs="+", default=["koi", "k2"])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 20_000])
+    args = ap.parse_args()
+
+    print(f"{'model':<6}{'rows':>9}{'exact s':>10}{'fast s':>9}{'speedup':>9}{'agree':>8}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        if spec.approx is None:
+            print(f"{slug:<6} no approximation")
+            continue
+        for n in args.rows:
+            X = spec.preprocess_fn(make_frame(spec, n, seed=n, with_label=False))
+            t_exact, (pred, _) = timed(lambda: mm._score_rows(spec, X, True))
+            t_fast, (fast, _) = timed(lambda: mm._approx_stage(slug, X, True))
+            print(f"{slug:<6}{n:>9}{t_exact:>10.3f}{t_fast:>9.3f}{t_exact / t_fast:>8.1f}x{np.mean(pred == fast):>8.3f}")
+
+if __name__ == "__main__":
+    main()
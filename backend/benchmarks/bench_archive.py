@@ -0,0 +1,102 @@
+# bench_archive.py
+# Many small catalog files of mixed missions: one /analyze request per file (each routed by
+# its header) vs one /analyze of a tar.gz holding them all, whose members are fanned out to
+# the worker pool. The result cache is disabled so every request does the work. Checks the
+# per-file results are the same, and that a zip with an encrypted member and one with an
+# unsupported compression method (deflate64) get per-file errors. Archive throughput scales
+# with the worker pool, so run it with process workers to use every core:
+#
+# Run from backend/:  EXO_WORKER_KIND=process EXO_WORKERS=8 python -m benchmarks.bench_archive --files 64 --rows 2000
+
+import argparse
+import asyncio
+import io
+import os
+import tarfile
+import time
+import zipfile
+
+import httpx
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+def make_tar(files) -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as tar:
+        for name, content in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, io.BytesIO(content))
+    return buf.getvalue()
+
+def make_zip(files, encrypted=(), method=None) -> bytes:
+    """
+    A stored zip of files. Members named in encrypted are flagged as encrypted, and the last
+    member is given compression method id `method`. zipfile cannot write either, but readers
+    take both from the central directory, which is written from filelist on close.
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for name, content in files:
+            zf.writestr(name, content)
+        for info in zf.filelist:
+            if info.filename in encrypted:
+                info.flag_bits |= 0x1
+        if method is not None:
+            zf.filelist[-1].compress_type = method
+    return buf.getvalue()
+
+async def check_unreadable(files):
+    """Unreadable zip members are per-file 400s; the rest of the archive is still scored."""
+    transport = httpx.ASGITransport(app=mm.app)
+    sample = files[:3]
+    cases = (("encrypted", make_zip(sample, encrypted={sample[1][0]})),
+             ("deflate64", make_zip(sample, method=9)))
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for label, blob in cases:
+            r = await client.post("/predict", files={"file": ("bench.zip", blob)})
+            assert r.status_code == 200, (label, r.status_code, r.text)
+            out = r.json()
+            failed = [f["file"] for f in out["files"] if "error" in f]
+            assert len(failed) == 1 and all(f["error"]["status"] == 400 for f in out["files"] if "error" in f), out
+            print(f"{label:>20}  {failed[0]} -> 400, {out['aggregate']['succeeded']} of {len(sample)} files scored")
+
+async def run(files, archive: bytes, repeat: int):
+    transport = httpx.ASGITransport(app=mm.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        best_single, best_archive = float("inf"), float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            singles = [(await client.post("/analyze", files={"file": (name, content)})).json() for name, content in files]
+            best_single = min(best_single, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            out = (await client.post("/analyze", files={"file": ("bench.tar.gz", archive)})).json()
+            best_archive = min(best_archive, time.perf_counter() - t0)
+        assert [{k: v for k, v in f.items() if k != "file"} for f in out["files"]] == singles
+        return best_single, best_archive, out["aggregate"]
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-file /analyze vs one archive upload")
+    ap.add_argument("--models", nargs="+", default=["koi", "k2", "tess"])
+    ap.add_argument("--files", type=int, default=64)
+    ap.add_argument("--rows", type=int, default=2_000, help="rows per file")
+    ap.add_argument("--repeat", type=int, default=2)
+    args = ap.parse_args()
+
+    mm.RESULT_CACHE.max_bytes = 0
+    specs = [mm._ensure_loaded(mm.REGISTRY[m]) for m in args.models]
+    # labelled: TESS header detection needs its label column (tfopwg_disp)
+    files = [(f"{specs[i % len(specs)].slug}_{i:04d}.csv", make_csv_bytes(specs[i % len(specs)], args.rows, seed=i))
+             for i in range(args.files)]
+    archive = make_tar(files)
+    print(f"files={args.files} rows/file={args.rows} archive={len(archive) / 1e6:.1f} MB "
+          f"cpus={os.cpu_count()} workers={mm.WORKER_KIND} parallel={mm.ARCHIVE_PARALLEL}")
+    asyncio.run(check_unreadable(files))
+    single, packed, aggregate = asyncio.run(run(files, archive, args.repeat))
+    rows = aggregate["n_rows"]
+    print(f"{'per-file /analyze':>20}{single:>8.2f} s{rows / single:>10.0f} rows/s")
+    print(f"{'archive /analyze':>20}{packed:>8.2f} s{rows / packed:>10.0f} rows/s  ({single / packed:.2f}x)")
+
+if __name__ == "__main__":
+    main()
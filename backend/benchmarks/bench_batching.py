@@ -0,0 +1,67 @@
+# bench_batching.py
+# Concurrent small-request load against /predict, with micro-batching off (window 0: one
+# predict per request in a worker thread) and on. Reports latency percentiles and throughput.
+# Needs httpx (also used by fastapi.testclient).
+#
+# Run from backend/:  python -m benchmarks.bench_batching --model k2 --clients 32 --rows 20
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+async def _client(client: httpx.AsyncClient, url: str, payload: bytes, n_requests: int, latencies: list) -> None:
+    for _ in range(n_requests):
+        t0 = time.perf_counter()
+        r = await client.post(url, files={"file": ("bench.csv", payload, "text/csv")})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - t0)
+
+async def run_load(slug: str, payload: bytes, clients: int, requests_per_client: int) -> dict:
+    latencies: list = []
+    transport = httpx.ASGITransport(app=mm.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        url = f"/predict?model={slug}"
+        await _client(client, url, payload, 1, [])  # warm-up
+        t0 = time.perf_counter()
+        await asyncio.gather(*[_client(client, url, payload, requests_per_client, latencies)
+                               for _ in range(clients)])
+        wall = time.perf_counter() - t0
+    lat = np.array(latencies) * 1000.0
+    return {
+        "requests": len(latencies),
+        "req_per_s": len(latencies) / wall,
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p95_ms": float(np.percentile(lat, 95)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Micro-batching on/off under concurrent load")
+    ap.add_argument("--model", default="k2")
+    ap.add_argument("--clients", type=int, default=32)
+    ap.add_argument("--requests", type=int, default=10, help="requests per client")
+    ap.add_argument("--rows", type=int, default=20, help="rows per uploaded CSV")
+    ap.add_argument("--windows", type=float, nargs="+", default=[0.0, 5.0, 20.0], help="batch windows (ms)")
+    args = ap.parse_args()
+
+    spec = mm.REGISTRY[args.model]
+    payload = make_csv_bytes(spec, args.rows, with_label=False)
+    print(f"model={args.model} clients={args.clients} rows/request={args.rows}")
+    print(f"{'window ms':>10}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/batch':>11}")
+    for window in args.windows:
+        mm.BATCH_WINDOW_MS = window
+        spec.batcher = None  # rebuilt with the new window on first use
+        spec.gate = None     # its semaphore belongs to the previous event loop
+        res = asyncio.run(run_load(args.model, payload, args.clients, args.requests))
+        per_batch = spec.batcher.stats()["mean_requests_per_batch"] or 0.0
+        print(f"{window:>10.1f}{res['req_per_s']:>10.1f}{res['p50_ms']:>10.1f}"
+              f"{res['p95_ms']:>10.1f}{res['p99_ms']:>10.1f}{per_batch:>11.1f}")
+
+if __name__ == "__main__":
+    main()
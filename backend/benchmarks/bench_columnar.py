@@ -0,0 +1,64 @@
+# bench_columnar.py
+# Read + preprocess cost of the same catalog uploaded as CSV, Parquet and Arrow IPC. Columnar
+# uploads are projected to the plan's input columns at read time and must give exactly the X of
+# the in-memory frame (CSV only up to float text round-tripping).
+# Needs pyarrow.
+#
+# Run from backend/:  python -m benchmarks.bench_columnar --rows 50000 200000 --models koi k2
+
+import argparse
+import io
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.feather as feather
+
+import app.main_multi as mm
+from benchmarks.synth import make_frame
+
+def encode(df, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    if fmt == "csv":
+        df.to_csv(buf, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(buf, index=False)
+    else:
+        feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), buf, compression="uncompressed")
+    return buf.getvalue()
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="CSV vs Parquet vs Arrow IPC upload parsing")
+    ap.add_argument("--rows", type=int, nargs="+", default=[50_000, 200_000])
+    ap.add_argument("--models", nargs="+", default=["koi", "k2"])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'model':<6}{'rows':>9}{'format':>9}{'MB':>8}{'read+X s':>10}{'vs csv':>8}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        for n in args.rows:
+            df = make_frame(spec, n, seed=n)
+            ref = spec.preprocess_fn(df.dropna(how="all")).to_numpy()
+            t_csv = None
+            for fmt in ("csv", "parquet", "arrow"):
+                content = encode(df, fmt)
+                X, _ = mm._frame_stage(slug, content, fmt=fmt)
+                if fmt == "csv":
+                    np.testing.assert_allclose(X.to_numpy(), ref, rtol=1e-12)
+                else:
+                    np.testing.assert_array_equal(X.to_numpy(), ref)
+                t = best_of(lambda: mm._frame_stage(slug, content, fmt=fmt), args.repeat)
+                t_csv = t_csv or t
+                print(f"{slug:<6}{n:>9}{fmt:>9}{len(content) / 1e6:>8.1f}{t:>10.3f}{t_csv / t:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+# bench_download.py
+# /predict_csv as a JSON data: URL vs the streamed text/csv download (plain and gzip) for one
+# large upload, against a real uvicorn server (a fresh process per mode): time to first byte,
+# total time, response size, and how far the server's peak RSS rose while serving it.
+# Linux only (/proc/<pid>/status, clear_refs).
+#
+# Run from backend/:  python -m benchmarks.bench_download --model k2 --rows 200000
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+def _status_kb(pid: int, field: str) -> int:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1])
+    return 0
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def run_mode(slug: str, query: str, payload: bytes, warmup: bytes) -> dict:
+    port = _free_port()
+    env = dict(os.environ, EXO_CACHE_MAX_BYTES="0")
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main_multi:app", "--port", str(port),
+                               "--log-level", "warning"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    url = f"/predict_csv?model={slug}{query}"
+    try:
+        with httpx.Client(base_url=base_url, timeout=None) as client:
+            for _ in range(200):
+                try:
+                    client.get("/models")
+                    break
+                except httpx.TransportError:
+                    time.sleep(0.1)
+            client.post(url, files={"file": ("warmup.csv", warmup)}).raise_for_status()
+            with open(f"/proc/{server.pid}/clear_refs", "w") as f:
+                f.write("5")  # reset the peak-RSS counter
+            rss0 = _status_kb(server.pid, "VmRSS")
+            t0 = time.perf_counter()
+            first, size = None, 0
+            with client.stream("POST", url, files={"file": ("bench.csv", payload, "text/csv")}) as r:
+                r.raise_for_status()
+                for block in r.iter_raw():
+                    first = first or time.perf_counter()
+                    size += len(block)
+            total = time.perf_counter() - t0
+            peak = _status_kb(server.pid, "VmHWM") - rss0
+    finally:
+        server.terminate()
+        server.wait()
+    return {"ttfb": first - t0, "total": total, "bytes": size, "peak_kb": peak}
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="JSON data: URL vs streamed CSV download for /predict_csv")
+    ap.add_argument("--model", default="k2")
+    ap.add_argument("--rows", type=int, default=200_000)
+    args = ap.parse_args()
+
+    spec = mm._ensure_loaded(mm.REGISTRY[args.model])
+    payload = make_csv_bytes(spec, args.rows, with_label=False)
+    warmup = make_csv_bytes(spec, 100, with_label=False)
+    print(f"model={args.model} rows={args.rows} upload={len(payload) / 1e6:.1f} MB")
+    print(f"{'mode':>12}{'TTFB s':>9}{'total s':>9}{'MB out':>9}{'peak RSS +MB':>14}")
+    for mode, query in (("json", ""), ("stream", "&stream=true"), ("stream+gzip", "&stream=true&gzip=true")):
+        res = run_mode(args.model, query, payload, warmup)
+        print(f"{mode:>12}{res['ttfb']:>9.2f}{res['total']:>9.2f}{res['bytes'] / 1e6:>9.1f}"
+              f"{res['peak_kb'] / 1024:>14.1f}")
+
+if __name__ == "__main__":
+    main()
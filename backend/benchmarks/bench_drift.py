@@ -0,0 +1,62 @@
+# bench_drift.py
+# Cost of drift tracking (app/drift.py) on synthetic uploads: the sketch update per batch,
+# sampled as the app does it (EXO_DRIFT_SAMPLE_ROWS) and over every row, against
+# preprocess_fn alone and against the whole parse + preprocess + predict path it rides on,
+# plus how far the sampled sketch's PSI is from the exact one. Models without a drift
+# baseline get one fitted on a synthetic sample, which has the same shape (and cost) as one
+# built from the training catalog.
+#
+# Run from backend/:  python -m benchmarks.bench_drift --models koi k2 tess --rows 1000 10000 100000
+
+import argparse
+import time
+
+import app.main_multi as mm
+import numpy as np
+
+from app.drift import DriftSketch, psi
+from benchmarks.synth import make_csv_bytes, make_frame
+
+def best(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return min(times)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Drift sketch update overhead")
+    ap.add_argument("--models", nargs="+", default=["koi", "k2", "tess"])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--sample-rows", type=int, default=mm.DRIFT_SAMPLE_ROWS)
+    args = ap.parse_args()
+
+    print(f"sample rows: {args.sample_rows}")
+    print(f"{'model':<6}{'rows':>9}{'drift ms':>10}{'exact ms':>10}{'prep ms':>10}{'of prep':>9}"
+          f"{'exact of prep':>15}{'path ms':>10}{'of path':>9}{'psi err':>9}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        if spec.drift_baseline is not None:
+            baseline = spec.drift_baseline["sketch"]
+        else:
+            X = spec.preprocess_fn(make_frame(spec, 5_000, seed=1, with_label=False))
+            baseline = DriftSketch.fit(list(X.columns), X.to_numpy())
+        for n in args.rows:
+            content = make_csv_bytes(spec, n)
+            raw = mm.read_upload_frame(content, spec.header_tokens)
+            X = spec.preprocess_fn(raw)
+            sampled, exact = baseline.empty(), baseline.empty()
+            t_drift = best(lambda: sampled.update(X.to_numpy(), args.sample_rows), args.repeat)
+            t_exact = best(lambda: exact.update(X.to_numpy()), args.repeat)
+            t_prep = best(lambda: spec.preprocess_fn(raw), args.repeat)
+            t_path = best(lambda: mm._score_rows(
+                spec, spec.preprocess_fn(mm.read_upload_frame(content, spec.header_tokens)), True), args.repeat)
+            err = np.nanmax(np.abs(psi(sampled, baseline) - psi(exact, baseline)))
+            print(f"{slug:<6}{n:>9}{t_drift * 1e3:>10.2f}{t_exact * 1e3:>10.2f}{t_prep * 1e3:>10.2f}"
+                  f"{t_drift / t_prep:>9.1%}{t_exact / t_prep:>15.1%}{t_path * 1e3:>10.1f}{t_drift / t_path:>9.2%}"
+                  f"{err:>9.4f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# bench_explain.py
+# Throughput of per-row feature attribution (app/explain.py) on synthetic uploads, against
+# the naive scheme of re-scoring one perturbed copy per row and feature through sklearn
+# (timed on a sample and extrapolated). Checks tree path contributions add up to sklearn's
+# output and SVM occlusion equals the naive perturbation on that sample.
+#
+# Run from backend/:  python -m benchmarks.bench_explain --models koi k2 tess --rows 10000
+#
+# Synthetic KOI rows mostly land far outside the training range after the PowerTransformer,
+# where occlusion is closed-form ("far" counts them), so the SVM is also timed on rows drawn
+# around its support vectors ("near").
+
+import argparse
+import time
+
+import numpy as np
+
+import app.main_multi as mm
+from app.explain import Explainer, KernelOcclusion
+from benchmarks.synth import make_frame
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def sklearn_output(est, model, Xt):
+    if isinstance(model, KernelOcclusion):
+        return est.decision_function(Xt)[:, None]
+    return est.predict_proba(Xt) if model.units == "probability" else est._raw_predict(Xt)
+
+def naive(est, model, Xt, baseline):
+    """Occlusion by re-scoring: one perturbed copy per row and feature."""
+    ref = sklearn_output(est, model, Xt)
+    out = np.empty((Xt.shape[0], Xt.shape[1], ref.shape[1]))
+    for j in range(Xt.shape[1]):
+        P = Xt.copy()
+        P[:, j] = baseline[j]
+        out[:, j] = ref - sklearn_output(est, model, P)
+    return out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-row feature attribution: batched vs naive")
+    ap.add_argument("--models", nargs="+", default=["koi", "k2", "tess"])
+    ap.add_argument("--rows", type=int, default=10_000)
+    ap.add_argument("--sample", type=int, default=200, help="rows timed and checked with the naive scheme")
+    args = ap.parse_args()
+
+    print(f"{'model':<6}{'method':<11}{'rows':>8}{'far':>7}{'seconds':>9}{'rows/s':>10}{'naive s*':>10}{'max err':>10}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        X = spec.preprocess_fn(make_frame(spec, args.rows, seed=7, with_label=False))
+        ex = Explainer(spec.pipe, list(X.columns))
+        est, model = spec.pipe[-1], ex.model
+        t, _ = timed(lambda: ex.explain(X, 5))
+        Xt = ex._transform(X)
+        sample = Xt[:args.sample]
+        if isinstance(model, KernelOcclusion):
+            far = int((np.abs(Xt) > model.reach).any(axis=1).sum())
+            t_naive, ref = timed(lambda: naive(est, model, sample, model.baseline))
+            err = np.abs(model.contributions(sample) - ref).max()
+        else:
+            far = 0
+            # the per-row alternative: perturb each feature to the imputed median and re-score
+            baseline = ex._transform(X.iloc[:1] * np.nan)[0]
+            t_naive, _ = timed(lambda: naive(est, model, sample, baseline))
+            err = np.abs(model.outputs(model.contributions(sample), sample) - sklearn_output(est, model, sample)).max()
+        naive_total = t_naive * len(X) / len(sample)
+        print(f"{slug:<6}{model.method:<11}{len(X):>8}{far:>7}{t:>9.2f}{len(X) / t:>10.0f}{naive_total:>10.1f}{err:>10.1e}")
+        if isinstance(model, KernelOcclusion):
+            rng = np.random.default_rng(7)
+            near = model.sv[rng.integers(0, len(model.sv), args.rows)] + rng.normal(0, 0.3, (args.rows, Xt.shape[1]))
+            t, _ = timed(lambda: model.contributions(near))
+            t_naive, ref = timed(lambda: naive(est, model, near[:args.sample], model.baseline))
+            err = np.abs(model.contributions(near[:args.sample]) - ref).max()
+            naive_total = t_naive * args.rows / args.sample
+            print(f"{'near':<6}{model.method:<11}{args.rows:>8}{0:>7}{t:>9.2f}{args.rows / t:>10.0f}{naive_total:>10.1f}{err:>10.1e}")
+    print("* naive: re-scoring one copy per row and feature, extrapolated from --sample rows")
+
+if __name__ == "__main__":
+    main()
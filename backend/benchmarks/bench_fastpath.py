@@ -0,0 +1,51 @@
+# bench_fastpath.py
+# Flattened tree ensembles (app/fastpath.py) vs sklearn Pipeline.predict_proba.
+# For each model: exports the fast path in memory, asserts bit-identical output to sklearn on
+# threshold-probing rows and on synthetic uploads, then reports rows/s at several batch sizes.
+#
+# Run from backend/:  python -m benchmarks.bench_fastpath --models k2 tess --rows 10000 100000
+
+import argparse
+import time
+
+import numpy as np
+
+import app.main_multi as mm
+from app import fastpath
+from benchmarks.synth import make_frame
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Fast-path vs sklearn throughput for tree ensembles")
+    ap.add_argument("--models", nargs="+", default=["k2", "tess"])
+    ap.add_argument("--rows", type=int, nargs="+", default=[1, 20, 1_000, 10_000, 100_000])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'model':>6}{'rows':>9}{'sklearn rows/s':>16}{'fast rows/s':>14}{'speedup':>9}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        est = spec.pipe[-1]
+        cls, arrays = fastpath._flatten(est)
+        fast = fastpath.FastPipeline(spec.pipe, fastpath._build(cls, arrays, est))
+
+        fastpath.check_parity(fast, est, fastpath.probe_rows(fast.flat, 20_000))
+        for n in args.rows:
+            X = spec.preprocess_fn(make_frame(spec, n, seed=n, with_label=False))
+            assert np.array_equal(fast.predict_proba(X), spec.pipe.predict_proba(X))
+            assert np.array_equal(fast.predict(X), spec.pipe.predict(X))
+
+            t_sk = best_of(lambda: spec.pipe.predict_proba(X), args.repeat)
+            t_fast = best_of(lambda: fast.predict_proba(X), args.repeat)
+            print(f"{slug:>6}{n:>9}{n / t_sk:>16,.0f}{n / t_fast:>14,.0f}{t_sk / t_fast:>8.1f}x")
+    print("parity: ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# bench_jobs.py
+# A large upload run as a blocking /analyze request vs as a background job (POST /jobs, poll,
+# GET result): how long the client's connection is held, time until the result is available,
+# and the latency of small interactive /predict requests issued meanwhile. Checks the job
+# result equals the /analyze response. The result cache is disabled.
+#
+# Run from backend/:  python -m benchmarks.bench_jobs --model k2 --rows 100000
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+os.environ.setdefault("EXO_JOBS_DIR", tempfile.mkdtemp(prefix="exo-jobs-"))
+
+import httpx
+import numpy as np
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+async def probe(client, slug: str, small: bytes, stop: asyncio.Event, latencies: list) -> None:
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        r = await client.post(f"/predict?model={slug}", files={"file": ("small.csv", small)})
+        r.raise_for_status()
+        latencies.append(time.perf_counter() - t0)
+        await asyncio.sleep(0.05)
+
+async def run_mode(client, mode: str, slug: str, big: bytes, small: bytes) -> dict:
+    stop, latencies = asyncio.Event(), []
+    prober = asyncio.create_task(probe(client, slug, small, stop, latencies))
+    t0 = time.perf_counter()
+    if mode == "analyze":
+        body = (await client.post(f"/analyze?model={slug}", files={"file": ("big.csv", big)})).json()
+        held = done = time.perf_counter() - t0
+    else:
+        r = await client.post(f"/jobs?model={slug}", files={"file": ("big.csv", big)})
+        held = time.perf_counter() - t0
+        job_id = r.json()["job_id"]
+        while (job := (await client.get(f"/jobs/{job_id}")).json())["status"] in ("queued", "running"):
+            await asyncio.sleep(0.2)
+        body = (await client.get(job["result_url"])).json()
+        done = time.perf_counter() - t0
+    stop.set()
+    await prober
+    lat = np.array(latencies or [np.nan]) * 1e3
+    return {"held": held, "done": done, "body": body, "n": len(latencies),
+            "p50": np.percentile(lat, 50), "p95": np.percentile(lat, 95)}
+
+async def run(slug: str, big: bytes, small: bytes):
+    transport = httpx.ASGITransport(app=mm.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        await client.post(f"/predict?model={slug}", files={"file": ("small.csv", small)})  # load the model
+        return {mode: await run_mode(client, mode, slug, big, small) for mode in ("analyze", "job")}
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Blocking /analyze vs background job for one large upload")
+    ap.add_argument("--model", default="k2")
+    ap.add_argument("--rows", type=int, default=100_000)
+    args = ap.parse_args()
+
+    mm.RESULT_CACHE.max_bytes = 0
+    spec = mm._ensure_loaded(mm.REGISTRY[args.model])
+    big = make_csv_bytes(spec, args.rows, with_label=False)
+    small = make_csv_bytes(spec, 20, with_label=False, seed=1)
+    print(f"model={args.model} rows={args.rows} upload={len(big) / 1e6:.1f} MB cpus={os.cpu_count()} "
+          f"job_chunk_rows={mm.JOB_CHUNK_ROWS}")
+    res = asyncio.run(run(args.model, big, small))
+    assert res["job"]["body"] == res["analyze"]["body"]
+    print(f"{'mode':>8}{'held s':>9}{'result s':>10}{'/predict n':>12}{'p50 ms':>9}{'p95 ms':>9}")
+    for mode, r in res.items():
+        print(f"{mode:>8}{r['held']:>9.2f}{r['done']:>10.2f}{r['n']:>12}{r['p50']:>9.1f}{r['p95']:>9.1f}")
+    print("job result == /analyze: ok")
+
+if __name__ == "__main__":
+    main()
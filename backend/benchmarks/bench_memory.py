@@ -0,0 +1,55 @@
+# bench_memory.py
+# Per-request memory of the feature matrix: for each model and upload size, the size of X and
+# the peak memory allocated (tracemalloc) while building X from the parsed frame and scoring it,
+# with X in float64 and in the model's compact dtype (float32 for tree ensembles, see
+# _feature_dtype). Checks both give the same predictions and probabilities.
+#
+# Run from backend/:  python -m benchmarks.bench_memory --models k2 --rows 10000 100000
+
+import argparse
+import tracemalloc
+
+import numpy as np
+
+import app.main_multi as mm
+from benchmarks.synth import make_frame
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    try:
+        out = fn()
+        return tracemalloc.get_traced_memory()[1], out
+    finally:
+        tracemalloc.stop()
+
+def request(spec, raw, dtype):
+    """Stages of one request that hold feature data: preprocess, predict, predict_proba."""
+    X = spec.plan.transform(raw, dtype)
+    pred, P = mm._score_rows(spec, X, True)
+    return X.to_numpy().nbytes, pred, P
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Feature matrix memory per request: float64 vs compact")
+    ap.add_argument("--models", nargs="+", default=["k2"])
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    args = ap.parse_args()
+
+    mm.FASTPATH_MAX_ROWS = 0   # measure the sklearn path
+    print(f"{'model':<6}{'rows':>9}  {'dtype':<8}{'X MiB':>9}{'peak MiB':>10}{'saved':>8}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        for n in args.rows:
+            raw = make_frame(spec, n, seed=n, with_label=False)
+            base = None
+            for dtype in dict.fromkeys((np.float64, spec.feature_dtype)):
+                peak, (x_bytes, pred, P) = peak_bytes(lambda: request(spec, raw, dtype))
+                if base is None:
+                    base = (peak, pred, P)
+                else:
+                    assert np.array_equal(pred, base[1]) and np.array_equal(P, base[2]), (slug, n)
+                saved = f"{1 - peak / base[0]:.0%}" if peak != base[0] else ""
+                print(f"{slug:<6}{n:>9}  {np.dtype(dtype).name:<8}{x_bytes / 2**20:>9.1f}{peak / 2**20:>10.1f}{saved:>8}")
+    print("compact == float64 predictions: ok")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# bench_mmap.py
+# Model memory across N worker processes with and without memory-mapped artifacts.
+# Each worker loads one pipeline, scores a batch (so the arrays are actually touched), waits
+# until every worker has done the same, then reports how much its PSS and private memory grew.
+# Summed PSS is what the workers really cost together: shared mmapped pages are split between
+# the processes mapping them, private copies are counted in full. Linux only (/proc/smaps_rollup).
+#
+# Run from backend/:  python -m benchmarks.bench_mmap --models koi k2 --workers 4
+
+import argparse
+import multiprocessing as mp
+from typing import Dict
+
+import joblib
+
+def _smaps() -> Dict[str, int]:
+    out = {}
+    with open("/proc/self/smaps_rollup", "r") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                out[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return out
+
+def _worker(path: str, X, mmap_mode, barrier, results) -> None:
+    # Import the estimator modules first so only the model itself is measured
+    import sklearn.ensemble, sklearn.impute, sklearn.pipeline, sklearn.preprocessing, sklearn.svm  # noqa: F401
+    before = _smaps()
+    pipe = joblib.load(path, mmap_mode=mmap_mode)
+    pipe.predict(X)
+    barrier.wait()  # every worker holds its model now, so shared pages are split N ways
+    after = _smaps()
+    private = lambda s: s.get("Private_Clean", 0) + s.get("Private_Dirty", 0)
+    results.put((after["Pss"] - before["Pss"], private(after) - private(before)))
+    barrier.wait()
+
+def measure(path: str, X, mmap_mode, n_workers: int):
+    ctx = mp.get_context("spawn")
+    barrier, results = ctx.Barrier(n_workers), ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(path, X, mmap_mode, barrier, results))
+             for _ in range(n_workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    return sum(r[0] for r in rows), sum(r[1] for r in rows)
+
+def main() -> None:
+    import app.main_multi as mm
+    from benchmarks.synth import make_frame
+
+    ap = argparse.ArgumentParser(description="Model memory per worker with and without mmap")
+    ap.add_argument("--models", nargs="+", default=["koi", "k2"])
+    ap.add_argument("--workers", type=int, default=4)
+    args = ap.parse_args()
+
+    mib = 2 ** 20
+    print(f"workers={args.workers}")
+    print(f"{'model':>6}{'mmap':>6}{'total PSS MiB':>15}{'private MiB':>13}{'PSS/worker':>12}")
+    for slug in args.models:
+        spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        X = spec.preprocess_fn(make_frame(spec, 200, with_label=False))
+        for mode in (None, "c"):
+            pss, private = measure(spec.pipeline_path, X, mode, args.workers)
+            print(f"{slug:>6}{mode or '-':>6}{pss / mib:>15.2f}{private / mib:>13.2f}"
+                  f"{pss / args.workers / mib:>12.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# bench_multi.py
+# One upload carrying the KOI, K2 and TESS columns, scored by every model: three /analyze
+# requests (three parses) vs one /analyze_multi (one parse, models run concurrently). The
+# result cache is disabled so every request does the work. Checks both give the same results.
+#
+# Run from backend/:  python -m benchmarks.bench_multi --rows 50000
+
+import argparse
+import asyncio
+import os
+import time
+
+import httpx
+import pandas as pd
+
+import app.main_multi as mm
+from benchmarks.synth import make_frame
+
+async def run(models, payload: bytes, repeat: int):
+    transport = httpx.ASGITransport(app=mm.app)
+    files = lambda: {"file": ("bench.csv", payload, "text/csv")}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        best_single, best_multi = float("inf"), float("inf")
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            singles = {m: (await client.post(f"/analyze?model={m}", files=files())).json() for m in models}
+            best_single = min(best_single, time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            multi = (await client.post(f"/analyze_multi?models={','.join(models)}", files=files())).json()
+            best_multi = min(best_multi, time.perf_counter() - t0)
+        assert multi["models"] == singles, multi["errors"]
+        return best_single, best_multi
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="/analyze per model vs one /analyze_multi")
+    ap.add_argument("--models", nargs="+", default=["koi", "k2", "tess"])
+    ap.add_argument("--rows", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=2)
+    args = ap.parse_args()
+
+    mm.RESULT_CACHE.max_bytes = 0
+    # labelled: TESS header detection needs its label column (tfopwg_disp)
+    frames = [make_frame(mm._ensure_loaded(mm.REGISTRY[m]), args.rows, seed=i)
+              for i, m in enumerate(args.models)]
+    df = pd.concat(frames, axis=1)
+    df = df.loc[:, ~df.columns.duplicated()]
+    payload = df.to_csv(index=False).encode("utf-8")
+    print(f"models={args.models} rows={args.rows} columns={df.shape[1]} upload={len(payload) / 1e6:.1f} MB "
+          f"cpus={os.cpu_count()} workers={mm.WORKER_KIND}")
+    single, multi = asyncio.run(run(args.models, payload, args.repeat))
+    print(f"{'per-model /analyze':>20}{single:>8.2f} s")
+    print(f"{'/analyze_multi':>20}{multi:>8.2f} s  ({single / multi:.2f}x)")
+
+if __name__ == "__main__":
+    main()
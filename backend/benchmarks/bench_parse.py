@@ -0,0 +1,66 @@
+# bench_parse.py
+# Parse cost per request: the old double parse (raw_df + preprocess_fn(content)) vs the single
+# shared parse in read_upload_frame.
+#
+# Run from backend/:  python -m benchmarks.bench_parse --rows 50000 200000 --models koi k2
+
+import argparse
+import csv
+import io
+import time
+
+import pandas as pd
+
+from app.main_multi import REGISTRY, read_upload_frame
+from benchmarks.synth import make_csv_bytes
+
+def _legacy_detect_header(content: bytes, identifiers, max_lines: int = 200) -> int:
+    # Previous implementation: decodes the whole payload to look at the first lines.
+    text = content.decode("utf-8", errors="ignore")
+    for i, row in enumerate(csv.reader(io.StringIO(text))):
+        if i >= max_lines:
+            break
+        norm = [str(c).strip().lower() for c in row]
+        for token in identifiers:
+            if str(token).strip().lower() in norm:
+                return i
+    raise ValueError("Could not detect header.")
+
+def _legacy_parse(content: bytes, identifiers) -> pd.DataFrame:
+    hdr = _legacy_detect_header(content, identifiers)
+    return pd.read_csv(io.StringIO(content.decode("utf-8", errors="ignore")), header=hdr)
+
+def legacy_request(content: bytes, spec):
+    raw_df = _legacy_parse(content, spec.header_identifiers)          # endpoint's raw_df
+    df = _legacy_parse(content, spec.header_identifiers).dropna(how="all")  # inside preprocess_fn
+    return raw_df, df
+
+def single_parse_request(content: bytes, spec) -> pd.DataFrame:
+    return read_upload_frame(content, spec.header_identifiers)
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Legacy double parse vs single shared parse")
+    ap.add_argument("--rows", type=int, nargs="+", default=[50_000, 200_000])
+    ap.add_argument("--models", nargs="+", default=["koi", "k2"])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    print(f"{'model':<6}{'rows':>9}{'MB':>8}{'legacy s':>11}{'single s':>11}{'speedup':>9}")
+    for slug in args.models:
+        spec = REGISTRY[slug]
+        for n in args.rows:
+            content = make_csv_bytes(spec, n)
+            t_old = _best_of(lambda: legacy_request(content, spec), args.repeat)
+            t_new = _best_of(lambda: single_parse_request(content, spec), args.repeat)
+            print(f"{slug:<6}{n:>9}{len(content) / 1e6:>8.1f}{t_old:>11.3f}{t_new:>11.3f}{t_old / t_new:>8.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+# bench_row_memo.py
+# Re-submitted catalogs with the row memo (EXO_ROW_MEMO_PATH): scoring a synthetic upload
+# with the memo off, then with it on for the first submission (every row scored and stored),
+# the same catalog again, and a revision with a fraction of its rows changed. Checks that
+# every memoized answer equals the unmemoized one.
+#
+# Run from backend/:  python -m benchmarks.bench_row_memo --model koi --rows 20000 --changed 0.05
+
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+import app.main_multi as mm
+from app.row_memo import RowMemo
+from benchmarks.synth import make_csv_bytes
+
+def revise(X, fraction: float, seed: int = 1):
+    """A copy of X with `fraction` of its rows nudged (a new catalog revision)."""
+    X = X.copy()
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(X), int(len(X) * fraction), replace=False)
+    col = X.columns.get_loc(next(c for c in X.columns if np.issubdtype(X[c].dtype, np.floating)))
+    X.iloc[rows, col] = X.iloc[rows, col] * 1.01 + 0.01
+    return X
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return time.perf_counter() - t0, out
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Row memo: first vs repeated vs revised catalog")
+    ap.add_argument("--model", default="koi")
+    ap.add_argument("--rows", type=int, default=20_000)
+    ap.add_argument("--changed", type=float, default=0.05, help="fraction of rows changed in the revision")
+    ap.add_argument("--proba", action="store_true", help="also return probabilities")
+    args = ap.parse_args()
+
+    spec = mm._ensure_loaded(mm.REGISTRY[args.model])
+    raw = mm.read_upload_frame(make_csv_bytes(spec, args.rows), spec.header_tokens)   # TESS finds its header by the label
+    raw = raw.drop(columns=[spec.label_col])
+    X = spec.preprocess_fn(raw)
+    X2 = revise(X, args.changed)
+
+    mm._ROW_MEMO = None
+    t_off, ref = timed(lambda: mm._score_batch(spec.slug, X, args.proba))
+    _, ref2 = timed(lambda: mm._score_batch(spec.slug, X2, args.proba))
+
+    with tempfile.TemporaryDirectory() as d:
+        memo = mm._ROW_MEMO = RowMemo(os.path.join(d, "memo.sqlite3"))
+        mm.ROW_MEMO_PATH = memo.path
+        try:
+            print(f"model={args.model} rows={args.rows} distinct={len(np.unique(X.to_numpy(), axis=0))} "
+                  f"proba={args.proba} cpus={os.cpu_count()}")
+            print(f"{'run':<22}{'seconds':>9}{'vs off':>9}{'hits':>9}{'scored':>9}")
+            print(f"{'memo off':<22}{t_off:>9.3f}")
+            for name, data, want in (("first submission", X, ref), ("same catalog", X, ref),
+                                     (f"{args.changed:.0%} rows changed", X2, ref2)):
+                hits0, misses0 = memo.hits, memo.misses
+                t, got = timed(lambda: mm._score_batch(spec.slug, data, args.proba))
+                assert np.array_equal(got[0], want[0]), name
+                assert (got[1] is None) == (want[1] is None) and (got[1] is None or np.array_equal(got[1], want[1])), name
+                print(f"{name:<22}{t:>9.3f}{t / t_off:>8.1%}{memo.hits - hits0:>9}{memo.misses - misses0:>9}")
+        finally:
+            mm._ROW_MEMO = None
+            mm.ROW_MEMO_PATH = None
+    print("memoized == unmemoized: ok")
+
+if __name__ == "__main__":
+    main()
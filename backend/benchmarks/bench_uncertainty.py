@@ -0,0 +1,108 @@
+# bench_uncertainty.py
+# add_uncertainty_features: the previous per-pair loop vs the vectorized block version.
+# Checks exact output parity (values, dtypes, column order, returned names) before timing.
+#
+# Run from backend/:  python -m benchmarks.bench_uncertainty --rows 100000
+
+import argparse
+import time
+from typing import List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.main_multi import add_uncertainty_features
+
+def legacy_add_uncertainty_features(df_in: pd.DataFrame,
+                                    keep_asymmetric: bool,
+                                    min_den: float) -> Tuple[pd.DataFrame, List[str]]:
+    # Previous implementation, kept verbatim as the parity reference.
+    df_out = df_in.copy()
+    err1_cols = [c for c in df_out.columns if c.endswith("_err1")]
+    base_to_errs = {}
+    for e1 in err1_cols:
+        base = e1[:-5]
+        e2 = f"{base}_err2"
+        if e2 in df_out.columns:
+            base_to_errs[base] = (e1, e2)
+
+    new_cols = {}
+    for base, (e1, e2) in base_to_errs.items():
+        if base not in df_out.columns:
+            continue
+        val  = pd.to_numeric(df_out[base], errors="coerce")
+        err1 = pd.to_numeric(df_out[e1], errors="coerce").abs()
+        err2 = pd.to_numeric(df_out[e2], errors="coerce").abs()
+
+        abs_err_mean = (err1 + err2) / 2.0
+        denom = np.maximum(np.abs(val), min_den)
+        rel_err = abs_err_mean / denom
+        new_cols[f"{base}_rel_error"] = rel_err
+
+        if keep_asymmetric:
+            new_cols[f"{base}_rel_err_upper"] = err1 / denom
+            new_cols[f"{base}_rel_err_lower"] = err2 / denom
+
+    for k, v in new_cols.items():
+        df_out[k] = v
+
+    drop_cols_local = []
+    for base, (e1, e2) in base_to_errs.items():
+        drop_cols_local.extend([e1, e2])
+    df_out = df_out.drop(columns=drop_cols_local, errors="ignore")
+
+    return df_out, sorted(new_cols.keys())
+
+def make_error_frame(n_rows: int, n_pairs: int, seed: int = 0) -> pd.DataFrame:
+    """Value + _err1/_err2 columns with the awkward cases real archive exports contain."""
+    rng = np.random.default_rng(seed)
+    cols = {"pl_name": [f"obj-{i}" for i in range(n_rows)]}
+    for k in range(n_pairs):
+        cols[f"p{k}"] = rng.normal(0.0, 3.0, n_rows)
+        cols[f"p{k}_err1"] = rng.random(n_rows)
+        cols[f"p{k}_err2"] = -rng.random(n_rows)
+    df = pd.DataFrame(cols)
+    df.loc[rng.random(n_rows) < 0.1, "p0"] = np.nan
+    df["p1"] = 0.0                                      # hits the min_den floor
+    df["p2"] = df["p2"].astype(object)
+    df.loc[::13, "p2"] = "n/a"                          # non-numeric text
+    df["p3"] = rng.integers(-5, 5, n_rows)              # integer values
+    df["orphan_err1"] = rng.random(n_rows)              # pair without a base column
+    df["orphan_err2"] = rng.random(n_rows)
+    df["lonely_err1"] = rng.random(n_rows)              # err1 without err2: kept as-is
+    df["p4_rel_error"] = 1.0                            # pre-existing output name: overwritten in place
+    return df
+
+def check_parity(df: pd.DataFrame) -> None:
+    for keep_asymmetric in (False, True):
+        old, old_names = legacy_add_uncertainty_features(df, keep_asymmetric, 1e-12)
+        new, new_names = add_uncertainty_features(df, keep_asymmetric, 1e-12)
+        pd.testing.assert_frame_equal(new, old, check_exact=True)
+        assert new_names == old_names, (new_names, old_names)
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Vectorized vs per-pair add_uncertainty_features")
+    ap.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    ap.add_argument("--pairs", type=int, default=40)
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    check_parity(make_error_frame(2_000, 8, seed=1))
+    check_parity(make_error_frame(0, 3))
+    print("parity: ok")
+
+    print(f"{'rows':>9}{'pairs':>7}{'loop s':>10}{'vector s':>10}{'speedup':>9}")
+    for n in args.rows:
+        df = make_error_frame(n, args.pairs)
+        times = []
+        for fn in (legacy_add_uncertainty_features, add_uncertainty_features):
+            best = float("inf")
+            for _ in range(args.repeat):
+                t0 = time.perf_counter()
+                fn(df, False, 1e-12)
+                best = min(best, time.perf_counter() - t0)
+            times.append(best)
+        print(f"{n:>9}{args.pairs:>7}{times[0]:>10.4f}{times[1]:>10.4f}{times[0] / times[1]:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# suite.py
+# The benchmark suite: per-stage timings (header detection, model detection, parse, preprocess, pipe.predict,
+# _predict_proba_safe, the serving predict path, metrics, response build) and end-to-end
+# /analyze and /evaluate throughput through the ASGI app, for synthetic KOI / K2 / TESS
+# catalogs at several sizes. Results go to JSON with the environment they were measured in;
+# --compare reports the change between two result files and flags regressions.
+#
+# Run from backend/:
+#   python -m benchmarks.suite --sizes 1000 10000 100000 --out bench.json
+#   python -m benchmarks.suite --compare before.json after.json --threshold 0.1
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+import pandas as pd
+import sklearn
+from fastapi import UploadFile
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+def measure(fn: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"best_s": min(times), "median_s": statistics.median(times)}
+
+def _git_commit() -> Optional[str]:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=10,
+                             cwd=os.path.dirname(os.path.abspath(__file__)))
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return out.stdout.strip() or None
+
+def environment() -> Dict[str, Any]:
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "orjson": mm.orjson is not None,
+        "worker_kind": mm.WORKER_KIND,
+        "fastpath": mm.FASTPATH_ENABLED,
+        "fastpath_max_rows": mm.FASTPATH_MAX_ROWS,
+    }
+
+def _unlabelled_upload(spec, n_rows: int) -> Optional[bytes]:
+    """The upload without its label column, or None if the header cannot be found without it."""
+    content = make_csv_bytes(spec, n_rows, seed=n_rows, with_label=False)
+    try:
+        mm.detect_header_row_from_bytes(content, spec.header_tokens)
+    except ValueError:
+        return None
+    return content
+
+def stage_results(spec, n_rows: int, repeat: int) -> List[Dict[str, Any]]:
+    """Each stage of an /analyze or /evaluate request, timed on its own."""
+    labelled = make_csv_bytes(spec, n_rows, seed=n_rows)
+    unlabelled = _unlabelled_upload(spec, n_rows) or labelled   # TESS finds its header by the label column
+    ids = spec.header_tokens
+
+    raw_df = mm.read_upload_frame(unlabelled, ids).drop(columns=[spec.label_col], errors="ignore")
+    X = spec.preprocess_fn(raw_df)
+    pred, P = mm._score_batch(spec.slug, X, True)
+    labelled_df = mm.read_upload_frame(labelled, ids)
+    y_true, mask = mm._label_indices(spec, labelled_df[spec.label_col])
+    y_pred = mm._score_batch(spec.slug, spec.preprocess_fn(labelled_df), False)[0][mask]
+
+    async def precomputed(X, want_proba=False):
+        return pred, (P if want_proba else None)
+
+    loop = asyncio.new_event_loop()
+
+    def response_build():   # /analyze's predict-mode body from precomputed predictions
+        payload = loop.run_until_complete(mm._analyze_payload(spec, X, raw_df, True, 3, "rows", predict=precomputed))
+        return mm.json_bytes(payload)
+
+    stages = {
+        "header": lambda: mm.detect_header_row_from_bytes(unlabelled, ids),
+        "detect_model": lambda: mm.detect_model(UploadFile(io.BytesIO(unlabelled))),
+        "parse": lambda: mm.read_upload_frame(unlabelled, ids),
+        "preprocess": lambda: spec.preprocess_fn(raw_df),
+        "pipe.predict": lambda: spec.pipe.predict(X),
+        "predict_proba": lambda: mm._predict_proba_safe(spec.pipe, X),
+        "score_batch": lambda: mm._score_batch(spec.slug, X, True),   # serving path (fast path when eligible)
+        "metrics": lambda: mm._metrics_stage(spec.class_names, y_true, y_pred),
+        "response_build": response_build,
+    }
+    out = []
+    try:
+        for name, fn in stages.items():
+            res = measure(fn, repeat)
+            out.append({"model": spec.slug, "rows": n_rows, "stage": name, **res,
+                        "rows_per_s": n_rows / res["median_s"] if res["median_s"] > 0 else None,
+                        "upload_bytes": len(unlabelled)})
+    finally:
+        loop.close()
+    return out
+
+async def _end_to_end(spec, n_rows: int, repeat: int) -> List[Dict[str, Any]]:
+    unlabelled = _unlabelled_upload(spec, n_rows)
+    cases = ((("/analyze", unlabelled),) if unlabelled is not None else ()) + \
+            (("/evaluate", make_csv_bytes(spec, n_rows, seed=n_rows)),)
+    transport = httpx.ASGITransport(app=mm.app)
+    out = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for endpoint, payload in cases:
+            times = []
+            for _ in range(repeat):
+                t0 = time.perf_counter()
+                r = await client.post(f"{endpoint}?model={spec.slug}", files={"file": ("bench.csv", payload)})
+                times.append(time.perf_counter() - t0)
+                r.raise_for_status()
+            median = statistics.median(times)
+            out.append({"model": spec.slug, "rows": n_rows, "stage": f"e2e {endpoint}",
+                        "best_s": min(times), "median_s": median, "rows_per_s": n_rows / median,
+                        "upload_bytes": len(payload), "response_bytes": len(r.content)})
+    return out
+
+def run_suite(models: List[str], sizes: List[int], repeat: int) -> Dict[str, Any]:
+    mm.RESULT_CACHE.max_bytes = 0   # every request does the work
+    results, skipped = [], {}
+    for slug in models:
+        try:
+            spec = mm._ensure_loaded(mm.REGISTRY[slug])
+        except Exception as e:
+            skipped[slug] = f"{type(e).__name__}: {e}"
+            print(f"[suite] skipping {slug}: {skipped[slug]}", file=sys.stderr)
+            continue
+        for n in sizes:
+            rows = stage_results(spec, n, repeat) + asyncio.run(_end_to_end(spec, n, repeat))
+            for r in rows:
+                print(f"{r['model']:<6}{r['rows']:>9}  {r['stage']:<16}{r['median_s']:>10.4f}"
+                      f"{r['rows_per_s'] or 0:>14,.0f}")
+            results.extend(rows)
+    return {"environment": environment(), "repeat": repeat, "created": time.time(),
+            "skipped": skipped, "results": results}
+
+def compare(before: Dict[str, Any], after: Dict[str, Any], threshold: float) -> int:
+    """
+    Print the change in best-of-repeat time per (model, rows, stage); the minimum is far less
+    noisy than the median on a shared machine. Returns the number of regressions.
+    """
+    key = lambda r: (r["model"], r["rows"], r["stage"])
+    old = {key(r): r for r in before["results"]}
+    regressions = 0
+    print(f"{'model':<6}{'rows':>9}  {'stage':<16}{'before s':>10}{'after s':>10}{'change':>9}")
+    for r in after["results"]:
+        b = old.get(key(r))
+        if b is None:
+            continue
+        change = r["best_s"] / b["best_s"] - 1.0 if b["best_s"] > 0 else 0.0
+        flag = ""
+        if change > threshold:
+            flag, regressions = "  REGRESSION", regressions + 1
+        print(f"{r['model']:<6}{r['rows']:>9}  {r['stage']:<16}{b['best_s']:>10.4f}{r['best_s']:>10.4f}"
+              f"{change:>+8.1%}{flag}")
+    for label, env in (("before", before["environment"]), ("after", after["environment"])):
+        print(f"{label}: commit={env.get('commit')} python={env.get('python')} cpus={env.get('cpus')}")
+    return regressions
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description="Per-stage and end-to-end benchmark suite")
+    ap.add_argument("--models", nargs="+", default=list(mm.REGISTRY))
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000],
+                    help="rows per synthetic upload (up to 1000000)")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default=None, help="write results as JSON here")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two result files")
+    ap.add_argument("--threshold", type=float, default=0.10, help="slowdown counted as a regression (0.1 = 10%%)")
+    args = ap.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f, open(args.compare[1]) as g:
+            n = compare(json.load(f), json.load(g), args.threshold)
+        sys.exit(1 if n else 0)
+
+    print(f"{'model':<6}{'rows':>9}  {'stage':<16}{'median s':>10}{'rows/s':>14}")
+    report = run_suite(args.models, args.sizes, args.repeat)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"wrote {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# synth.py
+# Synthetic KOI / K2 / TESS-shaped catalogs for benchmarks, built from each ModelSpec's
+# train_features and drop lists so the generated files exercise every preprocessing step.
+
+import io
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+ARCHIVE_PREAMBLE = (
+    "# This file was produced by the NASA Exoplanet Archive  http://exoplanetarchive.ipac.caltech.edu\n"
+    "# (synthetic benchmark data)\n"
+    "#\n"
+)
+
+def make_frame(spec,
+               n_rows: int,
+               seed: int = 0,
+               with_label: bool = True,
+               missing_rate: float = 0.05) -> pd.DataFrame:
+    """
+    Build a raw (pre-preprocessing) frame for `spec`: identifier columns from the drop list,
+    value + _err1/_err2 columns for every *_rel_error feature, categorical source columns for
+    one-hot features, *lim flags, and the label column.
+    """
+    rng = np.random.default_rng(seed)
+    features = spec.train_features or []
+    one_hot = list(spec.one_hot_cols)
+    cols = {}
+
+    for c in spec.cols_to_drop:
+        cols[c] = [f"{c}-{i}" for i in range(n_rows)]
+
+    levels = {c: [] for c in one_hot}
+    for f in features:
+        if f.endswith("_was_missing"):
+            continue
+        src = next((c for c in one_hot if f.startswith(c + "_")), None)
+        if src is not None:
+            levels[src].append(f[len(src) + 1:])
+        elif f.endswith("_rel_error"):
+            base = f[:-len("_rel_error")]
+            cols.setdefault(base, np.abs(rng.normal(10.0, 5.0, n_rows)) + 1.0)  # keep rel errors finite
+            cols[f"{base}_err1"] = rng.random(n_rows)
+            cols[f"{base}_err2"] = -rng.random(n_rows)
+        else:
+            cols[f] = rng.normal(10.0, 5.0, n_rows)
+            if spec.drop_lim_cols and not f.endswith(("err1", "err2")):
+                cols[f"{f}lim"] = np.zeros(n_rows, dtype=np.int64)
+
+    for c, lv in levels.items():
+        if lv:
+            cols[c] = rng.choice(lv + ["Other"], n_rows)
+
+    if with_label and spec.class_names:
+        cols[spec.label_col] = rng.choice(spec.class_names, n_rows)
+
+    df = pd.DataFrame(cols)
+    if missing_rate > 0:
+        for c in df.columns:
+            if df[c].dtype.kind == "f" or c in one_hot:
+                df.loc[rng.random(n_rows) < missing_rate, c] = np.nan
+    return df
+
+def make_csv_bytes(spec,
+                   n_rows: int,
+                   seed: int = 0,
+                   with_label: bool = True,
+                   preamble: Optional[str] = ARCHIVE_PREAMBLE) -> bytes:
+    """Same as make_frame, serialized like an Exoplanet Archive export (comment preamble + CSV)."""
+    buf = io.StringIO()
+    if preamble:
+        buf.write(preamble)
+    make_frame(spec, n_rows, seed=seed, with_label=with_label).to_csv(buf, index=False)
+    return buf.getvalue().encode("utf-8")
@@ -0,0 +1,10 @@
+# conftest.py
+# Tests import the app package and read the artifacts/ directory of backend/, so they run
+# from there whatever directory pytest is started in:  cd backend && python -m pytest -q
+
+import os
+import sys
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+os.chdir(BACKEND)
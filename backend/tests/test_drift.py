@@ -0,0 +1,39 @@
+# test_drift.py
+# DriftSketch.update: exact counts when every row is sketched, and a sampled update of a large
+# batch that stays close to the exact one (same row totals, PSI within sampling noise).
+
+import numpy as np
+
+from app.drift import DriftSketch, psi
+
+def _data(n_rows: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(n_rows, 6))
+    X[rng.random(X.shape) < 0.1] = np.nan
+    return X
+
+def test_exact_update_counts_every_row():
+    baseline = DriftSketch.fit([f"f{j}" for j in range(6)], _data(2_000, 0))
+    X = _data(3_000, 1)
+    sketch = baseline.empty()
+    sketch.update(X, sample_rows=5_000)   # batch below the sample size: sketched whole
+    for j in range(6):
+        col = X[:, j][~np.isnan(X[:, j])]
+        expected = np.diff(np.concatenate([[0], np.searchsorted(np.sort(col), baseline.edges[j]), [len(col)]]))
+        assert np.array_equal(sketch.counts[j], expected)
+        assert sketch.missing[j] == np.isnan(X[:, j]).sum()
+        assert sketch.min[j] == col.min() and sketch.max[j] == col.max()
+    assert sketch.rows == len(X)
+
+def test_sampled_update_tracks_exact():
+    baseline = DriftSketch.fit([f"f{j}" for j in range(6)], _data(2_000, 0))
+    X = _data(100_000, 2)
+    X[:, 0] += 0.5   # one drifted feature
+    exact, sampled = baseline.empty(), baseline.empty()
+    exact.update(X)
+    sampled.update(X, sample_rows=4_096)
+    assert sampled.rows == exact.rows == len(X)
+    assert np.all(np.abs(sampled.present() + sampled.missing - len(X)) < 100_000 / 4_096 + 1)
+    np.testing.assert_allclose(sampled.summary()["missing_rate"], exact.summary()["missing_rate"], atol=0.02)
+    np.testing.assert_allclose(psi(sampled, baseline), psi(exact, baseline), atol=0.02)
+    assert psi(sampled, baseline).argmax() == 0
@@ -0,0 +1,38 @@
+# test_fastpath.py
+# The flattened tree ensembles (app/fastpath.py) must score bit-identically to sklearn, on rows
+# that sit exactly on and next to the split thresholds and on synthetic uploads.
+
+import os
+
+import numpy as np
+import pytest
+
+import app.main_multi as mm
+from app import fastpath
+from benchmarks.synth import make_frame
+
+@pytest.fixture(scope="module", params=["k2", "tess"])
+def model(request):
+    spec = mm.REGISTRY[request.param]
+    if not os.path.exists(spec.pipeline_path):
+        pytest.skip(f"{spec.pipeline_path} is not in the tree")
+    spec = mm._ensure_loaded(spec)
+    est = spec.pipe[-1]
+    cls, arrays = fastpath._flatten(est)
+    return spec, est, cls, fastpath.FastPipeline(spec.pipe, fastpath._build(cls, arrays, est))
+
+def test_probe_rows(model):
+    spec, est, cls, fast = model
+    X = fastpath.probe_rows(fast.flat, 5_000)
+    if cls is fastpath.FlatBoosting:
+        X[np.random.default_rng(1).random(X.shape) < 0.05] = np.nan
+    got = fast.flat.predict_proba(X)
+    assert np.array_equal(got, est.predict_proba(X))
+    assert np.array_equal(fast.classes_.take(np.argmax(got, axis=1)), est.predict(X))
+
+@pytest.mark.parametrize("n_rows", [1, 20, 2_000])
+def test_synthetic_uploads(model, n_rows):
+    spec, est, cls, fast = model
+    X = spec.preprocess_fn(make_frame(spec, n_rows, seed=n_rows, with_label=False))
+    assert np.array_equal(fast.predict_proba(X), spec.pipe.predict_proba(X))
+    assert np.array_equal(fast.predict(X), spec.pipe.predict(X))
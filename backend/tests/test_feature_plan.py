@@ -0,0 +1,43 @@
+# test_feature_plan.py
+# Relative-error features: the vectorized add_uncertainty_features and the FeaturePlan
+# outputs that serve requests must equal the original per-pair loop exactly.
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.feature_plan import FeaturePlan
+from app.main_multi import add_uncertainty_features
+from benchmarks.bench_uncertainty import legacy_add_uncertainty_features, make_error_frame
+
+MIN_DEN = 1e-12
+
+@pytest.mark.parametrize("keep_asymmetric", [False, True])
+@pytest.mark.parametrize("n_rows", [0, 2_000])
+def test_add_uncertainty_features_matches_loop(keep_asymmetric, n_rows):
+    df = make_error_frame(n_rows, 8, seed=1)
+    old, old_names = legacy_add_uncertainty_features(df, keep_asymmetric, MIN_DEN)
+    new, new_names = add_uncertainty_features(df, keep_asymmetric, MIN_DEN)
+    pd.testing.assert_frame_equal(new, old, check_exact=True)
+    assert new_names == old_names
+
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+@pytest.mark.parametrize("keep_asymmetric", [False, True])
+def test_feature_plan_rel_errors_match_loop(keep_asymmetric, dtype):
+    df = make_error_frame(2_000, 8, seed=1)
+    old, names = legacy_add_uncertainty_features(df, keep_asymmetric, MIN_DEN)
+    plan = FeaturePlan.compile(["p0", "p3"] + names, keep_asymmetric=keep_asymmetric, min_den=MIN_DEN)
+    X = plan.transform(df, dtype)
+    for name in names:
+        # float32 plans round the float64 result once, as the estimator would
+        expected = old[name].to_numpy(dtype=np.float64).astype(dtype)
+        assert X[name].dtype == dtype
+        assert np.array_equal(X[name].to_numpy(), expected, equal_nan=True), name
+
+def test_feature_plan_rel_errors_in_chunks():
+    df = make_error_frame(3_000, 4, seed=2)
+    _, names = legacy_add_uncertainty_features(df, False, MIN_DEN)
+    plan = FeaturePlan.compile(names, min_den=MIN_DEN)
+    whole = plan.transform(df)
+    parts = pd.concat([plan.transform(df.iloc[i:i + 700]) for i in range(0, len(df), 700)])
+    pd.testing.assert_frame_equal(parts, whole, check_exact=True)
@@ -0,0 +1,44 @@
+# test_jobs.py
+# The job store is created by the first submit: a server that only starts its runners, or
+# answers job lookups, leaves no EXO_JOBS_DIR behind.
+
+import asyncio
+import os
+
+import httpx
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+def test_store_is_created_on_first_submit(tmp_path, monkeypatch):
+    jobs_dir = str(tmp_path / "jobs")
+    monkeypatch.setattr(mm, "JOBS_DIR", jobs_dir)
+    monkeypatch.setattr(mm, "_JOB_STORE", None)
+    monkeypatch.setattr(mm, "JOB_POLL_S", 0.05)
+    content = make_csv_bytes(mm._ensure_loaded(mm.REGISTRY["k2"]), 200, with_label=False)
+
+    async def run():
+        mm._ensure_job_runners()
+        transport = httpx.ASGITransport(app=mm.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            await asyncio.sleep(0.2)   # runners poll without a store
+            assert (await client.get("/jobs")).json()["jobs"] == []
+            assert (await client.get("/jobs/nope")).status_code == 404
+            assert not os.path.exists(jobs_dir)
+
+            r = await client.post("/jobs", params={"model": "k2"}, files={"file": ("k2.csv", content)})
+            assert r.status_code == 202 and os.path.isdir(jobs_dir)
+            job_id = r.json()["job_id"]
+            for _ in range(200):
+                status = (await client.get(f"/jobs/{job_id}")).json()["status"]
+                if status not in ("queued", "running"):
+                    break
+                await asyncio.sleep(0.05)
+            return status
+
+    try:
+        assert asyncio.run(run()) == "done"
+    finally:
+        mm._JOB_RUNNERS.clear()
+        if mm._JOB_STORE is not None:
+            mm._JOB_STORE._db.close()
@@ -0,0 +1,37 @@
+# test_model_load.py
+# A model is published by spec.pipe, which the request paths check without the load lock:
+# it must only appear once every other runtime field is in place, and never after a failed load.
+
+import dataclasses
+
+import pytest
+
+import app.main_multi as mm
+
+@pytest.fixture
+def spec():
+    """A private copy of the K2 spec, so loads here do not touch the registry's."""
+    return dataclasses.replace(mm.K2_SPEC, pipe=None, plan=None, preprocess_fn=None, fastpath=None,
+                               approx=None, explainer=None, drift=None, version=None)
+
+def test_pipe_is_published_last(spec, monkeypatch):
+    seen = []
+    real = mm._feature_dtype
+
+    def spy(pipe):
+        seen.append(spec.pipe)
+        return real(pipe)
+
+    monkeypatch.setattr(mm, "_feature_dtype", spy)
+    mm._ensure_loaded(spec)
+    assert seen == [None]
+    assert spec.pipe is not None and spec.preprocess_fn is not None and spec.version is not None
+
+def test_failed_load_publishes_nothing(spec, monkeypatch):
+    def broken(pipe):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(mm, "_feature_dtype", broken)
+    with pytest.raises(RuntimeError):
+        mm._ensure_loaded(spec)
+    assert spec.pipe is None and spec.preprocess_fn is None and spec.plan is None
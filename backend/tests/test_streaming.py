@@ -0,0 +1,62 @@
+# test_streaming.py
+# Streamed responses hold their model's admission slot; it must come back however the
+# response ends, including a client that is gone before the body starts.
+
+import asyncio
+
+import pytest
+
+import app.main_multi as mm
+from benchmarks.synth import make_csv_bytes
+
+BOUNDARY = b"exo-test-boundary"
+
+def _multipart(filename: str, content: bytes) -> bytes:
+    return (b"--" + BOUNDARY + b'\r\nContent-Disposition: form-data; name="file"; filename="' +
+            filename.encode() + b'"\r\nContent-Type: text/csv\r\n\r\n' + content +
+            b"\r\n--" + BOUNDARY + b"--\r\n")
+
+async def _post(path: str, query: str, body: bytes, spec_version: str, fail_on_start: bool) -> int:
+    """One request straight through the ASGI app; returns the number of body chunks delivered."""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0", "spec_version": spec_version}, "http_version": "1.1",
+        "method": "POST", "scheme": "http", "path": path, "raw_path": path.encode(),
+        "query_string": query.encode(), "root_path": "", "client": ("test", 1), "server": ("test", 80),
+        "headers": [(b"content-type", b"multipart/form-data; boundary=" + BOUNDARY),
+                    (b"content-length", str(len(body)).encode())],
+    }
+    delivered, chunks = [False], [0]
+
+    async def receive():
+        if not delivered[0]:
+            delivered[0] = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)   # the client never hangs up on its own
+
+    async def send(message):
+        if message["type"] == "http.response.start" and fail_on_start:
+            raise OSError("client went away")
+        if message["type"] == "http.response.body" and message.get("body"):
+            chunks[0] += 1
+
+    try:
+        await mm.app(scope, receive, send)
+    except Exception:
+        pass
+    return chunks[0]
+
+@pytest.fixture(scope="module")
+def k2_upload():
+    spec = mm._ensure_loaded(mm.REGISTRY["k2"])
+    return _multipart("k2.csv", make_csv_bytes(spec, 300, with_label=False))
+
+@pytest.mark.parametrize("path", ["/predict", "/analyze", "/predict_csv"])
+@pytest.mark.parametrize("fail_on_start", [False, True])
+def test_stream_releases_admission_slot(k2_upload, path, fail_on_start):
+    async def run():
+        chunks = [await _post(path, "model=k2&stream=true", k2_upload, "2.4", fail_on_start) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        return chunks
+    chunks = asyncio.run(run())
+    assert all(n == 0 for n in chunks) if fail_on_start else all(n > 0 for n in chunks)
+    assert mm.REGISTRY["k2"].gate.active == 0